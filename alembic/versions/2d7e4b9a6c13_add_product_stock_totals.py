@@ -0,0 +1,40 @@
+"""Add product stock totals
+
+Revision ID: 2d7e4b9a6c13
+Revises: 9c3f6a1d8e52
+Create Date: 2026-10-18 19:02:37.184630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d7e4b9a6c13'
+down_revision: Union[str, None] = '9c3f6a1d8e52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_stock_totals',
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+
+    op.execute(
+        "INSERT INTO product_stock_totals (product_id, quantity, updated_at) "
+        "SELECT product_id, COALESCE(SUM(available_quantity), 0), CURRENT_TIMESTAMP "
+        "FROM stocks WHERE product_id IS NOT NULL GROUP BY product_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_stock_totals')
@@ -0,0 +1,28 @@
+"""Add user token version
+
+Revision ID: 4166a45d6e90
+Revises: 8e5d189e06d6
+Create Date: 2026-10-18 09:12:41.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4166a45d6e90'
+down_revision: Union[str, None] = '8e5d189e06d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,41 @@
+"""Add product search indexes
+
+Revision ID: 5a2c9e71d4b0
+Revises: b3f1a7d52c18
+Create Date: 2026-10-18 14:21:07.552913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a2c9e71d4b0'
+down_revision: Union[str, None] = 'b3f1a7d52c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match app.db.search.product_search_vector()
+SEARCH_VECTOR = "to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pg_trgm and tsvector are PostgreSQL-only; other backends search in process
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX ix_products_name_trgm ON products USING gin (name gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_products_description_trgm ON products USING gin (description gin_trgm_ops)')
+    op.execute(f'CREATE INDEX ix_products_search_tsv ON products USING gin ({SEARCH_VECTOR})')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('DROP INDEX IF EXISTS ix_products_search_tsv')
+    op.execute('DROP INDEX IF EXISTS ix_products_description_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_products_name_trgm')
@@ -0,0 +1,29 @@
+"""Index refresh token expiry
+
+Revision ID: 5e2a9c7d1b46
+Revises: 7b1e5c3f9a24
+Create Date: 2026-10-18 22:41:09.318226
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2a9c7d1b46'
+down_revision: Union[str, None] = '7b1e5c3f9a24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Backs the periodic delete of expired refresh tokens
+    op.create_index('ix_refresh_tokens_expires_at', 'refresh_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_refresh_tokens_expires_at', table_name='refresh_tokens')
@@ -0,0 +1,70 @@
+"""Add stock reservations
+
+Revision ID: 7b1e5c3f9a24
+Revises: 2d7e4b9a6c13
+Create Date: 2026-10-18 20:26:51.903472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b1e5c3f9a24'
+down_revision: Union[str, None] = '2d7e4b9a6c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+reservation_status = sa.Enum('active', 'converted', 'released', 'expired', name='reservation_status_enum')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # New enum values cannot be added inside a transaction block before PostgreSQL 12
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE stock_movement_reason_enum ADD VALUE IF NOT EXISTS 'reservation'")
+            op.execute("ALTER TYPE stock_movement_reason_enum ADD VALUE IF NOT EXISTS 'release'")
+
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), sa.ForeignKey('customers.id'), nullable=False),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('status', reservation_status, nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('outgoing_order_id', sa.Integer(), sa.ForeignKey('outgoing_orders.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_reservations_id', 'stock_reservations', ['id'])
+    op.create_index('ix_stock_reservations_customer_id', 'stock_reservations', ['customer_id'])
+    op.create_index('ix_stock_reservations_status_expires_at', 'stock_reservations', ['status', 'expires_at'])
+
+    op.create_table(
+        'stock_reservation_allocations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('reservation_id', sa.Integer(), sa.ForeignKey('stock_reservations.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('stock_id', sa.Integer(), sa.ForeignKey('stocks.id'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_reservation_allocations_id', 'stock_reservation_allocations', ['id'])
+    op.create_index('ix_stock_reservation_allocations_reservation_id', 'stock_reservation_allocations', ['reservation_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The added stock_movement_reason_enum values stay: PostgreSQL cannot drop enum values
+    op.drop_index('ix_stock_reservation_allocations_reservation_id', table_name='stock_reservation_allocations')
+    op.drop_index('ix_stock_reservation_allocations_id', table_name='stock_reservation_allocations')
+    op.drop_table('stock_reservation_allocations')
+    op.drop_index('ix_stock_reservations_status_expires_at', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_customer_id', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_id', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
+    reservation_status.drop(op.get_bind(), checkfirst=True)
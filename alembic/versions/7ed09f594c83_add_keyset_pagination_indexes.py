@@ -0,0 +1,48 @@
+"""Add keyset pagination indexes
+
+Revision ID: 7ed09f594c83
+Revises: c09cf911ff27
+Create Date: 2026-10-18 11:24:05.871342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7ed09f594c83'
+down_revision: Union[str, None] = 'c09cf911ff27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, sort column) pairs that get a composite (column, id) index
+KEYSET_INDEXES = [
+    ('categories', 'name'),
+    ('products', 'name'),
+    ('products', 'price'),
+    ('products', 'created_at'),
+    ('stocks', 'expiry_date'),
+    ('stocks', 'created_at'),
+    ('customers', 'last_name'),
+    ('customers', 'created_at'),
+    ('suppliers', 'name'),
+    ('suppliers', 'created_at'),
+    ('incoming_orders', 'supply_date'),
+    ('incoming_orders', 'created_at'),
+    ('outgoing_orders', 'order_date'),
+    ('outgoing_orders', 'created_at'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column in KEYSET_INDEXES:
+        op.create_index(f'ix_{table}_{column}_id', table, [column, 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in reversed(KEYSET_INDEXES):
+        op.drop_index(f'ix_{table}_{column}_id', table_name=table)
@@ -0,0 +1,56 @@
+"""Add stock movements ledger
+
+Revision ID: 9c3f6a1d8e52
+Revises: e4b8d2a61f37
+Create Date: 2026-10-18 17:41:09.552917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f6a1d8e52'
+down_revision: Union[str, None] = 'e4b8d2a61f37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+movement_reason = sa.Enum('opening', 'receipt', 'sale', 'cancellation', 'adjustment', name='stock_movement_reason_enum')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'stock_movements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('stock_id', sa.Integer(), sa.ForeignKey('stocks.id'), nullable=False),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id'), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('balance_after', sa.Integer(), nullable=False),
+        sa.Column('reason', movement_reason, nullable=False),
+        sa.Column('reference_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_movements_id', 'stock_movements', ['id'])
+    op.create_index('ix_stock_movements_product_id', 'stock_movements', ['product_id'])
+    op.create_index('ix_stock_movements_stock_id_created_at_id', 'stock_movements', ['stock_id', 'created_at', 'id'])
+
+    # Existing batches start the ledger with their current quantity
+    op.execute(
+        "INSERT INTO stock_movements (stock_id, product_id, quantity, balance_after, reason, created_at) "
+        "SELECT id, product_id, COALESCE(available_quantity, 0), COALESCE(available_quantity, 0), 'opening', CURRENT_TIMESTAMP "
+        "FROM stocks"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_movements_stock_id_created_at_id', table_name='stock_movements')
+    op.drop_index('ix_stock_movements_product_id', table_name='stock_movements')
+    op.drop_index('ix_stock_movements_id', table_name='stock_movements')
+    op.drop_table('stock_movements')
+    movement_reason.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,43 @@
+"""Add filter indexes
+
+Revision ID: b3f1a7d52c18
+Revises: 7ed09f594c83
+Create Date: 2026-10-18 13:02:41.310275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1a7d52c18'
+down_revision: Union[str, None] = '7ed09f594c83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column) pairs filtered on by the list endpoints
+FILTER_INDEXES = [
+    ('products', 'category_id'),
+    ('incoming_orders', 'status'),
+    ('incoming_orders', 'supplier_id'),
+    ('incoming_orders', 'product_id'),
+    ('outgoing_orders', 'status'),
+    ('outgoing_orders', 'customer_id'),
+    ('outgoing_orders', 'product_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column in FILTER_INDEXES:
+        op.create_index(op.f(f'ix_{table}_{column}'), table, [column], unique=False)
+    op.create_index('ix_stocks_product_id_expiry_date', 'stocks', ['product_id', 'expiry_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stocks_product_id_expiry_date', table_name='stocks')
+    for table, column in reversed(FILTER_INDEXES):
+        op.drop_index(op.f(f'ix_{table}_{column}'), table_name=table)
@@ -0,0 +1,43 @@
+"""Add outgoing order allocations
+
+Revision ID: e4b8d2a61f37
+Revises: 5a2c9e71d4b0
+Create Date: 2026-10-18 15:12:44.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8d2a61f37'
+down_revision: Union[str, None] = '5a2c9e71d4b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'outgoing_order_allocations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('outgoing_order_id', sa.Integer(), sa.ForeignKey('outgoing_orders.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('stock_id', sa.Integer(), sa.ForeignKey('stocks.id'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outgoing_order_allocations_id', 'outgoing_order_allocations', ['id'])
+    op.create_index('ix_outgoing_order_allocations_outgoing_order_id', 'outgoing_order_allocations', ['outgoing_order_id'])
+    op.create_index('ix_outgoing_order_allocations_stock_id', 'outgoing_order_allocations', ['stock_id'])
+    op.create_index('ix_stocks_product_id_created_at', 'stocks', ['product_id', 'created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stocks_product_id_created_at', table_name='stocks')
+    op.drop_index('ix_outgoing_order_allocations_stock_id', table_name='outgoing_order_allocations')
+    op.drop_index('ix_outgoing_order_allocations_outgoing_order_id', table_name='outgoing_order_allocations')
+    op.drop_index('ix_outgoing_order_allocations_id', table_name='outgoing_order_allocations')
+    op.drop_table('outgoing_order_allocations')
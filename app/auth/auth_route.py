@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.schemas import AuthRegister, AuthResponse, AuthLogin, User
+from app.db.schemas import AuthRegister, AuthResponse, AuthLogin, AuthRefresh, User
 from app.db.database import get_db
-from app.auth.auth_utils import get_current_user
+from app.auth.auth_utils import get_current_user, role_required
+from app.db.models import UserRole
 
 from app.auth.auth_service import AuthService
 import logging
@@ -33,6 +34,21 @@ async def register(request: AuthRegister, service: AuthService = Depends(get_aut
 async def login(request: AuthLogin, service: AuthService = Depends(get_auth_service(False))):
     return await service.login_user(request)
 
+@router.post('/refresh', response_model=AuthResponse, status_code=200)
+async def refresh(request: AuthRefresh, service: AuthService = Depends(get_auth_service(False))):
+    return await service.refresh_tokens(request)
+
 @router.get('/me', response_model=User, status_code=200)
 async def current_user(service: AuthService = Depends(get_auth_service(True))):
-    return await service.current_user()
\ No newline at end of file
+    return await service.current_user()
+
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(service: AuthService = Depends(get_auth_service(True))):
+    await service.logout()
+    return
+
+@router.post('/revoke/{user_id}', status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(user_id: int, service: AuthService = Depends(get_auth_service(True)), has_permission: bool = Depends(role_required([UserRole.admin]))):
+    logger.info(f"revoke tokens endpoint called for user ID: {user_id}")
+    await service.revoke_tokens(user_id)
+    return
@@ -1,13 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
-from app.db.schemas import AuthRegister, AuthLogin, AuthResponse
+from app.db.schemas import AuthRegister, AuthLogin, AuthResponse, AuthRefresh
 from app.db.models import User
 from app.db import schemas
 from typing import Optional
-from app import filter_user
+from app import filter_user, settings
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import timedelta
-from .auth_utils import hash_password, authenticate_user, create_token
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from .auth_utils import hash_password_async, authenticate_user, create_token, build_token_claims, revoke_user_tokens, decode_token, remember_token_version
+from .token_store import refresh_token_store
 import logging
 logger = logging.getLogger(__name__)
 
@@ -27,7 +29,7 @@ class AuthService():
 
         try:
             # Hash the password and create a new user
-            hashed_password = hash_password(request.password)
+            hashed_password = await hash_password_async(request.password)
             new_user = User(
                 username=request.username,
                 first_name=request.first_name,
@@ -42,6 +44,8 @@ class AuthService():
             await self.db.refresh(new_user)
 
             return new_user
+        except HTTPException:
+            raise
         except (SQLAlchemyError, Exception) as e:
             await self.db.rollback() 
             logger.error(f"Error creating user: {str(e)}")
@@ -53,10 +57,58 @@ class AuthService():
             logger.error("Incorrect email or password")
             raise HTTPException(status_code=400, detail="Incorrect email or password"
                             )
-        access_token = create_token(data={"sub": str(user.id)}, expires_delta=timedelta(minutes=5))
-        refresh_token = create_token(data={"sub": str(user.id)}, expires_delta=timedelta(days=7))
+        claims = await build_token_claims(self.db, user)
+        return await self._issue_tokens(claims, family=uuid4().hex)
+
+    async def refresh_tokens(self, request: AuthRefresh) -> AuthResponse:
+        """
+        Trade a refresh token for a new access/refresh pair. Each refresh token
+        is single use; replaying one revokes every token from the same login.
+        """
+        payload = decode_token(request.refresh_token)
+        if payload.get("type") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+            raise HTTPException(status_code=401, detail="Invalid refresh token")
+        user = await filter_user(self.db, User.id == int(payload["sub"]))
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        # The stored version is authoritative: the token may predate a revocation
+        # made on another worker, which the cached version may not show yet
+        remember_token_version(user.id, user.token_version or 0)
+        if payload.get("ver", 0) < (user.token_version or 0):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+
+        if not await refresh_token_store.redeem(payload["jti"], payload["fam"]):
+            logger.warning(
+                "Refresh token rejected",
+                extra={"extra_fields": {"user_id": payload["sub"], "family": payload["fam"]}}
+            )
+            raise HTTPException(status_code=401, detail="Refresh token is no longer valid")
+
+        # Rebuilt from the user row so a role or profile change since login is picked up
+        claims = await build_token_claims(self.db, user)
+        return await self._issue_tokens(claims, family=payload["fam"])
+
+    async def _issue_tokens(self, claims: dict, family: str) -> AuthResponse:
+        jti = uuid4().hex
+        refresh_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        access_token = create_token(data={**claims, "type": "access"}, expires_delta=timedelta(minutes=5))
+        refresh_token = create_token(
+            data={**claims, "type": "refresh", "jti": jti, "fam": family},
+            expires_delta=refresh_expires
+        )
+        await refresh_token_store.issue(
+            jti, family, int(claims["sub"]), datetime.now(timezone.utc) + refresh_expires
+        )
 
         return AuthResponse(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
 
     async def current_user(self):
         return self.user
+
+    async def logout(self) -> None:
+        await revoke_user_tokens(self.db, self.user.id)
+        await refresh_token_store.revoke_user(self.user.id)
+
+    async def revoke_tokens(self, user_id: int) -> None:
+        await revoke_user_tokens(self.db, user_id)
+        await refresh_token_store.revoke_user(user_id)
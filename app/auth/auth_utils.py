@@ -1,14 +1,20 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import filter_user
 from app import settings
-from typing import List
+from typing import List, Optional
 from app.db import schemas
-from app.db.database import get_db
-from app.db.models import User
+from app.db.database import get_db, async_session
+from app.db.models import User, UserRole, Customer, Supplier
+from app.auth.user_cache import user_cache, token_cache
 from jose import JWTError, jwt
 import logging
 
@@ -16,12 +22,54 @@ logger = logging.getLogger(__name__)
 http_scheme = HTTPBearer()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# user id -> (users.token_version, monotonic time it was read); a cache of the
+# database value, so revocations reach every worker within TOKEN_VERSION_CACHE_SECONDS
+_token_versions: dict[int, tuple[Optional[int], float]] = {}
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_jobs = 0
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_password_job(func, *args):
+    """
+    Run a bcrypt call on the password pool, shedding load with a 503 once
+    PASSWORD_HASH_QUEUE_LIMIT jobs are already waiting for a worker.
+    """
+    global _password_jobs
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_LIMIT:
+        logger.warning(
+            "Password hashing pool saturated",
+            extra={"extra_fields": {"in_flight": _password_jobs}}
+        )
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+def decode_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, settings.JWT_SECRET_KEY,
+                             algorithms=[settings.JWT_ALGORITHM])
+        
+    except JWTError as e:
+        logger.error(f"Invalid token: {e}")
+        raise HTTPException(status_code=401, detail="Invalid token")
+
 def verify_access_token(token: HTTPAuthorizationCredentials = Depends(http_scheme)) -> dict:
     try:
         return jwt.decode(token.credentials, settings.JWT_SECRET_KEY,
@@ -45,34 +93,143 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
     #Retrieve the first result asynchronously
     user = await filter_user(db, User.email == email)
     #Verify the user and password
-    if user is None or not verify_password(password, user.hashed_password):
+    if user is None or not await verify_password_async(password, user.hashed_password):
         logger.warning("Authentication failed")
         return False
 
     return user
 
+async def build_token_claims(db: AsyncSession, user: User) -> dict:
+    """
+    Claims that let get_current_user rebuild schemas.User without a query.
+    """
+    role = getattr(user.role, "value", user.role)
+    claims = {
+        "sub": str(user.id),
+        "role": role,
+        "username": user.username,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "ver": user.token_version or 0,
+    }
+    if role == UserRole.customer:
+        result = await db.execute(select(Customer.id).where(Customer.user_id == user.id).limit(1))
+        claims["customer_id"] = result.scalar_one_or_none()
+    elif role == UserRole.supplier:
+        result = await db.execute(select(Supplier.id).where(Supplier.user_id == user.id).limit(1))
+        claims["supplier_id"] = result.scalar_one_or_none()
+    return claims
+
+def user_from_claims(payload: dict) -> schemas.User:
+    return schemas.User(
+        id=int(payload["sub"]),
+        username=payload["username"],
+        first_name=payload["first_name"],
+        last_name=payload["last_name"],
+        role=payload["role"],
+        email=payload["email"],
+        customer_id=payload.get("customer_id"),
+        supplier_id=payload.get("supplier_id"),
+    )
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def remember_token_version(user_id: int, version: Optional[int]) -> None:
+    now = time.monotonic()
+    if len(_token_versions) >= settings.USER_CACHE_MAX_SIZE:
+        for stale in [id for id, (_, read_at) in _token_versions.items() if now - read_at >= settings.TOKEN_VERSION_CACHE_SECONDS]:
+            del _token_versions[stale]
+    _token_versions[user_id] = (version, now)
+
+async def current_token_version(user_id: int, fresh: bool = False) -> Optional[int]:
+    """
+    The user's token_version as stored in the database, or None if the user
+    no longer exists. Read from the primary unless a recent enough value is cached.
+    """
+    entry = _token_versions.get(user_id)
+    if not fresh and entry is not None and time.monotonic() - entry[1] < settings.TOKEN_VERSION_CACHE_SECONDS:
+        return entry[0]
+    async with async_session() as session:
+        result = await session.execute(select(User.token_version).where(User.id == user_id))
+        row = result.first()
+    version = (row[0] or 0) if row is not None else None
+    remember_token_version(user_id, version)
+    return version
+
+async def is_token_revoked(user_id: int, version: int, fresh: bool = False) -> bool:
+    stored = await current_token_version(user_id, fresh=fresh)
+    return stored is None or version < stored
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int) -> int:
+    """
+    Bump the user's token version so every token issued so far is rejected.
+    """
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.commit()
+
+    remember_token_version(user_id, version)
+    await user_cache.invalidate(user_id)
+    logger.info(
+        "User tokens revoked",
+        extra={"extra_fields": {"user_id": user_id, "token_version": version}}
+    )
+    return version
+
 async def get_current_user(token: HTTPAuthorizationCredentials = Depends(http_scheme), db: AsyncSession = Depends(get_db)) -> schemas.User:
     try:
-        payload = verify_access_token(token) 
-        user_id: int = payload.get("sub")
-        if not user_id:
-            print("No user_id specified")
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user_id = int(user_id)
+        token_hash = hash_token(token.credentials)
+        cached = token_cache.get(token_hash)
+        if cached is None:
+            payload = verify_access_token(token)
+            if payload.get("type", "access") != "access":
+                raise HTTPException(status_code=401, detail="Invalid token")
+            user_id: int = payload.get("sub")
+            if not user_id:
+                print("No user_id specified")
+                raise HTTPException(status_code=401, detail="Invalid token")
+            claims_user = user_from_claims(payload) if "role" in payload else None
+            cached = (int(user_id), payload.get("ver", 0), claims_user)
+            token_cache.set(token_hash, float(payload.get("exp", 0)), cached)
+
+        user_id, token_version, claims_user = cached
+        if await is_token_revoked(user_id, token_version):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+        if claims_user is not None:
+            return claims_user
+
+        # Tokens issued before claims were embedded still resolve through the database
+        cached_user = await user_cache.get(user_id)
+        if cached_user is not None:
+            return cached_user
 
         current_user = await filter_user(db, User.id == user_id)
 
         if not current_user:
             print("No user found in database")
             raise HTTPException(status_code=401, detail="User not found")
+        remember_token_version(user_id, current_user.token_version or 0)
+        if token_version < (current_user.token_version or 0):
+            raise HTTPException(status_code=401, detail="Token has been revoked")
         
-        return schemas.User.model_validate(current_user)
+        user = schemas.User.model_validate(current_user)
+        await user_cache.set(user)
+        return user
     except JWTError as e:
         logger.error(f"JWT Error: {e}")
         raise HTTPException(status_code=401, detail="Invalid token")
 
 def role_required(required_roles: List[str]):
-    def role_checker(current_user: schemas.User = Depends(get_current_user)):
+    async def role_checker(current_user: schemas.User = Depends(get_current_user)):
         if current_user.role not in required_roles:
             logger.warning(f"User {current_user.username} does not have the required role(s): {required_roles}")
             raise HTTPException(status_code=403, detail="Operation not permitted")
@@ -0,0 +1,200 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict
+from sqlalchemy import delete, select, update
+from app import settings
+from app.db.database import async_session
+from app.db.models import RefreshToken
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenStore:
+    """
+    Tracks issued refresh tokens so that each one can be redeemed exactly once.
+
+    Tokens are grouped in families (one per login). Presenting a token that was
+    already redeemed means it leaked, so the whole family is revoked.
+    """
+
+    async def issue(self, jti: str, family: str, user_id: int, expires_at: datetime) -> None:
+        raise NotImplementedError
+
+    async def redeem(self, jti: str, family: str) -> bool:
+        """
+        Consume the token. Returns False if it is unknown, expired, already
+        used or belongs to a revoked family.
+        """
+        raise NotImplementedError
+
+    async def revoke_user(self, user_id: int) -> None:
+        """
+        Revoke every token family of the user, e.g. on logout.
+        """
+        raise NotImplementedError
+
+    async def prune(self) -> int:
+        """
+        Forget tokens that have expired. Returns how many were removed.
+        """
+        return 0
+
+
+class InMemoryRefreshTokenStore(RefreshTokenStore):
+    """
+    Per-process store. Only suitable when a single worker serves /auth.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, tuple[str, int, float]] = {}
+        self._revoked_families: Dict[str, float] = {}
+        self._last_prune = time.time()
+
+    def _prune(self, now: float) -> int:
+        if now - self._last_prune < 60:
+            return 0
+        self._last_prune = now
+        before = len(self._tokens)
+        self._tokens = {jti: entry for jti, entry in self._tokens.items() if entry[2] > now}
+        self._revoked_families = {fam: exp for fam, exp in self._revoked_families.items() if exp > now}
+        return before - len(self._tokens)
+
+    async def prune(self) -> int:
+        return self._prune(time.time())
+
+    async def issue(self, jti: str, family: str, user_id: int, expires_at: datetime) -> None:
+        self._tokens[jti] = (family, user_id, expires_at.timestamp())
+
+    async def redeem(self, jti: str, family: str) -> bool:
+        now = time.time()
+        self._prune(now)
+        if family in self._revoked_families:
+            return False
+        entry = self._tokens.pop(jti, None)
+        if entry is None or entry[2] <= now:
+            self._revoked_families[family] = now + settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+            return False
+        return True
+
+    async def revoke_user(self, user_id: int) -> None:
+        expires = time.time() + settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        for jti, (family, owner, _) in list(self._tokens.items()):
+            if owner == user_id:
+                self._revoked_families[family] = expires
+                del self._tokens[jti]
+
+
+class DatabaseRefreshTokenStore(RefreshTokenStore):
+    """
+    Store backed by the refresh_tokens table; shared by every worker.
+    """
+
+    async def issue(self, jti: str, family: str, user_id: int, expires_at: datetime) -> None:
+        async with async_session() as session:
+            session.add(RefreshToken(jti=jti, family_id=family, user_id=user_id, expires_at=expires_at))
+            await session.commit()
+
+    async def redeem(self, jti: str, family: str) -> bool:
+        now = datetime.now(timezone.utc)
+        async with async_session() as session:
+            result = await session.execute(
+                update(RefreshToken)
+                .where(
+                    RefreshToken.jti == jti,
+                    RefreshToken.used_at.is_(None),
+                    RefreshToken.revoked_at.is_(None),
+                    RefreshToken.expires_at > now,
+                )
+                .values(used_at=now)
+                .returning(RefreshToken.jti)
+            )
+            if result.scalar_one_or_none() is not None:
+                await session.commit()
+                return True
+
+            await session.execute(
+                update(RefreshToken)
+                .where(RefreshToken.family_id == family, RefreshToken.revoked_at.is_(None))
+                .values(revoked_at=now)
+            )
+            await session.commit()
+            return False
+
+    async def revoke_user(self, user_id: int) -> None:
+        async with async_session() as session:
+            await session.execute(
+                update(RefreshToken)
+                .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+                .values(revoked_at=datetime.now(timezone.utc))
+            )
+            await session.commit()
+
+    async def prune(self) -> int:
+        # Used and revoked rows stay until they expire: until then a replay
+        # of one must still be recognised and revoke its family
+        async with async_session() as session:
+            result = await session.execute(
+                delete(RefreshToken).where(RefreshToken.expires_at <= datetime.now(timezone.utc))
+            )
+            await session.commit()
+            return result.rowcount
+
+
+class RedisRefreshTokenStore(RefreshTokenStore):
+    """
+    Store backed by Redis keys that expire with the tokens themselves.
+    """
+
+    def __init__(self, redis_url: str):
+        import aioredis
+        self._redis = aioredis.from_url(redis_url)
+
+    async def issue(self, jti: str, family: str, user_id: int, expires_at: datetime) -> None:
+        ttl = max(1, int(expires_at.timestamp() - time.time()))
+        await self._redis.set(f"refresh:{jti}", family, ex=ttl)
+        # The user's families, so that they can all be revoked on logout
+        await self._redis.sadd(f"refresh-user:{user_id}", family)
+        await self._redis.expire(f"refresh-user:{user_id}", ttl)
+
+    async def redeem(self, jti: str, family: str) -> bool:
+        if await self._redis.exists(f"refresh-revoked:{family}"):
+            return False
+        if await self._redis.delete(f"refresh:{jti}"):
+            return True
+        await self._redis.set(f"refresh-revoked:{family}", 1, ex=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+        return False
+
+    async def revoke_user(self, user_id: int) -> None:
+        families = await self._redis.smembers(f"refresh-user:{user_id}")
+        for family in families:
+            family = family.decode() if isinstance(family, bytes) else family
+            await self._redis.set(f"refresh-revoked:{family}", 1, ex=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+        await self._redis.delete(f"refresh-user:{user_id}")
+
+
+def create_refresh_token_store() -> RefreshTokenStore:
+    backend = settings.REFRESH_TOKEN_STORE
+    if backend == "memory":
+        return InMemoryRefreshTokenStore()
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("REFRESH_TOKEN_STORE=redis requires REDIS_URL")
+        return RedisRefreshTokenStore(settings.REDIS_URL)
+    if backend != "database":
+        logger.warning(f"Unknown REFRESH_TOKEN_STORE '{backend}', using the database store")
+    return DatabaseRefreshTokenStore()
+
+
+refresh_token_store = create_refresh_token_store()
+
+
+async def prune_refresh_tokens_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.REFRESH_TOKEN_PRUNE_SECONDS)
+        try:
+            pruned = await refresh_token_store.prune()
+            logger.info("Expired refresh tokens pruned", extra={"extra_fields": {"pruned": pruned}})
+        except Exception as e:
+            logger.warning(f"Refresh token prune failed: {str(e)}")
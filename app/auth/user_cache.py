@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from sqlalchemy import event
+from app import settings
+from app.db import schemas
+from app.db.models import User
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Bounded in-process LRU of validated users with a per-entry TTL.
+    When REDIS_URL is set, Redis is used as a shared second tier so that
+    workers can serve each other's misses and see each other's invalidations.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, redis_url: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.redis_url = redis_url
+        self._entries: "OrderedDict[int, tuple[float, schemas.User]]" = OrderedDict()
+        self._redis = None
+
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            try:
+                import aioredis
+                self._redis = aioredis.from_url(self.redis_url)
+            except Exception as e:
+                logger.warning(f"Redis user cache disabled: {str(e)}")
+                self.redis_url = None
+        return self._redis
+
+    def _redis_key(self, user_id: int) -> str:
+        return f"user:{user_id}"
+
+    def get_local(self, user_id: int) -> Optional[schemas.User]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        self._entries.move_to_end(user_id)
+        return user
+
+    def set_local(self, user: schemas.User) -> None:
+        self._entries[user.id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+
+    async def get(self, user_id: int) -> Optional[schemas.User]:
+        user = self.get_local(user_id)
+        if user is not None:
+            return user
+
+        redis = self._get_redis()
+        if redis is None:
+            return None
+        try:
+            payload = await redis.get(self._redis_key(user_id))
+        except Exception as e:
+            logger.warning(f"Redis user cache read failed: {str(e)}")
+            return None
+        if payload is None:
+            return None
+        user = schemas.User.model_validate_json(payload)
+        self.set_local(user)
+        return user
+
+    async def set(self, user: schemas.User) -> None:
+        self.set_local(user)
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(self._redis_key(user.id), user.model_dump_json(), ex=int(self.ttl_seconds))
+        except Exception as e:
+            logger.warning(f"Redis user cache write failed: {str(e)}")
+
+    async def invalidate(self, user_id: int) -> None:
+        self.discard(user_id)
+        redis = self._get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.delete(self._redis_key(user_id))
+        except Exception as e:
+            logger.warning(f"Redis user cache invalidation failed: {str(e)}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class TokenCache:
+    """
+    Bounded LRU of tokens that already passed signature verification, keyed by
+    a hash of the raw token and kept no longer than the token's own expiry.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, token_hash: str) -> Any:
+        entry = self._entries.get(token_hash)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            self._entries.pop(token_hash, None)
+            return None
+        self._entries.move_to_end(token_hash)
+        return value
+
+    def set(self, token_hash: str, expires_at: float, value: Any) -> None:
+        self._entries[token_hash] = (expires_at, value)
+        self._entries.move_to_end(token_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    redis_url=settings.REDIS_URL,
+)
+token_cache = TokenCache(max_size=settings.USER_CACHE_MAX_SIZE)
+
+
+async def invalidate_user(user_id: int) -> None:
+    """
+    Drop a user from the cache. Call this after changing a user's role or
+    profile through a bulk/Core statement; ORM updates are handled below.
+    """
+    await user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    user_cache.discard(target.id)
+    if user_cache.redis_url:
+        try:
+            asyncio.get_running_loop().create_task(user_cache.invalidate(target.id))
+        except RuntimeError:
+            pass
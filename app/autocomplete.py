@@ -0,0 +1,154 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from app import settings
+from app.db.database import async_session
+from app.db.models import Product, Customer, Supplier
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _index_keys(name: str) -> List[str]:
+    # Every word start is a key, so "smi" finds "John Smith" as well as "Smithers"
+    words = _normalize(name).split(" ")
+    return list(dict.fromkeys(" ".join(words[i:]) for i in range(len(words)) if words[i]))
+
+
+class PrefixIndex:
+    """
+    Sorted list of (key, id) pairs answering prefix queries with a binary
+    search, plus the display name of every indexed id.
+    """
+
+    def __init__(self, names: Optional[Dict[int, str]] = None):
+        self._names: Dict[int, str] = dict(names or {})
+        self._keys: List[Tuple[str, int]] = sorted(
+            (key, id) for id, name in self._names.items() for key in _index_keys(name)
+        )
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def upsert(self, id: int, name: Optional[str]) -> None:
+        self.remove(id)
+        if not name:
+            return
+        self._names[id] = name
+        for key in _index_keys(name):
+            insort(self._keys, (key, id))
+
+    def remove(self, id: int) -> None:
+        name = self._names.pop(id, None)
+        if name is None:
+            return
+        for key in _index_keys(name):
+            position = bisect_left(self._keys, (key, id))
+            if position < len(self._keys) and self._keys[position] == (key, id):
+                del self._keys[position]
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[int, str]]:
+        prefix = _normalize(prefix)
+        matches: Dict[int, str] = {}
+        position = bisect_left(self._keys, (prefix, -1))
+        while position < len(self._keys) and len(matches) < limit:
+            key, id = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            matches.setdefault(id, self._names[id])
+            position += 1
+        return list(matches.items())
+
+    def names(self) -> Dict[int, str]:
+        return dict(self._names)
+
+
+class AutocompleteIndex:
+    """
+    In-process prefix indexes over product, customer and supplier names.
+
+    Built from the database at startup, kept current by the services after
+    each committed change, and periodically rebuilt so that changes made by
+    other workers (or outside the API) are picked up.
+    """
+
+    KINDS = ("products", "customers", "suppliers")
+
+    def __init__(self):
+        self._indexes: Dict[str, PrefixIndex] = {kind: PrefixIndex() for kind in self.KINDS}
+        # Changes recorded while a rebuild is reading the tables, replayed onto the new index
+        self._journal: Optional[List[Tuple[str, int, Optional[str]]]] = None
+        self._lock = asyncio.Lock()
+
+    def search(self, kind: str, prefix: str, limit: int = 10) -> List[Tuple[int, str]]:
+        return self._indexes[kind].search(prefix, limit)
+
+    def upsert(self, kind: str, id: int, name: Optional[str]) -> None:
+        self._indexes[kind].upsert(id, name)
+        if self._journal is not None:
+            self._journal.append((kind, id, name))
+
+    def remove(self, kind: str, id: int) -> None:
+        self.upsert(kind, id, None)
+
+    async def _load(self) -> Dict[str, Dict[int, str]]:
+        async with async_session() as session:
+            session.info["read_only"] = True
+            products = await session.execute(select(Product.id, Product.name))
+            customers = await session.execute(select(Customer.id, Customer.first_name, Customer.last_name))
+            suppliers = await session.execute(select(Supplier.id, Supplier.name))
+            return {
+                "products": {id: name for id, name in products.all() if name},
+                "customers": {id: f"{first} {last}" for id, first, last in customers.all()},
+                "suppliers": {id: name for id, name in suppliers.all() if name},
+            }
+
+    async def rebuild(self) -> int:
+        """
+        Reload every index from the database and swap it in. Returns how many
+        entries differed from the previous in-memory state.
+        """
+        async with self._lock:
+            started = time.perf_counter()
+            self._journal = []
+            try:
+                snapshot = await self._load()
+                indexes = {kind: PrefixIndex(names) for kind, names in snapshot.items()}
+                for kind, id, name in self._journal:
+                    indexes[kind].upsert(id, name)
+            finally:
+                journal, self._journal = self._journal, None
+
+            drift = 0
+            for kind, index in indexes.items():
+                before, after = self._indexes[kind].names(), index.names()
+                drift += sum(1 for id in before.keys() | after.keys() if before.get(id) != after.get(id))
+            self._indexes = indexes
+
+            logger.info(
+                "Autocomplete index rebuilt",
+                extra={"extra_fields": {
+                    **{kind: len(index) for kind, index in indexes.items()},
+                    "drift": drift,
+                    "replayed": len(journal),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                }}
+            )
+            return drift
+
+    async def reconcile_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.AUTOCOMPLETE_RECONCILE_SECONDS)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.warning(f"Autocomplete reconciliation failed: {str(e)}")
+
+
+autocomplete_index = AutocompleteIndex()
@@ -4,6 +4,7 @@ import json
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 from logging.config import dictConfig
+from importlib.util import find_spec
 
 load_dotenv()
 
@@ -38,13 +39,68 @@ class Settings:
     PROJECT_DESCRIPTION: str = "InventoryFlow is a blazing-fast, API-first inventory management system that helps you organize stock, manage orders, and automate communication across your supply chain — all with clean code and a modular design."
 
     DATABASE_URL= os.getenv("DB_URL")
+    DATABASE_REPLICA_URL= os.getenv("DB_REPLICA_URL")
+    READ_YOUR_WRITES_SECONDS= float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
     JWT_SECRET_KEY= os.getenv("JWT_SECRET_KEY")
     JWT_ALGORITHM= os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES= int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 5))
+    REFRESH_TOKEN_EXPIRE_DAYS= int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+    TOKEN_VERSION_CACHE_SECONDS= float(os.getenv("TOKEN_VERSION_CACHE_SECONDS", 30))
+    REFRESH_TOKEN_STORE= os.getenv("REFRESH_TOKEN_STORE", "database").lower()  # "memory", "database" or "redis"
+    REFRESH_TOKEN_PRUNE_SECONDS= float(os.getenv("REFRESH_TOKEN_PRUNE_SECONDS", 3600))
+
+    PASSWORD_HASH_WORKERS= int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+    PASSWORD_HASH_QUEUE_LIMIT= int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64))
+
+    REDIS_URL= os.getenv("REDIS_URL")
+    USER_CACHE_MAX_SIZE= int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+    USER_CACHE_TTL_SECONDS= float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+
+    STARTUP_BUDGET_SECONDS= float(os.getenv("STARTUP_BUDGET_SECONDS", 5))
+    LOG_CONSOLE= os.getenv("LOG_CONSOLE", "rich").lower()  # "rich" or "json"
+
+    # Database engine profile
+    DB_POOL_SIZE= int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW= int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT= float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE= int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING= os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE= int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+    DB_ECHO= os.getenv("DB_ECHO", "false").lower()  # "false", "true" or "debug"
+    DB_POOL_WARMUP= int(os.getenv("DB_POOL_WARMUP", 5))
+    SQL_N_PLUS_ONE_THRESHOLD= int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+    EXPORT_BATCH_SIZE= int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+    AUTOCOMPLETE_RECONCILE_SECONDS= float(os.getenv("AUTOCOMPLETE_RECONCILE_SECONDS", 300))
+    BULK_MAX_LINES= int(os.getenv("BULK_MAX_LINES", 5000))
+    STOCK_TOTALS_RECONCILE_SECONDS= float(os.getenv("STOCK_TOTALS_RECONCILE_SECONDS", 600))
+    RESERVATION_TTL_SECONDS= int(os.getenv("RESERVATION_TTL_SECONDS", 900))
+    RESERVATION_MAX_TTL_SECONDS= int(os.getenv("RESERVATION_MAX_TTL_SECONDS", 3600))
+    RESERVATION_SWEEP_SECONDS= float(os.getenv("RESERVATION_SWEEP_SECONDS", 15))
+    RESERVATION_SWEEP_BATCH= int(os.getenv("RESERVATION_SWEEP_BATCH", 500))
+
+    IDEMPOTENCY_STORE= os.getenv("IDEMPOTENCY_STORE", "memory").lower()  # "memory" or "redis"
+    IDEMPOTENCY_TTL_SECONDS= float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+    IDEMPOTENCY_MAX_KEYS= int(os.getenv("IDEMPOTENCY_MAX_KEYS", 10000))
+    IDEMPOTENCY_WAIT_SECONDS= float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 30))
 
 class LoggingSettings:
     @staticmethod
     def setup_logging():
+        # Only pull in rich when it is both wanted and installed
+        if settings.LOG_CONSOLE == "rich" and find_spec("rich") is not None:
+            console_handler = {
+                "class": "rich.logging.RichHandler",
+                "rich_tracebacks": True,
+                "show_time": True,
+                "show_path": False,
+                "markup": True,
+            }
+        else:
+            console_handler = {
+                "class": "logging.StreamHandler",
+                "formatter": "json",
+            }
+
         logging_config = {
             "version": 1,
             "disable_existing_loggers": False,
@@ -54,13 +110,7 @@ class LoggingSettings:
                 },
             },
             "handlers": {
-                "console": {
-                    "class": "rich.logging.RichHandler",
-                    "rich_tracebacks": True,
-                    "show_time": True,
-                    "show_path": False,
-                    "markup": True,
-                },
+                "console": console_handler,
                 "file": {
                     "class": "logging.handlers.RotatingFileHandler",
                     "formatter": "json",
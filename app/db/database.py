@@ -1,19 +1,246 @@
+import asyncio
+import math
+import time
+from fastapi import Request, Response
+from greenlet import getcurrent
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import URL, make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql.dml import UpdateBase
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app import settings
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
-engine = create_async_engine(SQLALCHEMY_DATABASE_URL, echo=True)
+SQLALCHEMY_REPLICA_URL = settings.DATABASE_REPLICA_URL
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long callers wait for a free connection and,
+    separately, how long opening new connections takes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.connects = 0
+        self.total_connect = 0.0
+        self.max_connect = 0.0
+        # Checkout in progress (one greenlet each) -> time it spent connecting
+        self._checkout_connect: dict = {}
+
+    def _do_get(self):
+        checkout = getcurrent()
+        if checkout in self._checkout_connect:
+            # QueuePool retries by calling itself; the outer call does the accounting
+            return super()._do_get()
+        self._checkout_connect[checkout] = 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start - self._checkout_connect.pop(checkout)
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            self.connects += 1
+            self.total_connect += elapsed
+            self.max_connect = max(self.max_connect, elapsed)
+            checkout = getcurrent()
+            if checkout in self._checkout_connect:
+                self._checkout_connect[checkout] += elapsed
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.total_wait, pool.max_wait = self.total_wait, self.max_wait
+        pool.connects, pool.total_connect, pool.max_connect = self.connects, self.total_connect, self.max_connect
+        return pool
+
+
+def _echo_option(value: str):
+    if value == "debug":
+        return "debug"
+    return value == "true"
+
+
+def engine_options(url: str) -> dict:
+    """
+    Build the create_async_engine keyword arguments for the configured profile.
+    Pool tuning only applies to server databases; SQLite keeps its own pool.
+    """
+    options = {"echo": _echo_option(settings.DB_ECHO)}
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    if make_url(url).get_driver_name() == "asyncpg":
+        # asyncpg's own cache; SQLAlchemy's prepared statement cache is set on the URL
+        options["connect_args"] = {"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+def engine_url(url: str) -> URL:
+    """
+    The database URL with the configured prepared statement cache size for
+    SQLAlchemy's asyncpg dialect, unless the URL already sets one.
+    """
+    parsed = make_url(url)
+    if parsed.get_driver_name() == "asyncpg" and "prepared_statement_cache_size" not in parsed.query:
+        parsed = parsed.update_query_dict({"prepared_statement_cache_size": str(settings.DB_STATEMENT_CACHE_SIZE)})
+    return parsed
+
+
+engine = create_async_engine(engine_url(SQLALCHEMY_DATABASE_URL), **engine_options(SQLALCHEMY_DATABASE_URL))
+replica_engine = (
+    create_async_engine(engine_url(SQLALCHEMY_REPLICA_URL), **engine_options(SQLALCHEMY_REPLICA_URL))
+    if SQLALCHEMY_REPLICA_URL else None
+)
 Base = declarative_base()
 
+# Cookie carrying the wall-clock time of the client's last committed write, so
+# every worker can keep that client's reads on the primary
+LAST_WRITE_COOKIE = "last_write"
+
+
+def recently_wrote(last_write: str | None) -> bool:
+    if not last_write:
+        return False
+    try:
+        written_at = float(last_write)
+    except ValueError:
+        return False
+    # abs() tolerates clock skew between workers without letting a forged
+    # future timestamp pin reads to the primary for longer than the window
+    return abs(time.time() - written_at) < settings.READ_YOUR_WRITES_SECONDS
+
+
+class RoutingSession(Session):
+    """
+    Sends reads from read-only requests to the replica and everything else to the primary.
+
+    A session is read-only when `get_db` served a safe HTTP method. Flushes and
+    DML always go to the primary, and clients whose last_write cookie shows a
+    write within READ_YOUR_WRITES_SECONDS keep reading from the primary so they see it.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["has_writes"] = True
+            return engine.sync_engine
+        if (
+            replica_engine is None
+            or not self.info.get("read_only")
+            or self.info.get("recent_write")
+        ):
+            return engine.sync_engine
+        return replica_engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_writer(session):
+    response = session.info.get("response")
+    if session.info.pop("has_writes", False) and response is not None:
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            f"{time.time():.3f}",
+            max_age=math.ceil(settings.READ_YOUR_WRITES_SECONDS),
+            httponly=True,
+            samesite="lax",
+        )
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("has_writes", None)
+
+
 async_session = sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False
 )
 
+
+def get_pool_stats(target=None) -> dict:
+    """
+    Snapshot of the live connection pool for the given engine (primary by default).
+    """
+    pool = (target or engine).pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            timeouts=pool.timeouts,
+            total_wait_ms=round(pool.total_wait * 1000, 3),
+            avg_wait_ms=round(pool.total_wait * 1000 / pool.checkouts, 3) if pool.checkouts else 0.0,
+            max_wait_ms=round(pool.max_wait * 1000, 3),
+            connects=pool.connects,
+            total_connect_ms=round(pool.total_connect * 1000, 3),
+            avg_connect_ms=round(pool.total_connect * 1000 / pool.connects, 3) if pool.connects else 0.0,
+            max_connect_ms=round(pool.max_connect * 1000, 3),
+        )
+    return stats
+
+
+async def warm_up_pool(target, connections: int) -> None:
+    """
+    Open up to `connections` pooled connections at once so they are ready
+    before the first requests arrive.
+    """
+    size = target.pool.size() if isinstance(target.pool, AsyncAdaptedQueuePool) else 1
+    connections = min(connections, size)
+    if connections <= 0:
+        return
+
+    opened = await asyncio.gather(*(target.connect() for _ in range(connections)), return_exceptions=True)
+    try:
+        for conn in opened:
+            if isinstance(conn, BaseException):
+                raise conn
+            await conn.execute(text("SELECT 1"))
+    finally:
+        for conn in opened:
+            if not isinstance(conn, BaseException):
+                await conn.close()
+
+
 # Function to create database connection
-async def get_db():
+async def get_db(request: Request, response: Response):
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        session.info["read_only"] = request.method in READ_ONLY_METHODS
+        session.info["recent_write"] = recently_wrote(request.cookies.get(LAST_WRITE_COOKIE))
+        session.info["response"] = response
+        yield session
@@ -0,0 +1,158 @@
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+from typing import Any, Dict, List, Mapping, Tuple, Type
+from fastapi import HTTPException, Request
+from sqlalchemy.orm import DeclarativeMeta
+from sqlalchemy.sql.elements import ColumnElement
+from app.db.models import Category, Product, Stock, Customer, Supplier, IncomingOrder, OutgoingOrder
+
+# Query parameters that belong to pagination or exports rather than filtering
+RESERVED_PARAMS = {"limit", "after", "before", "sort_by", "order", "format"}
+
+EQUALITY = ("eq", "in")
+RANGE = ("gt", "gte", "lt", "lte")
+DATE_RANGE = RANGE + ("on",)
+
+# Whitelisted filters per model: field -> allowed operators.
+# Every field listed here must lead an index; tests/test_filters.py enforces it.
+FILTERABLE_FIELDS: Dict[Type[DeclarativeMeta], Dict[str, Tuple[str, ...]]] = {
+    Category: {
+        "name": ("eq",),
+    },
+    Product: {
+        "name": ("eq",),
+        "category_id": EQUALITY,
+        "price": RANGE,
+        "created_at": DATE_RANGE,
+    },
+    Stock: {
+        "product_id": EQUALITY,
+        "expiry_date": DATE_RANGE,
+        "created_at": DATE_RANGE,
+    },
+    Customer: {
+        "last_name": ("eq",),
+        "created_at": DATE_RANGE,
+    },
+    Supplier: {
+        "name": ("eq",),
+        "created_at": DATE_RANGE,
+    },
+    IncomingOrder: {
+        "status": EQUALITY,
+        "supplier_id": EQUALITY,
+        "product_id": EQUALITY,
+        "supply_date": DATE_RANGE,
+        "created_at": DATE_RANGE,
+    },
+    OutgoingOrder: {
+        "status": EQUALITY,
+        "customer_id": EQUALITY,
+        "product_id": EQUALITY,
+        "order_date": DATE_RANGE,
+        "created_at": DATE_RANGE,
+    },
+}
+
+
+def _parse_datetime(raw: str) -> datetime:
+    value = datetime.fromisoformat(raw)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _coerce(column, raw: str) -> Any:
+    python_type = column.type.python_type
+    if issubclass(python_type, Enum):
+        return python_type(raw)
+    if python_type is datetime:
+        return _parse_datetime(raw)
+    if python_type is Decimal:
+        return Decimal(raw)
+    if python_type is int:
+        return int(raw)
+    return raw
+
+
+def _day_window(raw: str) -> Tuple[datetime, datetime]:
+    day = date.fromisoformat(raw)
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _clause(attribute, column, op: str, raw: str) -> ColumnElement:
+    # Each operator compares the bare column to constants so that the
+    # predicate stays SARGable and can be answered from the column's index.
+    if op == "in":
+        return attribute.in_([_coerce(column, item) for item in raw.split(",") if item])
+    if op == "on":
+        start, end = _day_window(raw)
+        return (attribute >= start) & (attribute < end)
+
+    value = _coerce(column, raw)
+    if op == "eq":
+        return attribute == value
+    if op == "gt":
+        return attribute > value
+    if op == "gte":
+        return attribute >= value
+    if op == "lt":
+        return attribute < value
+    return attribute <= value
+
+
+def parse_filters(model: Type[DeclarativeMeta], params: Mapping[str, str]) -> List[ColumnElement]:
+    """
+    Turn `field` / `field__op` query parameters into WHERE clauses for `model`.
+    Fields and operators must be whitelisted in FILTERABLE_FIELDS.
+    """
+    allowed = FILTERABLE_FIELDS.get(model, {})
+    clauses = []
+    for key, raw in params.items():
+        if key in RESERVED_PARAMS:
+            continue
+        field, _, op = key.partition("__")
+        op = op or "eq"
+        if field not in allowed:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot filter by '{field}'. Filterable fields: {', '.join(sorted(allowed)) or 'none'}"
+            )
+        if op not in allowed[field]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported operator '{op}' for '{field}'. Allowed: {', '.join(allowed[field])}"
+            )
+        attribute = getattr(model, field)
+        column = model.__table__.columns[field]
+        try:
+            clauses.append(_clause(attribute, column, op, raw))
+        except (ValueError, InvalidOperation):
+            raise HTTPException(status_code=400, detail=f"Invalid value for '{key}': {raw}")
+    return clauses
+
+
+def filter_params(model: Type[DeclarativeMeta]):
+    """
+    Dependency factory that parses a list endpoint's filter query parameters.
+    """
+    async def _get_filters(request: Request) -> List[ColumnElement]:
+        return parse_filters(model, request.query_params)
+
+    return _get_filters
+
+
+def unindexed_filters() -> List[str]:
+    """
+    Whitelisted filter fields that no index leads with, i.e. filters that
+    would fall back to a sequential scan.
+    """
+    missing = []
+    for model, fields in FILTERABLE_FIELDS.items():
+        table = model.__table__
+        leading = {index.columns.values()[0].name for index in table.indexes}
+        leading.update(column.name for column in table.primary_key.columns)
+        missing.extend(f"{table.name}.{field}" for field in fields if field not in leading)
+    return missing
@@ -0,0 +1,101 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalise a SQL statement so that executions differing only in their
+    bound values (including expanded IN lists) share the same shape.
+    """
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """
+    Statement count, DB time and statement shapes collected for one unit of work.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes: Counter = Counter()
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.total_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_statements(self, threshold: int) -> Dict[str, int]:
+        """
+        Statement shapes executed at least `threshold` times, a likely N+1 pattern.
+        """
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Count every statement executed in the current context, e.g.
+
+        with track_queries() as stats:
+            await service.create_outgoing_order(order)
+        assert stats.count <= 4
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    timers = conn.info.get("query_start_time")
+    if stats is None or not timers:
+        return
+    stats.record(statement, time.perf_counter() - timers.pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _record_failed_query(context):
+    # A failed statement never reaches after_cursor_execute; without this its
+    # start time would stay on the pooled connection and pair with a later one
+    conn = context.connection
+    timers = conn.info.get("query_start_time") if conn is not None else None
+    if not timers:
+        return
+    started = timers.pop()
+    stats = _current_stats.get()
+    if stats is not None and context.statement is not None:
+        stats.record(context.statement, time.perf_counter() - started)
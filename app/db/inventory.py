@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from fastapi import HTTPException
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import settings
+from app.db.database import async_session
+from app.db.models import ProductStockTotal, Stock, StockMovement, StockMovementReasonEnum
+
+logger = logging.getLogger(__name__)
+
+# Candidate batches read per query while allocating across a product's batches
+ALLOCATION_PAGE_SIZE = 5
+
+# PostgreSQL SQLSTATEs of a deadlock and a serialization failure
+LOCK_CONFLICT_SQLSTATES = ("40P01", "40001")
+
+
+class StockChange(NamedTuple):
+    stock_id: int
+    # Signed: negative takes from the batch, positive returns to it
+    quantity: int
+    # Order or other record that caused the change
+    reference_id: Optional[int] = None
+
+
+class StockReceipt(NamedTuple):
+    stock_id: int
+    product_id: int
+    quantity: int
+    reference_id: Optional[int] = None
+
+
+async def raise_batch_unavailable(db: AsyncSession, stock_id: int, quantity: int, product_id: Optional[int] = None) -> None:
+    """
+    Explain why a guarded decrement of one chosen batch changed nothing:
+    raises 404 if the batch does not exist (or, with `product_id`, belongs
+    to another product) and 400 if it has less than `quantity` available.
+    Only called on that failure path, after the caller rolled back.
+    """
+    query = select(Stock.available_quantity).where(Stock.id == stock_id)
+    if product_id is not None:
+        query = query.where(Stock.product_id == product_id)
+    result = await db.execute(query)
+    available_quantity = result.scalar_one_or_none()
+
+    if available_quantity is None:
+        logger.warning(
+            "Stock not found",
+            extra={"extra_fields": {"stock_id": stock_id}}
+        )
+        raise HTTPException(status_code=404, detail="Stock not found")
+    if available_quantity >= quantity:
+        # Restocked since the decrement failed
+        raise HTTPException(status_code=409, detail="Stock changed during allocation, please retry")
+    logger.warning(
+        "Insufficient stock",
+        extra={"extra_fields": {
+            "stock_id": stock_id,
+            "requested_quantity": quantity,
+            "available_quantity": available_quantity
+        }}
+    )
+    raise HTTPException(
+        status_code=400,
+        detail=f"Insufficient stock. Available: {available_quantity}, Requested: {quantity}"
+    )
+
+
+async def claim_product(db: AsyncSession, product_id: int, quantity: int, strategy: str = "fefo") -> Optional[Dict[int, int]]:
+    """
+    Claim `quantity` of a product from its batches, earliest expiry first
+    (FEFO, undated batches last) or oldest first (FIFO), splitting across
+    batches as needed. Returns the quantity to take per stock id, in order.
+
+    Only the batches that are drawn from get locked. Returns None if one of
+    them lost stock to another transaction before it was locked, in which
+    case the caller rolls back and tries again. Raises 400 if the product
+    does not have `quantity` available, leaving the rollback to the caller.
+    """
+    order_by = (Stock.expiry_date.asc().nulls_last(), Stock.id) if strategy == "fefo" else (Stock.created_at, Stock.id)
+
+    # Choose the batches without locking, so concurrent orders do not
+    # queue on batches they end up not drawing from
+    claimed: Dict[int, int] = {}
+    remaining = quantity
+    while remaining > 0:
+        result = await db.execute(
+            select(Stock.id, Stock.available_quantity)
+            .where(Stock.product_id == product_id, Stock.available_quantity > 0, Stock.id.not_in(list(claimed)))
+            .order_by(*order_by)
+            .limit(ALLOCATION_PAGE_SIZE)
+        )
+        rows = result.all()
+        for stock_id, available in rows:
+            if remaining > 0:
+                claimed[stock_id] = min(available, remaining)
+                remaining -= claimed[stock_id]
+        if len(rows) < ALLOCATION_PAGE_SIZE:
+            break
+
+    if remaining > 0:
+        available = quantity - remaining
+        logger.warning(
+            "Insufficient stock",
+            extra={"extra_fields": {
+                "product_id": product_id,
+                "requested_quantity": quantity,
+                "available_quantity": available
+            }}
+        )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Insufficient stock. Available: {available}, Requested: {quantity}"
+        )
+
+    # Lock in stock id order, as the bulk path does, so that two orders
+    # drawing from the same batches cannot deadlock on each other
+    result = await db.execute(
+        select(Stock.id, Stock.available_quantity)
+        .where(Stock.id.in_(list(claimed)))
+        .order_by(Stock.id)
+        .with_for_update()
+    )
+    locked = dict(result.all())
+    if any(locked.get(stock_id, 0) < take for stock_id, take in claimed.items()):
+        return None
+    return claimed
+
+
+def is_lock_conflict(error: DBAPIError) -> bool:
+    """
+    Whether the database aborted the transaction over a deadlock or a
+    serialization failure, which is worth retrying from the start.
+    """
+    sqlstate = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+    return sqlstate in LOCK_CONFLICT_SQLSTATES
+
+
+async def apply_stock_changes(
+    db: AsyncSession,
+    changes: Sequence[StockChange],
+    reason: StockMovementReasonEnum,
+    guard: bool = True,
+    user_id: Optional[int] = None,
+    product_id: Optional[int] = None,
+) -> bool:
+    """
+    Apply quantity changes to existing batches with one UPDATE and record a
+    movement per change, in the caller's transaction.
+
+    Returns False if a batch does not exist, belongs to a product other than
+    `product_id` or, with `guard`, would go below zero. Some batches may have
+    been changed by then, so the caller must roll back.
+    """
+    if not changes:
+        return True
+    deltas: Dict[int, int] = defaultdict(int)
+    for change in changes:
+        deltas[change.stock_id] += change.quantity
+
+    delta = case(deltas, value=Stock.id)
+    query = (
+        update(Stock)
+        .where(Stock.id.in_(deltas))
+        .values(available_quantity=Stock.available_quantity + delta)
+        .returning(Stock.id, Stock.product_id, Stock.available_quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if guard:
+        query = query.where(Stock.available_quantity + delta >= 0)
+    if product_id is not None:
+        query = query.where(Stock.product_id == product_id)
+    result = await db.execute(query)
+    rows = result.all()
+    if len(rows) != len(deltas):
+        return False
+
+    products = {row.id: row.product_id for row in rows}
+    balances = {row.id: row.available_quantity for row in rows}
+    # Walk back from the final balances so that several changes to one
+    # batch each record the balance right after them
+    movements = []
+    for change in reversed(changes):
+        movements.append({
+            "stock_id": change.stock_id,
+            "product_id": products[change.stock_id],
+            "quantity": change.quantity,
+            "balance_after": balances[change.stock_id],
+            "reason": reason,
+            "reference_id": change.reference_id,
+            "user_id": user_id,
+        })
+        balances[change.stock_id] -= change.quantity
+    movements.reverse()
+    await record_stock_movements(db, movements)
+    return True
+
+
+async def record_receipts(db: AsyncSession, receipts: Sequence[StockReceipt], user_id: Optional[int] = None) -> None:
+    """
+    Record the opening movement of batches that were just inserted.
+    """
+    await record_stock_movements(db, [
+        {
+            "stock_id": receipt.stock_id,
+            "product_id": receipt.product_id,
+            "quantity": receipt.quantity,
+            "balance_after": receipt.quantity,
+            "reason": StockMovementReasonEnum.receipt,
+            "reference_id": receipt.reference_id,
+            "user_id": user_id,
+        }
+        for receipt in receipts
+    ])
+
+
+async def record_stock_movements(db: AsyncSession, movements: List[Dict[str, Any]]) -> None:
+    if not movements:
+        return
+    # Taken after the UPDATE has locked the batches, so the movements of a
+    # batch are in timestamp order even when transactions race for it
+    created_at = datetime.now(timezone.utc)
+    await db.execute(insert(StockMovement), [{**movement, "created_at": created_at} for movement in movements])
+
+    deltas: Dict[int, int] = defaultdict(int)
+    for movement in movements:
+        if movement["product_id"] is not None:
+            deltas[movement["product_id"]] += movement["quantity"]
+    await _add_to_product_totals(db, deltas, created_at)
+
+
+async def _add_to_product_totals(db: AsyncSession, deltas: Dict[int, int], now: datetime) -> None:
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if deltas:
+        # Rows in product id order, so that concurrent upserts lock them in the same order
+        await _upsert_product_totals(db, {product_id: deltas[product_id] for product_id in sorted(deltas)}, now, add=True)
+
+
+async def _upsert_product_totals(db: AsyncSession, quantities: Dict[int, int], now: datetime, add: bool) -> None:
+    """
+    Add `quantities` to the product totals, or overwrite them unless `add`,
+    creating missing rows either way.
+    """
+    dialect = sqlite if db.get_bind().dialect.name == "sqlite" else postgresql
+    query = dialect.insert(ProductStockTotal).values([
+        {"product_id": product_id, "quantity": quantity, "updated_at": now}
+        for product_id, quantity in quantities.items()
+    ])
+    quantity = ProductStockTotal.quantity + query.excluded.quantity if add else query.excluded.quantity
+    await db.execute(query.on_conflict_do_update(
+        index_elements=[ProductStockTotal.product_id],
+        set_={"quantity": quantity, "updated_at": query.excluded.updated_at}
+    ))
+
+
+async def reconcile_product_totals() -> int:
+    """
+    Compare every product total with the sum of its batches and repair the
+    ones that drifted. Returns how many were repaired.
+    """
+    started = time.perf_counter()
+    async with async_session() as session:
+        result = await session.execute(
+            select(Stock.product_id, func.sum(Stock.available_quantity))
+            .where(Stock.product_id.is_not(None))
+            .group_by(Stock.product_id)
+        )
+        actual = {product_id: quantity or 0 for product_id, quantity in result.all()}
+        result = await session.execute(select(ProductStockTotal.product_id, ProductStockTotal.quantity))
+        recorded = dict(result.all())
+        drifted = sorted(
+            product_id for product_id in actual.keys() | recorded.keys()
+            if actual.get(product_id, 0) != recorded.get(product_id, 0)
+        )
+        await session.rollback()
+
+        repaired: List[int] = []
+        if drifted:
+            # Lock the totals before summing the batches again: a transaction
+            # that changed a batch but has not yet added to the total then
+            # waits for the repair and adds its delta on top of it
+            result = await session.execute(
+                select(ProductStockTotal.product_id, ProductStockTotal.quantity)
+                .where(ProductStockTotal.product_id.in_(drifted))
+                .order_by(ProductStockTotal.product_id)
+                .with_for_update()
+            )
+            locked = dict(result.all())
+            result = await session.execute(
+                select(Stock.product_id, func.sum(Stock.available_quantity))
+                .where(Stock.product_id.in_(drifted))
+                .group_by(Stock.product_id)
+            )
+            sums = {product_id: quantity or 0 for product_id, quantity in result.all()}
+            # The first comparison read the two tables at different moments,
+            # so only what still differs under the lock is real drift
+            repaired = [product_id for product_id in drifted if sums.get(product_id, 0) != locked.get(product_id, 0)]
+            if repaired:
+                await _upsert_product_totals(
+                    session, {product_id: sums.get(product_id, 0) for product_id in repaired}, datetime.now(timezone.utc), add=False
+                )
+                logger.warning(
+                    "Product stock totals drifted and were repaired",
+                    extra={"extra_fields": {
+                        "drift": {product_id: sums.get(product_id, 0) - locked.get(product_id, 0) for product_id in repaired[:50]},
+                        "repaired": len(repaired)
+                    }}
+                )
+            await session.commit()
+
+    logger.info(
+        "Product stock totals reconciled",
+        extra={"extra_fields": {
+            "products": len(actual),
+            "repaired": len(repaired),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        }}
+    )
+    return len(repaired)
+
+
+async def reconcile_product_totals_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.STOCK_TOTALS_RECONCILE_SECONDS)
+        try:
+            await reconcile_product_totals()
+        except Exception as e:
+            logger.warning(f"Product stock totals reconciliation failed: {str(e)}")
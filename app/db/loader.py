@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import DeclarativeMeta, selectinload
+from app.db.models import Product, Stock, IncomingOrder, OutgoingOrder
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Relationships the *Response schemas serialize, loaded with every batch so
+# that nothing lazy-loads (and fails) outside the greenlet afterwards.
+LOAD_OPTIONS = {
+    Product: (selectinload(Product.category),),
+    Stock: (selectinload(Stock.product),),
+    IncomingOrder: (selectinload(IncomingOrder.supplier), selectinload(IncomingOrder.product)),
+    OutgoingOrder: (selectinload(OutgoingOrder.customer), selectinload(OutgoingOrder.product), selectinload(OutgoingOrder.allocations)),
+}
+
+
+class DataLoader:
+    """
+    Coalesces the per-id lookups made while serving one request into a single
+    `WHERE id IN (...)` query per model.
+
+    Every `load()` issued before the event loop gets back to the loader (e.g.
+    from coroutines started with asyncio.gather) is answered by the same
+    query, and each id is fetched at most once per request.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._results: Dict[Tuple[Type[DeclarativeMeta], Any], asyncio.Future] = {}
+        self._queue: Dict[Type[DeclarativeMeta], List[Any]] = {}
+        self._dispatch: Optional[asyncio.Task] = None
+
+    def load(self, model: Type[DeclarativeMeta], key: Any) -> "asyncio.Future":
+        """
+        Future resolving to the `model` row with primary key `key`, or None.
+        """
+        future = self._results.get((model, key))
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._results[(model, key)] = future
+        self._queue.setdefault(model, []).append(key)
+        if self._dispatch is None:
+            self._dispatch = loop.create_task(self._run())
+        return future
+
+    async def load_many(self, model: Type[DeclarativeMeta], keys: Iterable[Any]) -> List[Optional[Any]]:
+        return list(await asyncio.gather(*(self.load(model, key) for key in keys)))
+
+    async def _run(self) -> None:
+        # Yield once so that every load() issued in the current tick is batched
+        await asyncio.sleep(0)
+        try:
+            while self._queue:
+                model, keys = self._queue.popitem()
+                await self._fetch(model, keys)
+        finally:
+            self._dispatch = None
+
+    async def _fetch(self, model: Type[DeclarativeMeta], keys: List[Any]) -> None:
+        try:
+            result = await self.db.execute(
+                select(model)
+                .options(*LOAD_OPTIONS.get(model, ()))
+                .where(model.id.in_(keys))
+            )
+            rows = {row.id: row for row in result.scalars().all()}
+        except Exception as e:
+            logger.error(
+                "Batch load failed",
+                extra={"extra_fields": {"model": model.__name__, "keys": len(keys), "error": str(e)}}
+            )
+            for key in keys:
+                future = self._results.pop((model, key))
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key in keys:
+            future = self._results[(model, key)]
+            if not future.done():
+                future.set_result(rows.get(key))
+
+
+def get_loader(db: AsyncSession) -> DataLoader:
+    """
+    The DataLoader bound to this (request-scoped) session.
+    """
+    loader = db.info.get("loader")
+    if loader is None:
+        loader = db.info["loader"] = DataLoader(db)
+    return loader
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 from app.db.database import Base
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum as SqlEnum, Numeric
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Enum as SqlEnum, Numeric, Index
 from sqlalchemy.orm import relationship
 from enum import Enum
 
@@ -15,6 +15,21 @@ class OrderStatusEnum(str, Enum):
     completed = "completed"
     cancelled = "cancelled"
 
+class StockMovementReasonEnum(str, Enum):
+    opening = "opening"
+    receipt = "receipt"
+    sale = "sale"
+    cancellation = "cancellation"
+    adjustment = "adjustment"
+    reservation = "reservation"
+    release = "release"
+
+class ReservationStatusEnum(str, Enum):
+    active = "active"
+    converted = "converted"
+    released = "released"
+    expired = "expired"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -25,6 +40,7 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String, nullable=False)
     role = Column(SqlEnum(UserRole, name="user_role"), default=UserRole.customer)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
@@ -32,8 +48,24 @@ class User(Base):
     suppliers = relationship("Supplier", back_populates="user")
 
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String, primary_key=True)
+    family_id = Column(String, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
 class Category(Base):
     __tablename__ = "categories"
+    # Composite (column, id) indexes back keyset pagination on these columns
+    __table_args__ = (
+        Index("ix_categories_name_id", "name", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
@@ -46,12 +78,17 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     description = Column(String, nullable=True)
     price = Column(Numeric(10, 2), nullable=True)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
@@ -63,6 +100,12 @@ class Product(Base):
 
 class Stock(Base):
     __tablename__ = "stocks"
+    __table_args__ = (
+        Index("ix_stocks_expiry_date_id", "expiry_date", "id"),
+        Index("ix_stocks_created_at_id", "created_at", "id"),
+        Index("ix_stocks_product_id_expiry_date", "product_id", "expiry_date"),
+        Index("ix_stocks_product_id_created_at", "product_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
@@ -80,6 +123,10 @@ class Stock(Base):
 
 class Customer(Base):
     __tablename__ = "customers"
+    __table_args__ = (
+        Index("ix_customers_last_name_id", "last_name", "id"),
+        Index("ix_customers_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -96,6 +143,10 @@ class Customer(Base):
 
 class Supplier(Base):
     __tablename__ = "suppliers"
+    __table_args__ = (
+        Index("ix_suppliers_name_id", "name", "id"),
+        Index("ix_suppliers_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -112,10 +163,14 @@ class Supplier(Base):
 
 class IncomingOrder(Base):
     __tablename__ = "incoming_orders"
+    __table_args__ = (
+        Index("ix_incoming_orders_supply_date_id", "supply_date", "id"),
+        Index("ix_incoming_orders_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    supplier_id = Column(Integer, ForeignKey("suppliers.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     batch_number = Column(String, nullable=False)
     quantity = Column(Integer, default=0)
     unit_cost = Column(Numeric(10, 2), nullable=False)
@@ -123,7 +178,7 @@ class IncomingOrder(Base):
     supply_date = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
-    status = Column(SqlEnum(OrderStatusEnum, name="order_status_enum"), default=OrderStatusEnum.pending, nullable=False)
+    status = Column(SqlEnum(OrderStatusEnum, name="order_status_enum"), default=OrderStatusEnum.pending, nullable=False, index=True)
     supplier = relationship("Supplier", back_populates="incoming_orders")
     product = relationship("Product", back_populates="incoming_orders")
     stocks = relationship("Stock", back_populates="incoming_order")
@@ -131,15 +186,19 @@ class IncomingOrder(Base):
 
 class OutgoingOrder(Base):
     __tablename__ = "outgoing_orders"
+    __table_args__ = (
+        Index("ix_outgoing_orders_order_date_id", "order_date", "id"),
+        Index("ix_outgoing_orders_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    customer_id = Column(Integer, ForeignKey("customers.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     stock_id = Column(Integer, ForeignKey("stocks.id"))
     quantity = Column(Integer, default=0)
     unit_price = Column(Numeric(10, 2), nullable=True)
     total_price = Column(Numeric(10, 2), default=0)
-    status = Column(SqlEnum(OrderStatusEnum, name="order_status_enum"), default=OrderStatusEnum.pending, nullable=False)
+    status = Column(SqlEnum(OrderStatusEnum, name="order_status_enum"), default=OrderStatusEnum.pending, nullable=False, index=True)
     order_date = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
@@ -147,3 +206,94 @@ class OutgoingOrder(Base):
     customer = relationship("Customer", back_populates="outgoing_orders")
     product = relationship("Product", back_populates="outgoing_orders")
     stock = relationship("Stock", back_populates="outgoing_orders")
+    allocations = relationship("OutgoingOrderAllocation", back_populates="outgoing_order", order_by="OutgoingOrderAllocation.id")
+
+
+class OutgoingOrderAllocation(Base):
+    """
+    Quantity of an outgoing order taken from one stock batch. An order drawn
+    from several batches has one row per batch.
+    """
+    __tablename__ = "outgoing_order_allocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    outgoing_order_id = Column(Integer, ForeignKey("outgoing_orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+
+    outgoing_order = relationship("OutgoingOrder", back_populates="allocations")
+
+
+class StockMovement(Base):
+    """
+    Append-only ledger of stock changes, written in the same transaction as
+    the change itself. `balance_after` is the batch's quantity once the
+    movement was applied, so every row is also a snapshot of its batch.
+    """
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        Index("ix_stock_movements_stock_id_created_at_id", "stock_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True, index=True)
+    quantity = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=False)
+    reason = Column(SqlEnum(StockMovementReasonEnum, name="stock_movement_reason_enum"), nullable=False)
+    # Outgoing/incoming order id, or reservation id for reservation and release movements
+    reference_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+class ProductStockTotal(Base):
+    """
+    Sum of `Stock.available_quantity` over a product's batches, kept in step
+    by the same transaction as every stock change.
+    """
+    __tablename__ = "product_stock_totals"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+
+
+class StockReservation(Base):
+    """
+    Quantity held for a customer until `expires_at`. The held quantity is
+    taken from the batches when the hold is placed, so it is already missing
+    from availability, and given back when the hold is released or expires.
+    """
+    __tablename__ = "stock_reservations"
+    # Lets the expiry sweeper read the due holds in expiry order
+    __table_args__ = (
+        Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(SqlEnum(ReservationStatusEnum, name="reservation_status_enum"), default=ReservationStatusEnum.active, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    outgoing_order_id = Column(Integer, ForeignKey("outgoing_orders.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    customer = relationship("Customer")
+    allocations = relationship("StockReservationAllocation", back_populates="reservation", order_by="StockReservationAllocation.id")
+
+
+class StockReservationAllocation(Base):
+    """
+    Quantity of a reservation held in one stock batch.
+    """
+    __tablename__ = "stock_reservation_allocations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    reservation_id = Column(Integer, ForeignKey("stock_reservations.id", ondelete="CASCADE"), nullable=False, index=True)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    reservation = relationship("StockReservation", back_populates="allocations")
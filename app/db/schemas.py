@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from pydantic import EmailStr
 from app.db.models import UserRole
-from typing import Optional, List, Any
+from typing import Optional, List, Generic, Literal, TypeVar
 from datetime import datetime
 
 class BaseAuth(BaseModel):
@@ -21,6 +21,9 @@ class AuthRegister(BaseAuth):
     phone: Optional[str] = None
     address: Optional[str] = None
 
+class AuthRefresh(BaseModel):
+    refresh_token: str
+
 class AuthResponse(BaseModel):
     access_token: str
     refresh_token: str
@@ -37,6 +40,8 @@ class User(BaseModel):
     last_name: str
     role: str
     email: str
+    customer_id: Optional[int] = None
+    supplier_id: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -150,6 +155,19 @@ class ProductSummary(BaseModel):
     class Config:
         from_attributes = True
 
+class ProductSearchResult(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    price: Optional[float]
+    category_id: Optional[int]
+    score: float
+
+class ProductAvailability(BaseModel):
+    product_id: int
+    available_quantity: int
+    updated_at: Optional[datetime]
+
 # Category Schemas
 class CategoryCreate(BaseModel):
     name: str
@@ -191,6 +209,31 @@ class StockSummary(BaseModel):
     class Config:
         from_attributes = True
 
+class StockMovementResponse(BaseModel):
+    id: int
+    stock_id: int
+    product_id: Optional[int]
+    quantity: int
+    balance_after: int
+    reason: str
+    reference_id: Optional[int]
+    user_id: Optional[int]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class StockBalance(BaseModel):
+    stock_id: int
+    product_id: Optional[int]
+    batch_number: Optional[str]
+    quantity: int
+
+class StockAsOfResponse(BaseModel):
+    at: datetime
+    total: int
+    stocks: List[StockBalance]
+
 
 #  IncomingOrder Schemas
 
@@ -235,16 +278,48 @@ class IncomingOrderSummary(BaseModel):
 class IncomingOrderStatusUpdate(BaseModel):
     status: str
 
+class OrderStatusBulkUpdate(BaseModel):
+    status: Literal["completed", "cancelled"]
+    # Orders to transition; when omitted, the request's filters select them
+    ids: Optional[List[int]] = None
+
+class OrderStatusBulkResponse(BaseModel):
+    status: str
+    updated: List[int]
+    # Requested ids that were not found or not in a state that allows the transition
+    skipped: List[int]
+
+class IncomingOrderBulkLine(BaseModel):
+    line: int
+    id: Optional[int] = None
+    stock_id: Optional[int] = None
+    error: Optional[str] = None
+
+class IncomingOrderBulkResponse(BaseModel):
+    mode: str
+    created: int
+    failed: int
+    results: List[IncomingOrderBulkLine]
+
 
 #  OutgoingOrder Schemas
 
 class OutgoingOrderCreate(BaseModel):
     customer_id: int
     product_id: int
-    stock_id: int
+    # Without a stock_id the quantity is allocated across batches by `allocation`
+    stock_id: Optional[int] = None
+    allocation: Literal["fefo", "fifo"] = "fefo"
     quantity: int
     order_date: datetime
 
+class StockAllocation(BaseModel):
+    stock_id: int
+    quantity: int
+
+    class Config:
+        from_attributes = True
+
 class OutgoingOrderResponse(BaseModel):
     id: int
     customer: CustomerSummary
@@ -254,6 +329,7 @@ class OutgoingOrderResponse(BaseModel):
     total_price: int
     status: str
     order_date: datetime
+    allocations: List[StockAllocation] = []
     created_at: datetime
     updated_at: datetime
 
@@ -272,6 +348,60 @@ class OutgoingOrderSummary(BaseModel):
     class Config:
         from_attributes = True
 
+class OutgoingOrderLine(BaseModel):
+    product_id: int
+    stock_id: int
+    quantity: int
+
+class OutgoingOrderBulkCreate(BaseModel):
+    customer_id: int
+    order_date: datetime
+    lines: List[OutgoingOrderLine]
+
+class OutgoingOrderLineError(BaseModel):
+    line: int
+    product_id: int
+    stock_id: int
+    requested: int
+    available: Optional[int] = None
+    error: str
+
+class OutgoingOrderBulkResponse(BaseModel):
+    customer_id: int
+    total_price: int
+    orders: List[OutgoingOrderSummary]
+
+#  Reservation Schemas
+
+class ReservationCreate(BaseModel):
+    customer_id: int
+    product_id: int
+    # Without a stock_id the quantity is held across batches by `allocation`
+    stock_id: Optional[int] = None
+    allocation: Literal["fefo", "fifo"] = "fefo"
+    quantity: int
+    # Defaults to RESERVATION_TTL_SECONDS, at most RESERVATION_MAX_TTL_SECONDS
+    ttl_seconds: Optional[int] = None
+
+class ReservationConvert(BaseModel):
+    # Defaults to the time of conversion
+    order_date: Optional[datetime] = None
+
+class ReservationResponse(BaseModel):
+    id: int
+    customer_id: int
+    product_id: int
+    quantity: int
+    status: str
+    expires_at: datetime
+    outgoing_order_id: Optional[int]
+    allocations: List[StockAllocation] = []
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
 # Dashboard Schemas
 
 class UserRoleDistribution(BaseModel):
@@ -310,12 +440,34 @@ class DashboardResponse(BaseModel):
     performance_metrics: PerformanceMetrics
     recent_activity: RecentActivity
 
+class PoolStats(BaseModel):
+    pool_class: str
+    size: Optional[int] = None
+    checked_in: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: Optional[int] = None
+    timeouts: Optional[int] = None
+    total_wait_ms: Optional[float] = None
+    avg_wait_ms: Optional[float] = None
+    max_wait_ms: Optional[float] = None
+    connects: Optional[int] = None
+    total_connect_ms: Optional[float] = None
+    avg_connect_ms: Optional[float] = None
+    max_connect_ms: Optional[float] = None
+
+class AutocompleteMatch(BaseModel):
+    id: int
+    name: str
+
 class Cursor(BaseModel):
     next: Optional[str] = None
     prev: Optional[str] = None
 
-class PaginatedResponse(BaseModel):
-    data: List[Any]
+T = TypeVar("T")
+
+class PaginatedResponse(BaseModel, Generic[T]):
+    data: List[T]
     cursor: Cursor
 
     class Config:
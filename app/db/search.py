@@ -0,0 +1,68 @@
+from difflib import SequenceMatcher
+from typing import Optional
+from sqlalchemy import func, literal, literal_column, or_
+from sqlalchemy.sql.elements import ColumnElement
+from app.db.models import Product
+
+# Text search configuration used by both the query and the GIN expression
+# index created in migration 5a2c9e71d4b0; they must stay identical.
+SEARCH_CONFIG = "simple"
+
+# Minimum score for the in-process matcher, tuned so that it returns roughly
+# what pg_trgm's default thresholds would on PostgreSQL
+FALLBACK_MIN_SCORE = 0.5
+
+
+def product_search_vector() -> ColumnElement:
+    # Constants are inlined rather than bound so that the planner can match
+    # the expression index even with generic prepared-statement plans
+    return func.to_tsvector(
+        literal_column(f"'{SEARCH_CONFIG}'"),
+        func.coalesce(Product.name, literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(Product.description, literal_column("''"))
+    )
+
+
+def product_search_condition(q: str) -> ColumnElement:
+    """
+    Index-backed match: trigram similarity on the name, word similarity on the
+    name or description (pg_trgm GIN indexes), or a full-text hit (tsvector GIN).
+    """
+    return or_(
+        Product.name.op("%")(q),
+        literal(q).op("<%")(Product.name),
+        literal(q).op("<%")(Product.description),
+        product_search_vector().op("@@")(func.plainto_tsquery(SEARCH_CONFIG, q)),
+    )
+
+
+def product_search_score(q: str) -> ColumnElement:
+    return func.greatest(
+        func.similarity(Product.name, q),
+        func.word_similarity(q, Product.name),
+        func.word_similarity(q, func.coalesce(Product.description, "")),
+        func.ts_rank(product_search_vector(), func.plainto_tsquery(SEARCH_CONFIG, q)),
+    )
+
+
+def fuzzy_score(q: str, name: Optional[str], description: Optional[str]) -> float:
+    """
+    In-process stand-in for the pg_trgm/tsvector ranking, used on backends
+    without those extensions (SQLite in development and tests).
+    """
+    q = q.lower()
+    best = 0.0
+    for text in (name, description):
+        if not text:
+            continue
+        text = text.lower()
+        if q in text:
+            # A substring hit ranks above any fuzzy one, and more so the
+            # larger the share of the text it covers
+            best = max(best, 0.5 + 0.5 * len(q) / len(text))
+            continue
+        # Compare word by word, like word_similarity(), unless the query itself has several words
+        candidates = text.split() + ([text] if " " in q else [])
+        best = max(best, max(SequenceMatcher(None, q, candidate).ratio() for candidate in candidates))
+    return round(best, 6)
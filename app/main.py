@@ -1,7 +1,14 @@
+import time
+_startup_began = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from app import settings, logging_settings
 import logging
 from app.middleware.cors import add_cors_middleware
+from app.middleware.sql_metrics import add_sql_metrics_middleware
+from app.middleware.idempotency import add_idempotency_middleware
 from app.routers.incoming_orders.incoming_orders import router as incoming_orders_router
 from app.routers.outgoing_orders.outgoing_orders import router as outgoing_orders_router
 from app.routers.stock.stock import router as stock_router
@@ -10,9 +17,16 @@ from app.routers.products.products import router as products_router
 from app.routers.customer.customer import router as customer_router
 from app.routers.supplier.supplier import router as supplier_router
 from app.routers.dashboard.dashboard import router as dashboard_router
+from app.routers.autocomplete.autocomplete import router as autocomplete_router
+from app.routers.reservations.reservations import router as reservations_router
 from app.auth.auth_route import router as auth_router
-from app.db.database import get_db
+from app.db.database import get_db, engine, replica_engine, warm_up_pool
+from app.autocomplete import autocomplete_index
+from app.db.inventory import reconcile_product_totals_forever
+from app.services.reservation_service import expire_reservations_forever
+from app.auth.token_store import prune_refresh_tokens_forever
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import configure_mappers
 from sqlalchemy import text
 
 
@@ -27,7 +41,49 @@ except Exception as e:
     logger.error(f"Failed to set up logging: {e}")
     raise
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, description=settings.PROJECT_DESCRIPTION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pay the one-off costs here instead of on the first requests after a deploy
+    configure_mappers()
+    for target in filter(None, (engine, replica_engine)):
+        try:
+            await warm_up_pool(target, settings.DB_POOL_WARMUP)
+        except Exception as e:
+            logger.warning(f"Connection pool warm-up failed: {str(e)}")
+    app.openapi()
+    try:
+        await autocomplete_index.rebuild()
+    except Exception as e:
+        logger.warning(f"Autocomplete index build failed: {str(e)}")
+    background_tasks = [
+        asyncio.create_task(autocomplete_index.reconcile_forever()),
+        asyncio.create_task(reconcile_product_totals_forever()),
+        asyncio.create_task(expire_reservations_forever()),
+        asyncio.create_task(prune_refresh_tokens_forever()),
+    ]
+
+    startup_seconds = time.perf_counter() - _startup_began
+    logger.info(
+        "FastAPI application is ready",
+        extra={"extra_fields": {"startup_seconds": round(startup_seconds, 3)}}
+    )
+    if startup_seconds > settings.STARTUP_BUDGET_SECONDS:
+        logger.warning(
+            "Cold start exceeded its budget",
+            extra={"extra_fields": {
+                "startup_seconds": round(startup_seconds, 3),
+                "budget_seconds": settings.STARTUP_BUDGET_SECONDS,
+            }}
+        )
+    yield
+    for task in background_tasks:
+        task.cancel()
+    # Let them unwind before the engines they use are disposed
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    for target in filter(None, (engine, replica_engine)):
+        await target.dispose()
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, description=settings.PROJECT_DESCRIPTION, lifespan=lifespan)
 
 app.include_router(auth_router, prefix="/auth", tags=["Auth"])
 app.include_router(customer_router, prefix="/customers", tags=["Customer"])
@@ -37,9 +93,13 @@ app.include_router(products_router, prefix="/products",tags=["Product"])
 app.include_router(stock_router, prefix="/stocks", tags=["Stock"])
 app.include_router(incoming_orders_router, prefix="/incoming",tags=["Incoming Orders"])
 app.include_router(outgoing_orders_router, prefix="/outgoing",tags=["Outgoing Orders"])
+app.include_router(reservations_router, prefix="/reservations", tags=["Reservations"])
 app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboard"])
+app.include_router(autocomplete_router, prefix="/autocomplete", tags=["Autocomplete"])
 
 
+add_idempotency_middleware(app)
+add_sql_metrics_middleware(app)
 add_cors_middleware(app)
 
 @app.get("/")
@@ -14,4 +14,5 @@ def add_cors_middleware(app):
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms"],
     )
\ No newline at end of file
@@ -0,0 +1,321 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from jose import JWTError, jwt
+from app import settings
+from app.auth.auth_utils import hash_token
+from app.auth.user_cache import token_cache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+IDEMPOTENT_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+IDEMPOTENT_PATH_PREFIXES = ("/incoming", "/outgoing", "/stocks", "/reservations")
+MAX_KEY_LENGTH = 255
+# A claim outlives a crashed worker only this long, so the key becomes usable again
+CLAIM_SECONDS = 300
+# Responses that depend on the caller's credentials or load rather than on the request
+UNCACHED_STATUSES = (401, 403, 429)
+
+
+@dataclass
+class CachedResponse:
+    fingerprint: str
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class IdempotencyStore:
+    """
+    Remembers the response sent for each idempotency key, and which keys
+    are being processed right now.
+    """
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raise NotImplementedError
+
+    async def claim(self, key: str) -> bool:
+        """
+        Mark the key as in flight. Returns False if another request holds it.
+        """
+        raise NotImplementedError
+
+    async def save(self, key: str, response: CachedResponse) -> None:
+        """
+        Store the response for the key and release its claim.
+        """
+        raise NotImplementedError
+
+    async def release(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def wait(self, key: str, timeout: float) -> None:
+        """
+        Return once the key is no longer in flight, or after `timeout` seconds.
+        """
+        raise NotImplementedError
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """
+    Per-process LRU with TTL expiry. Retries routed to another worker are
+    not recognised; use the Redis store when running several.
+    """
+
+    def __init__(self, max_keys: int, ttl: float):
+        self._max_keys = max_keys
+        self._ttl = ttl
+        self._responses: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Event] = {}
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._responses.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._responses[key]
+            return None
+        self._responses.move_to_end(key)
+        return entry[1]
+
+    async def claim(self, key: str) -> bool:
+        if key in self._in_flight:
+            return False
+        self._in_flight[key] = asyncio.Event()
+        return True
+
+    async def save(self, key: str, response: CachedResponse) -> None:
+        now = time.monotonic()
+        self._responses[key] = (now + self._ttl, response)
+        self._responses.move_to_end(key)
+        while self._responses:
+            oldest_key, (expires_at, _) = next(iter(self._responses.items()))
+            if len(self._responses) <= self._max_keys and expires_at > now:
+                break
+            del self._responses[oldest_key]
+        await self.release(key)
+
+    async def release(self, key: str) -> None:
+        event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, key: str, timeout: float) -> None:
+        event = self._in_flight.get(key)
+        if event is None:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """
+    Store shared by every worker, with responses and claims as expiring keys.
+    """
+
+    POLL_SECONDS = 0.05
+
+    def __init__(self, redis_url: str, ttl: float):
+        import aioredis
+        self._redis = aioredis.from_url(redis_url)
+        self._ttl = int(ttl)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        raw = await self._redis.get(f"idempotency:{key}")
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CachedResponse(
+            fingerprint=data["fingerprint"],
+            status=data["status"],
+            headers=[(name.encode("latin-1"), value.encode("latin-1")) for name, value in data["headers"]],
+            body=base64.b64decode(data["body"]),
+        )
+
+    async def claim(self, key: str) -> bool:
+        return bool(await self._redis.set(f"idempotency-claim:{key}", 1, nx=True, ex=CLAIM_SECONDS))
+
+    async def save(self, key: str, response: CachedResponse) -> None:
+        data = {
+            "fingerprint": response.fingerprint,
+            "status": response.status,
+            "headers": [(name.decode("latin-1"), value.decode("latin-1")) for name, value in response.headers],
+            "body": base64.b64encode(response.body).decode("ascii"),
+        }
+        await self._redis.set(f"idempotency:{key}", json.dumps(data), ex=self._ttl)
+        await self.release(key)
+
+    async def release(self, key: str) -> None:
+        await self._redis.delete(f"idempotency-claim:{key}")
+
+    async def wait(self, key: str, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and await self._redis.exists(f"idempotency-claim:{key}"):
+            await asyncio.sleep(self.POLL_SECONDS)
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    backend = settings.IDEMPOTENCY_STORE
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("IDEMPOTENCY_STORE=redis requires REDIS_URL")
+        return RedisIdempotencyStore(settings.REDIS_URL, settings.IDEMPOTENCY_TTL_SECONDS)
+    if backend != "memory":
+        logger.warning(f"Unknown IDEMPOTENCY_STORE '{backend}', using the in-memory store")
+    return InMemoryIdempotencyStore(settings.IDEMPOTENCY_MAX_KEYS, settings.IDEMPOTENCY_TTL_SECONDS)
+
+
+class IdempotencyMiddleware:
+    """
+    Makes retried order and stock mutations safe.
+
+    The first request carrying an Idempotency-Key runs normally and its
+    response is stored. Repeats with the same key, caller, method and path
+    get the stored response back without reaching the route, marked with
+    Idempotent-Replayed. A repeat that arrives while the first is still
+    running waits for it. Reusing a key for a different body is a 422.
+    """
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store or create_idempotency_store()
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in IDEMPOTENT_METHODS
+            or not scope["path"].startswith(IDEMPOTENT_PATH_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        body, more_messages = await self._read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        # Keys are scoped to the caller so one client can never see another's response
+        caller = self._caller(headers.get(b"authorization", b""))
+        key = f"{caller}:{scope['method']}:{scope['path']}?{scope['query_string'].decode('latin-1')}:{idempotency_key.decode('latin-1')}"
+
+        while True:
+            cached = await self.store.get(key)
+            if cached is not None:
+                await self._replay(send, cached, fingerprint, key)
+                return
+            if await self.store.claim(key):
+                break
+            logger.info("Waiting for in-flight request with the same idempotency key", extra={"extra_fields": {"path": scope["path"]}})
+            started = time.monotonic()
+            await self.store.wait(key, settings.IDEMPOTENCY_WAIT_SECONDS)
+            if time.monotonic() - started >= settings.IDEMPOTENCY_WAIT_SECONDS:
+                await self._send_error(send, 409, "A request with this Idempotency-Key is still being processed")
+                return
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await more_messages()
+
+        response = CachedResponse(fingerprint=fingerprint, status=500, headers=[], body=b"")
+        chunks = []
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response.status = message["status"]
+                response.headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await self.store.release(key)
+            raise
+
+        if response.status >= 500 or response.status in UNCACHED_STATUSES:
+            await self.store.release(key)
+            return
+        response.body = b"".join(chunks)
+        await self.store.save(key, response)
+
+    @staticmethod
+    def _caller(authorization: bytes) -> str:
+        """
+        The user a bearer token was issued to, so that a retry sent after a
+        token refresh finds its key; a hash of the header when there is no
+        valid token, in which case the request is rejected with a 401 anyway.
+        """
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            cached = token_cache.get(hash_token(token))
+            if cached is not None:
+                return f"user:{cached[0]}"
+            try:
+                subject = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]).get("sub")
+            except JWTError:
+                subject = None
+            if subject:
+                return f"user:{subject}"
+        return hashlib.sha256(authorization).hexdigest()[:16]
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # Disconnected before the body arrived; hand the message on as is
+                async def more_messages(message=message):
+                    return message
+                return b"".join(chunks), more_messages
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                return b"".join(chunks), receive
+
+    async def _replay(self, send, cached: CachedResponse, fingerprint: str, key: str) -> None:
+        if cached.fingerprint != fingerprint:
+            logger.warning("Idempotency-Key reused with a different request body")
+            await self._send_error(send, 422, "Idempotency-Key was already used for a different request")
+            return
+        logger.info("Replaying stored response for idempotency key", extra={"extra_fields": {"status": cached.status}})
+        await send({
+            "type": "http.response.start",
+            "status": cached.status,
+            "headers": cached.headers + [(b"idempotent-replayed", b"true")],
+        })
+        await send({"type": "http.response.body", "body": cached.body})
+
+    @staticmethod
+    async def _send_error(send, status: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def add_idempotency_middleware(app):
+    app.add_middleware(IdempotencyMiddleware)
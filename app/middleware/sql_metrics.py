@@ -0,0 +1,55 @@
+import logging
+from starlette.datastructures import MutableHeaders
+from app import settings
+from app.db.instrumentation import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class SQLMetricsMiddleware:
+    """
+    Reports the statements each request issued as X-DB-Query-Count and
+    X-DB-Time-Ms response headers plus a structured log line, and warns
+    when one statement shape repeats often enough to look like an N+1.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_metrics(message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-DB-Query-Count", str(stats.count))
+                    headers.append("X-DB-Time-Ms", f"{stats.total_time_ms:.2f}")
+                await send(message)
+
+            await self.app(scope, receive, send_with_metrics)
+
+        request_fields = {"method": scope["method"], "path": scope["path"]}
+        logger.info(
+            "Request SQL metrics",
+            extra={"extra_fields": {
+                **request_fields,
+                "db_query_count": stats.count,
+                "db_time_ms": round(stats.total_time_ms, 2),
+            }}
+        )
+        for shape, executions in stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD).items():
+            logger.warning(
+                "Possible N+1 query pattern",
+                extra={"extra_fields": {
+                    **request_fields,
+                    "statement": shape[:500],
+                    "executions": executions,
+                }}
+            )
+
+
+def add_sql_metrics_middleware(app):
+    app.add_middleware(SQLMetricsMiddleware)
@@ -0,0 +1,40 @@
+import logging
+from fastapi import APIRouter, Depends, Query, status
+from typing import List
+from app.db.schemas import AutocompleteMatch
+from app.db.models import UserRole
+from app.auth.auth_utils import role_required
+from app.autocomplete import autocomplete_index
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Served entirely from the in-process prefix index; these routes never touch the database.
+
+def _matches(kind: str, q: str, limit: int) -> List[AutocompleteMatch]:
+    return [AutocompleteMatch(id=id, name=name) for id, name in autocomplete_index.search(kind, q, limit)]
+
+@router.get("/products", response_model=List[AutocompleteMatch], status_code=status.HTTP_200_OK)
+async def autocomplete_products(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))
+):
+    return _matches("products", q, limit)
+
+@router.get("/customers", response_model=List[AutocompleteMatch], status_code=status.HTTP_200_OK)
+async def autocomplete_customers(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    return _matches("customers", q, limit)
+
+@router.get("/suppliers", response_model=List[AutocompleteMatch], status_code=status.HTTP_200_OK)
+async def autocomplete_suppliers(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    return _matches("suppliers", q, limit)
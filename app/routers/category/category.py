@@ -3,9 +3,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.schemas import User
 from app.db.database import get_db
 from app.db.schemas import CategoryCreate, CategoryResponse, CategoryUpdate, PaginatedResponse
-from typing import Optional
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from app.auth.auth_utils import get_current_user, role_required
-from app.db.models import UserRole
+from app.db.models import UserRole, Category
+from app.db.filters import filter_params
 from app.services.category_service import CategoryService
 import logging
 
@@ -31,6 +33,16 @@ async def create_category(category: CategoryCreate, service: CategoryService = D
     logger.info("create_category endpoint called")
     return await service.create_category(category)
 
+@router.get("/export", status_code=200)
+async def export_categories(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(Category)),
+    service: CategoryService = Depends(get_category_service(True)),
+    has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))
+):
+    logger.info("export categories endpoint called")
+    return await service.export_categories(format=format, filters=filters)
+
 @router.get("/{category_id}", response_model=CategoryResponse, status_code=200)
 async def get_category_by_id(category_id: int, service: CategoryService = Depends(get_category_service(True)), has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
     logger.info(f"get_category endpoint called for ID: {category_id}")
@@ -41,11 +53,14 @@ async def get_all_categories(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(Category)),
     service: CategoryService = Depends(get_category_service(True)), 
     has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))
 ):
     logger.info("get_all_categories endpoint called")
-    return await service.get_all_categories(limit=limit, after=after, before=before)
+    return await service.get_all_categories(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
 
 @router.put("/{category_id}", response_model=CategoryResponse, status_code=200)
 async def update_category(category_id: int, category_data: CategoryUpdate, service: CategoryService = Depends(get_category_service(True)), has_permission: bool = Depends(role_required([UserRole.admin]))):
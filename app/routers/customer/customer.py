@@ -3,9 +3,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.schemas import User
 from app.db.database import get_db
 from app.db.schemas import CustomerCreate, CustomerResponse, CustomerUpdate, CustomerSummary, PaginatedResponse
-from typing import Optional
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from app.auth.auth_utils import get_current_user, role_required
-from app.db.models import UserRole
+from app.db.models import UserRole, Customer
+from app.db.filters import filter_params
+from app.utils import batch_ids
 from app.services.customer_service import CustomerService
 import logging
 
@@ -36,11 +39,33 @@ async def get_all_customers(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(Customer)),
     service: CustomerService = Depends(get_customer_service(True)), 
     has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
 ):
     logger.info("get_all_customers endpoint called")
-    return await service.get_all_customers(limit=limit, after=after, before=before)
+    return await service.get_all_customers(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
+
+@router.get("/export", status_code=200)
+async def export_customers(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(Customer)),
+    service: CustomerService = Depends(get_customer_service(True)),
+    has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("export customers endpoint called")
+    return await service.export_customers(format=format, filters=filters)
+
+@router.get("/batch", response_model=List[CustomerResponse], status_code=200)
+async def get_customers_by_ids(
+    ids: List[int] = Depends(batch_ids),
+    service: CustomerService = Depends(get_customer_service(True)),
+    has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))
+):
+    logger.info("get customers by ids endpoint called")
+    return await service.get_customers_by_ids(ids)
 
 @router.get("/{customer_id}", response_model=CustomerResponse, status_code=200)
 async def get_customer_by_id(customer_id: int, service: CustomerService = Depends(get_customer_service(True)), has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
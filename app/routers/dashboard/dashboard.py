@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends
-from app.db.schemas import DashboardResponse, User
+from fastapi import APIRouter, Depends, HTTPException
+from app.db.schemas import DashboardResponse, PoolStats, User
 from app.services.dashboard_service import DashboardService
-from app.db.database import get_db
+from app.db.database import get_db, get_pool_stats, replica_engine
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.auth.auth_utils import get_current_user, role_required
 from app.db.models import UserRole
@@ -31,3 +31,16 @@ async def get_dashboard_data(
 ):
     logger.info("get_dashboard_data endpoint called")
     return await service.get_dashboard_data()
+
+
+@router.get("/db-pool", response_model=PoolStats)
+async def get_db_pool_stats(
+    replica: bool = False,
+    has_permission: bool = Depends(role_required([UserRole.admin])),
+):
+    logger.info("get_db_pool_stats endpoint called")
+    if replica:
+        if replica_engine is None:
+            raise HTTPException(status_code=404, detail="No read replica configured")
+        return get_pool_stats(replica_engine)
+    return get_pool_stats()
@@ -1,17 +1,23 @@
 import logging
-from fastapi import APIRouter, Depends, status
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.schemas import (
     IncomingOrderCreate,
+    IncomingOrderBulkResponse,
     IncomingOrderResponse,
     IncomingOrderSummary,
     User,
     IncomingOrderStatusUpdate,
+    OrderStatusBulkUpdate,
+    OrderStatusBulkResponse,
     PaginatedResponse,
 )
 from app.db.database import get_db
-from app.db.models import UserRole
+from app.db.models import UserRole, IncomingOrder
+from app.db.filters import filter_params
+from app.utils import batch_ids, parse_csv_rows
 from app.auth.auth_utils import get_current_user, role_required
 from app.services.incoming_orders_service import IncomingOrderService
 
@@ -48,6 +54,39 @@ async def create_incoming_order(
     return await service.create_incoming_order(order)
 
 
+@router.post(
+    "/bulk", response_model=IncomingOrderBulkResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_incoming_orders_bulk(
+    lines: List[IncomingOrderCreate],
+    mode: Literal["atomic", "best_effort"] = "atomic",
+    service: IncomingOrderService = Depends(get_incoming_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff])),
+):
+    logger.info("bulk create incoming orders endpoint called")
+    return await service.create_incoming_orders_bulk(lines, mode=mode)
+
+
+@router.post(
+    "/bulk/csv",
+    response_model=IncomingOrderBulkResponse,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={"requestBody": {"required": True, "content": {"text/csv": {"schema": {"type": "string"}}}}},
+)
+async def create_incoming_orders_bulk_csv(
+    request: Request,
+    mode: Literal["atomic", "best_effort"] = "atomic",
+    service: IncomingOrderService = Depends(get_incoming_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff])),
+):
+    logger.info("bulk create incoming orders from csv endpoint called")
+    try:
+        text = (await request.body()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV body must be UTF-8 encoded")
+    return await service.create_incoming_orders_bulk(parse_csv_rows(text, IncomingOrderCreate), mode=mode)
+
+
 @router.get(
     "/", response_model=PaginatedResponse[IncomingOrderSummary], status_code=status.HTTP_200_OK
 )
@@ -55,23 +94,26 @@ async def get_all_incoming_orders(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(IncomingOrder)),
     service: IncomingOrderService = Depends(get_incoming_order_service(True)),
     has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff])),
 ):
     logger.info("get all incoming orders endpoint called")
-    return await service.get_all_incoming_orders(limit=limit, after=after, before=before)
+    return await service.get_all_incoming_orders(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
 
 
-@router.get(
-    "/{id}", response_model=IncomingOrderResponse, status_code=status.HTTP_200_OK
-)
-async def get_incoming_order_by_id(
-    id: int,
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_incoming_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(IncomingOrder)),
     service: IncomingOrderService = Depends(get_incoming_order_service(True)),
-    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.supplier])),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff])),
 ):
-    logger.info("get incoming order by id endpoint called")
-    return await service.get_incoming_order_by_id(id)
+    logger.info("export incoming orders endpoint called")
+    return await service.export_incoming_orders(format=format, filters=filters)
+
 
 @router.get(
     "/me", response_model=PaginatedResponse[IncomingOrderSummary], status_code=status.HTTP_200_OK
@@ -80,11 +122,48 @@ async def get_my_incoming_orders(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(IncomingOrder)),
     service: IncomingOrderService = Depends(get_incoming_order_service(True)),
     has_permissions: bool = Depends(role_required([UserRole.supplier])),
 ):
     logger.info("get my incoming orders endpoint called")
-    return await service.get_my_incoming_orders(limit=limit, after=after, before=before)
+    return await service.get_my_incoming_orders(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
+
+@router.get(
+    "/batch", response_model=List[IncomingOrderResponse], status_code=status.HTTP_200_OK
+)
+async def get_incoming_orders_by_ids(
+    ids: List[int] = Depends(batch_ids),
+    service: IncomingOrderService = Depends(get_incoming_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.supplier])),
+):
+    logger.info("get incoming orders by ids endpoint called")
+    return await service.get_incoming_orders_by_ids(ids)
+
+@router.get(
+    "/{id}", response_model=IncomingOrderResponse, status_code=status.HTTP_200_OK
+)
+async def get_incoming_order_by_id(
+    id: int,
+    service: IncomingOrderService = Depends(get_incoming_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.supplier])),
+):
+    logger.info("get incoming order by id endpoint called")
+    return await service.get_incoming_order_by_id(id)
+
+@router.patch(
+    "/status", response_model=OrderStatusBulkResponse, status_code=status.HTTP_200_OK
+)
+async def update_incoming_order_statuses(
+    status_update: OrderStatusBulkUpdate,
+    filters: List[ColumnElement] = Depends(filter_params(IncomingOrder)),
+    service: IncomingOrderService = Depends(get_incoming_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.supplier])),
+):
+    logger.info("bulk update incoming order status endpoint called")
+    return await service.update_incoming_order_statuses(status_update, filters=filters)
 
 @router.patch(
     "/{id}", response_model=IncomingOrderResponse, status_code=status.HTTP_200_OK
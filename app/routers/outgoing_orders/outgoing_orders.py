@@ -1,10 +1,13 @@
 import logging
 from fastapi import APIRouter, Depends, status
-from typing import Optional
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.schemas import OutgoingOrderCreate, OutgoingOrderResponse, OutgoingOrderSummary, User, PaginatedResponse
+from app.db.schemas import OutgoingOrderCreate, OutgoingOrderBulkCreate, OutgoingOrderBulkResponse, OutgoingOrderResponse, OutgoingOrderSummary, OrderStatusBulkUpdate, OrderStatusBulkResponse, User, PaginatedResponse
 from app.db.database import get_db
-from app.db.models import UserRole
+from app.db.models import UserRole, OutgoingOrder
+from app.db.filters import filter_params
+from app.utils import batch_ids
 from app.auth.auth_utils import get_current_user, role_required
 from app.services.outgoing_order_service import OutgoingOrderService
 
@@ -30,18 +33,55 @@ async def create_outgoing_order(order: OutgoingOrderCreate, service: OutgoingOrd
     logger.info("create outgoing order endpoint called")
     return await service.create_outgoing_order(order)
 
+@router.post("/bulk", response_model=OutgoingOrderBulkResponse, status_code=status.HTTP_201_CREATED)
+async def create_outgoing_orders_bulk(order: OutgoingOrderBulkCreate, service: OutgoingOrderService = Depends(get_outgoing_order_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
+    logger.info("create multi-line outgoing order endpoint called")
+    return await service.create_outgoing_orders_bulk(order)
+
 @router.get("/", response_model=PaginatedResponse[OutgoingOrderSummary], status_code=status.HTTP_200_OK)
 async def get_all_outgoing_orders(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(OutgoingOrder)),
     service: OutgoingOrderService = Depends(get_outgoing_order_service(True)), 
     has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
 ):
     logger.info("get all outgoing orders endpoint called")
-    return await service.get_all_outgoing_orders(limit=limit, after=after, before=before)
+    return await service.get_all_outgoing_orders(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_outgoing_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(OutgoingOrder)),
+    service: OutgoingOrderService = Depends(get_outgoing_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("export outgoing orders endpoint called")
+    return await service.export_outgoing_orders(format=format, filters=filters)
+
+@router.get("/batch", response_model=List[OutgoingOrderResponse], status_code=status.HTTP_200_OK)
+async def get_outgoing_orders_by_ids(
+    ids: List[int] = Depends(batch_ids),
+    service: OutgoingOrderService = Depends(get_outgoing_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))
+):
+    logger.info("get outgoing orders by ids endpoint called")
+    return await service.get_outgoing_orders_by_ids(ids)
 
 @router.get("/{id}", response_model=OutgoingOrderResponse, status_code=status.HTTP_200_OK)
 async def get_outgoing_order_by_id(id: int, service: OutgoingOrderService = Depends(get_outgoing_order_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
     logger.info("get outgoing order by id endpoint called")
     return await service.get_outgoing_order_by_id(id)
+
+@router.patch("/status", response_model=OrderStatusBulkResponse, status_code=status.HTTP_200_OK)
+async def update_outgoing_order_statuses(
+    status_update: OrderStatusBulkUpdate,
+    filters: List[ColumnElement] = Depends(filter_params(OutgoingOrder)),
+    service: OutgoingOrderService = Depends(get_outgoing_order_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("bulk update outgoing order status endpoint called")
+    return await service.update_outgoing_order_statuses(status_update, filters=filters)
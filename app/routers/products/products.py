@@ -1,10 +1,13 @@
 import logging
-from fastapi import APIRouter, Depends, status
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, status
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.schemas import ProductCreate, ProductResponse, User, ProductUpdate, ProductSummary, PaginatedResponse
+from app.db.schemas import ProductCreate, ProductResponse, User, ProductUpdate, ProductSummary, ProductSearchResult, ProductAvailability, PaginatedResponse
 from app.db.database import get_db
-from app.db.models import UserRole
+from app.db.models import UserRole, Product
+from app.db.filters import filter_params
+from app.utils import batch_ids
 from app.auth.auth_utils import get_current_user, role_required
 from app.services.products_service import ProductService
 
@@ -31,6 +34,41 @@ async def create_product(product: ProductCreate, service: ProductService = Depen
     logger.info("create_product endpoint called")
     return await service.create_product(product)
 
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_products(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(Product)),
+    service: ProductService = Depends(get_product_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))
+):
+    logger.info("export products endpoint called")
+    return await service.export_products(format=format, filters=filters)
+
+@router.get("/batch", response_model=List[ProductResponse], status_code=status.HTTP_200_OK)
+async def get_products_by_ids(
+    ids: List[int] = Depends(batch_ids),
+    service: ProductService = Depends(get_product_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))
+):
+    logger.info("get products by ids endpoint called")
+    return await service.get_products_by_ids(ids)
+
+@router.get("/search", response_model=PaginatedResponse[ProductSearchResult], status_code=status.HTTP_200_OK)
+async def search_products(
+    q: str = Query(..., min_length=2),
+    limit: int = 10,
+    after: Optional[str] = None,
+    service: ProductService = Depends(get_product_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))
+):
+    logger.info("search products endpoint called")
+    return await service.search_products(q.strip(), limit=limit, after=after)
+
+@router.get("/{id}/availability", response_model=ProductAvailability, status_code=status.HTTP_200_OK)
+async def get_product_availability(id: int, service: ProductService = Depends(get_product_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))):
+    logger.info(f"get product availability endpoint called on ID: {id}")
+    return await service.get_product_availability(id)
+
 @router.get("/{id}", response_model=ProductResponse, status_code=status.HTTP_200_OK)
 async def get_product_by_id(id: int, service: ProductService = Depends(get_product_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))):
     logger.info("get product by id endpoint called")
@@ -41,11 +79,14 @@ async def get_all_products(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(Product)),
     service: ProductService = Depends(get_product_service(True)), 
     has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer, UserRole.supplier]))
 ):
     logger.info("get all products endpoint called")
-    return await service.get_all_products(limit=limit, after=after, before=before)
+    return await service.get_all_products(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
 
 @router.put("/{id}", status_code=status.HTTP_200_OK)
 async def update_product(id: int, product_update: ProductUpdate, service: ProductService = Depends(get_product_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin]))):
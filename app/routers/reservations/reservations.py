@@ -0,0 +1,45 @@
+import logging
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.schemas import ReservationCreate, ReservationConvert, ReservationResponse, OutgoingOrderResponse, User
+from app.db.database import get_db
+from app.db.models import UserRole
+from app.auth.auth_utils import get_current_user, role_required
+from app.services.reservation_service import ReservationService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def get_reservation_service(require_user: bool = False):
+    if require_user:
+        async def _get_service(
+            db: AsyncSession = Depends(get_db),
+            current_user: User = Depends(get_current_user),
+        ):
+            return ReservationService(db, current_user)
+    else:
+        async def _get_service(db: AsyncSession = Depends(get_db)):
+            return ReservationService(db, None)
+    
+    return _get_service
+
+@router.post("/", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(reservation: ReservationCreate, service: ReservationService = Depends(get_reservation_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
+    logger.info("create reservation endpoint called")
+    return await service.create_reservation(reservation)
+
+@router.get("/{id}", response_model=ReservationResponse, status_code=status.HTTP_200_OK)
+async def get_reservation(id: int, service: ReservationService = Depends(get_reservation_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
+    logger.info("get reservation endpoint called")
+    return await service.get_reservation(id)
+
+@router.post("/{id}/convert", response_model=OutgoingOrderResponse, status_code=status.HTTP_201_CREATED)
+async def convert_reservation(id: int, conversion: ReservationConvert = ReservationConvert(), service: ReservationService = Depends(get_reservation_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
+    logger.info(f"convert reservation endpoint called on ID: {id}")
+    return await service.convert_reservation(id, conversion)
+
+@router.delete("/{id}", response_model=ReservationResponse, status_code=status.HTTP_200_OK)
+async def release_reservation(id: int, service: ReservationService = Depends(get_reservation_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff, UserRole.customer]))):
+    logger.info(f"release reservation endpoint called on ID: {id}")
+    return await service.release_reservation(id)
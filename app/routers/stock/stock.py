@@ -1,10 +1,14 @@
 import logging
 from fastapi import APIRouter, Depends, status
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.schemas import StockUpdate, StockResponse, StockSummary, User, PaginatedResponse
+from app.db.schemas import StockUpdate, StockResponse, StockSummary, StockMovementResponse, StockAsOfResponse, User, PaginatedResponse
 from app.db.database import get_db
-from app.db.models import UserRole
+from app.db.models import UserRole, Stock
+from app.db.filters import filter_params
+from app.utils import batch_ids
 from app.auth.auth_utils import get_current_user, role_required
 from app.services.stocks_service import StockService
 
@@ -30,11 +34,56 @@ async def get_all_stocks(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(Stock)),
     service: StockService = Depends(get_stock_service(True)), 
     has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
 ):
     logger.info("get all stocks endpoint called")
-    return await service.get_all_stocks(limit=limit, after=after, before=before)
+    return await service.get_all_stocks(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_stocks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(Stock)),
+    service: StockService = Depends(get_stock_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("export stocks endpoint called")
+    return await service.export_stocks(format=format, filters=filters)
+
+@router.get("/batch", response_model=List[StockResponse], status_code=status.HTTP_200_OK)
+async def get_stocks_by_ids(
+    ids: List[int] = Depends(batch_ids),
+    service: StockService = Depends(get_stock_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("get stocks by ids endpoint called")
+    return await service.get_stocks_by_ids(ids)
+
+@router.get("/as-of", response_model=StockAsOfResponse, status_code=status.HTTP_200_OK)
+async def get_stock_levels_as_of(
+    at: datetime,
+    product_id: Optional[int] = None,
+    service: StockService = Depends(get_stock_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("get stock levels as of endpoint called")
+    return await service.get_stock_levels_as_of(at, product_id=product_id)
+
+@router.get("/{id}/movements", response_model=PaginatedResponse[StockMovementResponse], status_code=status.HTTP_200_OK)
+async def get_stock_movements(
+    id: int,
+    limit: int = 10,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+    service: StockService = Depends(get_stock_service(True)),
+    has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info(f"get stock movements endpoint called on ID: {id}")
+    return await service.get_stock_movements(id, limit=limit, after=after, before=before, order=order)
 
 @router.get("/{id}", response_model=StockResponse, status_code=status.HTTP_200_OK)
 async def get_stock_by_id(id: int, service: StockService = Depends(get_stock_service(True)), has_permissions: bool = Depends(role_required([UserRole.admin, UserRole.staff]))):
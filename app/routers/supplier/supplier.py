@@ -3,9 +3,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.schemas import User
 from app.db.database import get_db
 from app.db.schemas import SupplierCreate, SupplierResponse, SupplierUpdate, SupplierSummary, PaginatedResponse
-from typing import List, Optional
+from typing import List, Literal, Optional
+from sqlalchemy.sql.elements import ColumnElement
 from app.auth.auth_utils import get_current_user, role_required
-from app.db.models import UserRole
+from app.db.models import UserRole, Supplier
+from app.db.filters import filter_params
+from app.utils import batch_ids
 from app.services.supplier_service import SupplierService
 import logging
 
@@ -36,17 +39,39 @@ async def get_all_suppliers(
     limit: int = 10,
     after: Optional[str] = None,
     before: Optional[str] = None,
+    sort_by: str = "id",
+    order: Literal["asc", "desc"] = "asc",
+    filters: List[ColumnElement] = Depends(filter_params(Supplier)),
     service: SupplierService = Depends(get_supplier_service(True)), 
     has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
 ):
     logger.info("get_all_suppliers endpoint called")
-    return await service.get_all_suppliers(limit=limit, after=after, before=before)
+    return await service.get_all_suppliers(limit=limit, after=after, before=before, sort_by=sort_by, order=order, filters=filters)
 
 @router.get("/me", response_model=SupplierResponse, status_code=200)
 async def get_my_supplier_profile(service: SupplierService = Depends(get_supplier_service(True)), has_permission: bool = Depends(role_required([UserRole.supplier]))):
     logger.info("get_my_supplier_profile endpoint called")
     return await service.get_my_supplier_profile()
 
+@router.get("/export", status_code=200)
+async def export_suppliers(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: List[ColumnElement] = Depends(filter_params(Supplier)),
+    service: SupplierService = Depends(get_supplier_service(True)),
+    has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("export suppliers endpoint called")
+    return await service.export_suppliers(format=format, filters=filters)
+
+@router.get("/batch", response_model=List[SupplierResponse], status_code=200)
+async def get_suppliers_by_ids(
+    ids: List[int] = Depends(batch_ids),
+    service: SupplierService = Depends(get_supplier_service(True)),
+    has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff]))
+):
+    logger.info("get suppliers by ids endpoint called")
+    return await service.get_suppliers_by_ids(ids)
+
 @router.get("/{supplier_id}", response_model=SupplierResponse, status_code=200)
 async def get_supplier_by_id(supplier_id: int, service: SupplierService = Depends(get_supplier_service(True)), has_permission: bool = Depends(role_required([UserRole.admin, UserRole.staff]))):
     logger.info(f"get_supplier endpoint called for ID: {supplier_id}")
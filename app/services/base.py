@@ -1,8 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from app.db import schemas
+from app.db.loader import DataLoader, get_loader
 
 class BaseService:
     def __init__(self, db: AsyncSession, current_user: Optional[schemas.User]):
         self.db = db
-        self.user = current_user
\ No newline at end of file
+        self.user = current_user
+
+    @property
+    def loader(self) -> DataLoader:
+        return get_loader(self.db)
@@ -1,10 +1,12 @@
 from fastapi import HTTPException
 from sqlalchemy.future import select
-from typing import Optional
+from typing import Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
 from app.db.models import Category
 from app.db.schemas import CategoryCreate, CategoryResponse, PaginatedResponse
 from app.services.base import BaseService
-from app.utils import paginate
+from app.utils import paginate, stream_export
+from fastapi.responses import StreamingResponse
 import logging
                            
 logger = logging.getLogger(__name__)
@@ -39,7 +41,7 @@ class CategoryService(BaseService):
             logger.error(f"Error occurred while fetching category: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
         
-    async def get_all_categories(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[CategoryResponse]:
+    async def get_all_categories(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[CategoryResponse]:
         try:
             logger.info("Fetching all categories")
             paginated_categories = await paginate(
@@ -47,7 +49,11 @@ class CategoryService(BaseService):
                 model=Category,
                 limit=limit,
                 after=after,
-                before=before
+                before=before,
+                sort_by=sort_by,
+                order=order,
+                query=select(Category).where(*filters),
+                schema=CategoryResponse
             )
             if not paginated_categories.data:
                 logger.warning("No categories found in database")
@@ -61,6 +67,16 @@ class CategoryService(BaseService):
                 raise e
             raise HTTPException(status_code=500, detail="Internal Server Error")
         
+    async def export_categories(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all categories matching the filters as NDJSON or CSV.
+        """
+        logger.info(
+            "Exporting categories",
+            extra={"extra_fields": {"format": format, "filters": len(filters)}}
+        )
+        return stream_export(Category, format=format, filters=filters, user_id=self.user.id)
+
     async def update_category(self, category_id: int, category_data: CategoryCreate) -> CategoryResponse:
         try:
             logger.info(f"Updating category with ID: {category_id}")
@@ -1,9 +1,13 @@
 from app.services.base import BaseService
+from app.autocomplete import autocomplete_index
 from app.db.models import Customer, UserRole
 from app.db.schemas import CustomerCreate, CustomerUpdate, PaginatedResponse, CustomerSummary
 from fastapi import HTTPException, status
-from typing import Optional
-from app.utils import paginate
+from sqlalchemy.future import select
+from typing import List, Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
+from app.utils import paginate, stream_export
+from fastapi.responses import StreamingResponse
 
 class CustomerService(BaseService):
     async def create_customer(self, customer_data: CustomerCreate) -> Customer:
@@ -11,20 +15,31 @@ class CustomerService(BaseService):
         self.db.add(customer)
         await self.db.commit()
         await self.db.refresh(customer)
+        autocomplete_index.upsert("customers", customer.id, f"{customer.first_name} {customer.last_name}")
         return customer
 
-    async def get_all_customers(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[CustomerSummary]:
+    async def get_all_customers(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[CustomerSummary]:
         paginated_customers = await paginate(
             db=self.db,
             model=Customer,
             limit=limit,
             after=after,
-            before=before
+            before=before,
+            sort_by=sort_by,
+            order=order,
+            query=select(Customer).where(*filters),
+            schema=CustomerSummary
         )
         if not paginated_customers.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No customers found")
         return paginated_customers
 
+    async def export_customers(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all customers matching the filters as NDJSON or CSV.
+        """
+        return stream_export(Customer, format=format, filters=filters, user_id=self.user.id)
+
     async def get_customer_by_id(self, customer_id: int) -> Customer:
         customer = await self.db.get(Customer, customer_id)
         if not customer:
@@ -40,6 +55,15 @@ class CustomerService(BaseService):
             
         return customer
 
+    async def get_customers_by_ids(self, ids: List[int]) -> List[Customer]:
+        customers = [customer for customer in await self.loader.load_many(Customer, ids) if customer is not None]
+
+        # A customer can only see their own profile
+        if self.user.role not in [UserRole.admin, UserRole.staff] and any(customer.user_id != self.user.id for customer in customers):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access these customers")
+
+        return customers
+
     async def update_customer(self, customer_id: int, customer_data: CustomerUpdate) -> Customer:
         customer = await self.db.get(Customer, customer_id)
         if not customer:
@@ -51,6 +75,7 @@ class CustomerService(BaseService):
         
         await self.db.commit()
         await self.db.refresh(customer)
+        autocomplete_index.upsert("customers", customer.id, f"{customer.first_name} {customer.last_name}")
         return customer
 
     async def delete_customer(self, customer_id: int) -> None:
@@ -60,4 +85,5 @@ class CustomerService(BaseService):
 
         await self.db.delete(customer)
         await self.db.commit()
+        autocomplete_index.remove("customers", customer_id)
         return
@@ -1,5 +1,5 @@
 from app.services.base import BaseService
-from app.db.models import User, Product, Category, Stock, IncomingOrder, OutgoingOrder, UserRole
+from app.db.models import User, Product, ProductStockTotal, Category, IncomingOrder, OutgoingOrder, UserRole
 from app.db.schemas import DashboardResponse, UserOverview, PerformanceMetrics, RecentActivity, InventoryKPIs, OrderKPIs, UserRoleDistribution
 from sqlalchemy.future import select
 from sqlalchemy import func
@@ -45,12 +45,13 @@ class DashboardService(BaseService):
         # Inventory KPIs
         total_products = (await self.db.execute(select(func.count(Product.id)))).scalar_one()
         total_categories = (await self.db.execute(select(func.count(Category.id)))).scalar_one()
-        total_stock_quantity = (await self.db.execute(select(func.sum(Stock.available_quantity)))).scalar_one() or 0
+        # One row per product in the maintained totals instead of one per batch
+        total_stock_quantity = (await self.db.execute(select(func.sum(ProductStockTotal.quantity)))).scalar_one() or 0
 
         # Inventory Value
         inventory_value_result = await self.db.execute(
-            select(func.sum(Stock.available_quantity * Product.price))
-            .join(Product, Stock.product_id == Product.id)
+            select(func.sum(ProductStockTotal.quantity * Product.price))
+            .join(Product, ProductStockTotal.product_id == Product.id)
         )
         inventory_value = inventory_value_result.scalar_one() or 0.0
 
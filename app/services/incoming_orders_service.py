@@ -1,10 +1,16 @@
 from fastapi import HTTPException
 from sqlalchemy.future import select
-from typing import List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Sequence, Set, Union
+from sqlalchemy.sql.elements import ColumnElement
 from app.db.models import IncomingOrder, Product, Stock, Supplier, OrderStatusEnum
-from app.db.schemas import IncomingOrderCreate, IncomingOrderResponse, IncomingOrderSummary, IncomingOrderStatusUpdate, PaginatedResponse
+from app.db.inventory import StockReceipt, record_receipts
+from app.db.schemas import IncomingOrderCreate, IncomingOrderResponse, IncomingOrderSummary, IncomingOrderStatusUpdate, PaginatedResponse, ProductSummary, SupplierSummary, IncomingOrderBulkLine, IncomingOrderBulkResponse, OrderStatusBulkUpdate, OrderStatusBulkResponse
+from app import settings
 from app.services.base import BaseService
-from app.utils import paginate
+from app.utils import paginate, stream_export, transition_order_status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import selectinload
 import logging
 
@@ -22,67 +28,59 @@ class IncomingOrderService(BaseService):
         Create a new incoming order and create/update stock entry.
         """
         try:
+            total_cost = order.unit_cost * order.quantity
+
+            # Order and stock are written in one transaction with RETURNING, and
+            # unknown product or supplier ids surface as foreign key violations
+            # rather than being looked up first.
             result = await self.db.execute(
-                select(Product).where(Product.id == order.product_id)
-            )
-            product = result.scalars().first()
-            if not product:
-                logger.warning(
-                    "Product not found for incoming order",
-                    extra={"extra_fields": {"product_id": order.product_id}}
+                insert(IncomingOrder)
+                .values(
+                    supplier_id=order.supplier_id,
+                    product_id=order.product_id,
+                    batch_number=order.batch_number,
+                    quantity=order.quantity,
+                    unit_cost=order.unit_cost,
+                    total_cost=total_cost,
+                    supply_date=order.supply_date,
+                    status=OrderStatusEnum.pending
                 )
-                raise HTTPException(status_code=404, detail="Product not found")
-            
-            result = await self.db.execute(
-                select(Supplier).where(Supplier.id == order.supplier_id)
+                .returning(IncomingOrder.id, IncomingOrder.status, IncomingOrder.created_at, IncomingOrder.updated_at)
             )
-            supplier = result.scalars().first()
-            if not supplier:
-                logger.warning(
-                    "Supplier not found for incoming order",
-                    extra={"extra_fields": {"supplier_id": order.supplier_id}}
+            new_order = result.one()
+
+            result = await self.db.execute(
+                insert(Stock)
+                .values(
+                    product_id=order.product_id,
+                    incoming_order_id=new_order.id,
+                    batch_number=order.batch_number,
+                    available_quantity=order.quantity,
+                    expiry_date=order.expiry_date
                 )
-                raise HTTPException(status_code=404, detail="Supplier not found")
-            
-            total_cost = order.unit_cost * order.quantity
-            
-            new_order = IncomingOrder(
-                supplier_id=order.supplier_id,
-                product_id=order.product_id,
-                batch_number=order.batch_number,
-                quantity=order.quantity,
-                unit_cost=order.unit_cost,
-                total_cost=total_cost,
-                supply_date=order.supply_date,
-                status=OrderStatusEnum.pending
+                .returning(Stock.id)
             )
-            
-            self.db.add(new_order)
-            await self.db.commit()
-            await self.db.refresh(new_order)
-            
-            new_stock = Stock(
-                product_id=order.product_id,
-                incoming_order_id=new_order.id,
-                batch_number=order.batch_number,
-                available_quantity=order.quantity,
-                expiry_date=order.expiry_date
+            stock_id = result.scalar_one()
+            await record_receipts(
+                self.db, [StockReceipt(stock_id, order.product_id, order.quantity, new_order.id)], user_id=self.user.id
             )
-            
-            self.db.add(new_stock)
-            await self.db.commit()
-            await self.db.refresh(new_stock)
-            
+
+            # Names for the response; NULL here also catches backends that do not enforce foreign keys
             result = await self.db.execute(
-                select(IncomingOrder)
-                .options(
-                    selectinload(IncomingOrder.supplier),
-                    selectinload(IncomingOrder.product)
+                select(
+                    select(Product.name).where(Product.id == order.product_id).scalar_subquery(),
+                    select(Supplier.name).where(Supplier.id == order.supplier_id).scalar_subquery()
                 )
-                .where(IncomingOrder.id == new_order.id)
             )
-            new_order = result.scalars().first()
-            
+            product_name, supplier_name = result.one()
+            if product_name is None or supplier_name is None:
+                await self.db.rollback()
+                missing = "product" if product_name is None else "supplier"
+                self._log_missing_reference(missing, order)
+                raise HTTPException(status_code=404, detail=f"{missing.capitalize()} not found")
+
+            await self.db.commit()
+
             logger.info(
                 "Incoming order created and stock increased",
                 extra={"extra_fields": {
@@ -91,15 +89,40 @@ class IncomingOrderService(BaseService):
                     "product_id": order.product_id,
                     "batch_number": order.batch_number,
                     "quantity": order.quantity,
-                    "stock_id": new_stock.id,
+                    "stock_id": stock_id,
                     "total_cost": total_cost
                 }}
             )
-            
-            return IncomingOrderResponse.model_validate(new_order)
-        
+
+            return IncomingOrderResponse(
+                id=new_order.id,
+                supplier=SupplierSummary(id=order.supplier_id, name=supplier_name),
+                product=ProductSummary(id=order.product_id, name=product_name),
+                batch_number=order.batch_number,
+                quantity=order.quantity,
+                unit_cost=order.unit_cost,
+                total_cost=total_cost,
+                status=new_order.status.value,
+                supply_date=order.supply_date,
+                created_at=new_order.created_at,
+                updated_at=new_order.updated_at
+            )
+
         except HTTPException:
             raise
+        except IntegrityError as e:
+            await self.db.rollback()
+            # PostgreSQL names the violated constraint; SQLite only says that one failed
+            message = str(e.orig)
+            if "supplier" in message or "product" in message:
+                missing = "supplier" if "supplier" in message else "product"
+                self._log_missing_reference(missing, order)
+                raise HTTPException(status_code=404, detail=f"{missing.capitalize()} not found")
+            logger.warning(
+                "Product or supplier not found for incoming order",
+                extra={"extra_fields": {"product_id": order.product_id, "supplier_id": order.supplier_id}}
+            )
+            raise HTTPException(status_code=404, detail="Product or supplier not found")
         except Exception as e:
             logger.error(
                 "Error creating incoming order",
@@ -107,8 +130,140 @@ class IncomingOrderService(BaseService):
             )
             await self.db.rollback()
             raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    def _log_missing_reference(self, missing: str, order: IncomingOrderCreate) -> None:
+        logger.warning(
+            f"{missing.capitalize()} not found for incoming order",
+            extra={"extra_fields": {f"{missing}_id": getattr(order, f"{missing}_id")}}
+        )
+
+    async def create_incoming_orders_bulk(self, lines: Sequence[Union[IncomingOrderCreate, str]], mode: str = "atomic") -> IncomingOrderBulkResponse:
+        """
+        Create incoming orders and their stock rows from a delivery manifest.
+
+        String entries are lines that could not be parsed and are reported as
+        failures. Product and supplier ids are checked with one query per table.
+        In "atomic" mode any failing line rejects the whole manifest with a 422;
+        in "best_effort" mode the valid lines are written and the rest reported.
+        """
+        if not lines:
+            raise HTTPException(status_code=400, detail="No lines to import")
+        if len(lines) > settings.BULK_MAX_LINES:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_LINES} lines can be imported at once")
+
+        try:
+            orders = [line for line in lines if not isinstance(line, str)]
+            known_products = await self._existing_ids(Product, {order.product_id for order in orders})
+            known_suppliers = await self._existing_ids(Supplier, {order.supplier_id for order in orders})
+
+            results: List[IncomingOrderBulkLine] = []
+            valid = []
+            for number, line in enumerate(lines, start=1):
+                if isinstance(line, str):
+                    error = line
+                elif line.product_id not in known_products:
+                    error = "Product not found"
+                elif line.supplier_id not in known_suppliers:
+                    error = "Supplier not found"
+                elif line.quantity <= 0:
+                    error = "Quantity must be positive"
+                else:
+                    error = None
+                results.append(IncomingOrderBulkLine(line=number, error=error))
+                if error is None:
+                    valid.append((results[-1], line))
+
+            failed = len(lines) - len(valid)
+            if failed and mode == "atomic":
+                logger.warning(
+                    "Bulk incoming order import rejected",
+                    extra={"extra_fields": {"lines": len(lines), "failed": failed}}
+                )
+                raise HTTPException(
+                    status_code=422,
+                    detail=IncomingOrderBulkResponse(mode=mode, created=0, failed=failed, results=results).model_dump()
+                )
+
+            if valid:
+                # Multi-row INSERT ... RETURNING with the ids in parameter order, so they
+                # can be matched to their lines. PostgreSQL sends up to 1000 rows per
+                # statement; SQLite cannot order RETURNING and inserts row by row.
+                result = await self.db.execute(
+                    insert(IncomingOrder).returning(IncomingOrder.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "supplier_id": order.supplier_id,
+                            "product_id": order.product_id,
+                            "batch_number": order.batch_number,
+                            "quantity": order.quantity,
+                            "unit_cost": order.unit_cost,
+                            "total_cost": order.unit_cost * order.quantity,
+                            "supply_date": order.supply_date,
+                            "status": OrderStatusEnum.pending,
+                        }
+                        for _, order in valid
+                    ]
+                )
+                order_ids = result.scalars().all()
+
+                result = await self.db.execute(
+                    insert(Stock).returning(Stock.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "product_id": order.product_id,
+                            "incoming_order_id": order_id,
+                            "batch_number": order.batch_number,
+                            "available_quantity": order.quantity,
+                            "expiry_date": order.expiry_date,
+                        }
+                        for (_, order), order_id in zip(valid, order_ids)
+                    ]
+                )
+                stock_ids = result.scalars().all()
+                await record_receipts(
+                    self.db,
+                    [
+                        StockReceipt(stock_id, order.product_id, order.quantity, order_id)
+                        for (_, order), order_id, stock_id in zip(valid, order_ids, stock_ids)
+                    ],
+                    user_id=self.user.id
+                )
+
+                for (line_result, _), order_id, stock_id in zip(valid, order_ids, stock_ids):
+                    line_result.id, line_result.stock_id = order_id, stock_id
+                await self.db.commit()
+
+            logger.info(
+                "Bulk incoming order import completed",
+                extra={"extra_fields": {"mode": mode, "lines": len(lines), "created": len(valid), "failed": failed}}
+            )
+            return IncomingOrderBulkResponse(mode=mode, created=len(valid), failed=failed, results=results)
+
+        except HTTPException:
+            raise
+        except IntegrityError as e:
+            # A product or supplier was deleted between validation and insert
+            await self.db.rollback()
+            logger.warning(
+                "Bulk incoming order import conflicted with a concurrent change",
+                extra={"extra_fields": {"error": str(e.orig)}}
+            )
+            raise HTTPException(status_code=409, detail="A referenced product or supplier changed during the import, please retry")
+        except Exception as e:
+            logger.error(
+                "Error importing incoming orders",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def _existing_ids(self, model, ids: Set[int]) -> Set[int]:
+        if not ids:
+            return set()
+        result = await self.db.execute(select(model.id).where(model.id.in_(ids)))
+        return set(result.scalars().all())
     
-    async def get_all_incoming_orders(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[IncomingOrderSummary]:
+    async def get_all_incoming_orders(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[IncomingOrderSummary]:
         """
         Retrieve all incoming orders.
         """
@@ -118,7 +273,11 @@ class IncomingOrderService(BaseService):
                 model=IncomingOrder,
                 limit=limit,
                 after=after,
-                before=before
+                before=before,
+                sort_by=sort_by,
+                order=order,
+                query=select(IncomingOrder).where(*filters),
+                schema=IncomingOrderSummary
             )
             if not paginated_orders.data:
                 logger.warning("No incoming orders found in database")
@@ -139,6 +298,16 @@ class IncomingOrderService(BaseService):
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
     
+    async def export_incoming_orders(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all incoming orders matching the filters as NDJSON or CSV.
+        """
+        logger.info(
+            "Exporting incoming orders",
+            extra={"extra_fields": {"format": format, "filters": len(filters)}}
+        )
+        return stream_export(IncomingOrder, format=format, filters=filters, user_id=self.user.id)
+
     async def get_incoming_order_by_id(self, order_id: int) -> IncomingOrderResponse:
         """
         Retrieve a specific incoming order by ID.
@@ -183,26 +352,56 @@ class IncomingOrderService(BaseService):
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
-    async def get_my_incoming_orders(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[IncomingOrderSummary]:
+    async def get_incoming_orders_by_ids(self, ids: List[int]) -> List[IncomingOrderResponse]:
         """
-        Retrieve all incoming orders for the current supplier.
+        Retrieve several incoming orders in one query. Unknown ids are skipped.
         """
         try:
-            result = await self.db.execute(
-                select(Supplier).where(Supplier.user_id == self.user.id)
+            orders = [order for order in await self.loader.load_many(IncomingOrder, ids) if order is not None]
+
+            if self.user.role == "supplier" and any(order.supplier.user_id != self.user.id for order in orders):
+                raise HTTPException(status_code=403, detail="Not authorized to view these orders")
+
+            logger.info(
+                "Incoming orders retrieved in batch",
+                extra={"extra_fields": {"requested": len(ids), "found": len(orders)}}
+            )
+            return [IncomingOrderResponse.model_validate(order) for order in orders]
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error fetching incoming orders in batch",
+                extra={"extra_fields": {"error": str(e)}}
             )
-            supplier = result.scalars().first()
-            if not supplier:
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_my_incoming_orders(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[IncomingOrderSummary]:
+        """
+        Retrieve all incoming orders for the current supplier.
+        """
+        try:
+            supplier_id = self.user.supplier_id
+            if supplier_id is None:
+                result = await self.db.execute(
+                    select(Supplier.id).where(Supplier.user_id == self.user.id)
+                )
+                supplier_id = result.scalars().first()
+            if supplier_id is None:
                 raise HTTPException(status_code=404, detail="Supplier profile not found for current user")
 
-            query = select(IncomingOrder).where(IncomingOrder.supplier_id == supplier.id)
+            query = select(IncomingOrder).where(IncomingOrder.supplier_id == supplier_id, *filters)
             paginated_orders = await paginate(
                 db=self.db,
                 model=IncomingOrder,
                 limit=limit,
                 after=after,
                 before=before,
-                query=query
+                sort_by=sort_by,
+                order=order,
+                query=query,
+                schema=IncomingOrderSummary
             )
 
             if not paginated_orders.data:
@@ -261,3 +460,35 @@ class IncomingOrderService(BaseService):
                 extra={"extra_fields": {"order_id": order_id, "error": str(e)}}
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def update_incoming_order_statuses(self, status_update: OrderStatusBulkUpdate, filters: Sequence[ColumnElement] = ()) -> OrderStatusBulkResponse:
+        """
+        Complete or cancel many pending incoming orders, chosen by id or by filters, in one statement.
+        """
+        try:
+            scope = []
+            if self.user.role == "supplier":
+                scope.append(IncomingOrder.supplier_id.in_(select(Supplier.id).where(Supplier.user_id == self.user.id)))
+
+            rows = await transition_order_status(
+                self.db, IncomingOrder, OrderStatusEnum(status_update.status), ids=status_update.ids, conditions=filters, scope=scope
+            )
+            await self.db.commit()
+
+            updated = sorted(row.id for row in rows)
+            skipped = sorted(set(status_update.ids or ()) - set(updated))
+            logger.info(
+                "Incoming order statuses updated",
+                extra={"extra_fields": {"new_status": status_update.status, "updated": len(updated), "skipped": len(skipped)}}
+            )
+            return OrderStatusBulkResponse(status=status_update.status, updated=updated, skipped=skipped)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(
+                "Error updating incoming order statuses",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -1,15 +1,25 @@
 from fastapi import HTTPException
 from sqlalchemy.future import select
-from typing import Optional
-from app.db.models import OutgoingOrder, Product, Stock, Customer, OrderStatusEnum
-from app.db.schemas import OutgoingOrderCreate, OutgoingOrderResponse, OutgoingOrderSummary, PaginatedResponse
+from collections import defaultdict
+from sqlalchemy import insert
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
+from app.db.models import OutgoingOrder, OutgoingOrderAllocation, Product, Stock, Customer, OrderStatusEnum, StockMovementReasonEnum
+from app.db.inventory import StockChange, apply_stock_changes, claim_product, is_lock_conflict, raise_batch_unavailable
+from app.db.schemas import OutgoingOrderCreate, OutgoingOrderResponse, OutgoingOrderSummary, OutgoingOrderBulkCreate, OutgoingOrderBulkResponse, OutgoingOrderLine, OutgoingOrderLineError, OrderStatusBulkUpdate, OrderStatusBulkResponse, PaginatedResponse
+from app import settings
 from app.services.base import BaseService
-from app.utils import paginate
+from app.utils import paginate, stream_export, transition_order_status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import DBAPIError, IntegrityError
 import logging
 
 logger = logging.getLogger(__name__)
 
+# How often an allocation is retried when a batch changes underneath it
+ALLOCATION_ATTEMPTS = 3
+
 
 class OutgoingOrderService(BaseService):
     """
@@ -22,31 +32,9 @@ class OutgoingOrderService(BaseService):
         Create a new outgoing order and decrease stock quantity.
         """
         try:
-            result = await self.db.execute(
-                select(Stock).where(Stock.id == order.stock_id)
-            )
-            stock = result.scalars().first()
-            if not stock:
-                logger.warning(
-                    "Stock not found for outgoing order",
-                    extra={"extra_fields": {"stock_id": order.stock_id}}
-                )
-                raise HTTPException(status_code=404, detail="Stock not found")
-            
-            if stock.available_quantity < order.quantity:
-                logger.warning(
-                    "Insufficient stock for outgoing order",
-                    extra={"extra_fields": {
-                        "stock_id": order.stock_id,
-                        "requested_quantity": order.quantity,
-                        "available_quantity": stock.available_quantity
-                    }}
-                )
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Insufficient stock. Available: {stock.available_quantity}, Requested: {order.quantity}"
-                )
-            
+            if order.quantity <= 0:
+                raise HTTPException(status_code=400, detail="Quantity must be positive")
+
             result = await self.db.execute(
                 select(Product).where(Product.id == order.product_id)
             )
@@ -57,6 +45,7 @@ class OutgoingOrderService(BaseService):
                     extra={"extra_fields": {"product_id": order.product_id}}
                 )
                 raise HTTPException(status_code=404, detail="Product not found")
+            unit_price = float(product.price) if product.price else 0
             
             result = await self.db.execute(
                 select(Customer).where(Customer.id == order.customer_id)
@@ -69,33 +58,75 @@ class OutgoingOrderService(BaseService):
                 )
                 raise HTTPException(status_code=404, detail="Customer not found")
             
-            unit_price = float(product.price) if product.price else 0
             total_price = unit_price * order.quantity
-            
-            new_order = OutgoingOrder(
-                customer_id=order.customer_id,
-                product_id=order.product_id,
-                stock_id=order.stock_id,
-                quantity=order.quantity,
-                unit_price=unit_price,
-                total_price=total_price,
-                order_date=order.order_date,
-                status=OrderStatusEnum.pending
-            )
-            
-            stock.available_quantity -= order.quantity
-            
-            self.db.add(new_order)
+
+            # A chosen batch is decremented by a single guarded UPDATE, which
+            # cannot oversell it. Across a product's batches the ones drawn from
+            # are locked first; either way the order is written before the
+            # decrement so that the stock movements can reference it
+            for attempt in range(ALLOCATION_ATTEMPTS):
+                try:
+                    if order.stock_id is not None:
+                        allocations = {order.stock_id: order.quantity}
+                    else:
+                        allocations = await claim_product(self.db, order.product_id, order.quantity, order.allocation)
+
+                    if allocations is not None:
+                        new_order = OutgoingOrder(
+                            customer_id=order.customer_id,
+                            product_id=order.product_id,
+                            stock_id=next(iter(allocations)),
+                            quantity=order.quantity,
+                            unit_price=unit_price,
+                            total_price=total_price,
+                            order_date=order.order_date,
+                            status=OrderStatusEnum.pending,
+                            allocations=[
+                                OutgoingOrderAllocation(stock_id=stock_id, quantity=quantity)
+                                for stock_id, quantity in allocations.items()
+                            ]
+                        )
+                        self.db.add(new_order)
+                        await self.db.flush()
+
+                        sales = [StockChange(stock_id, -quantity, new_order.id) for stock_id, quantity in allocations.items()]
+                        if await apply_stock_changes(
+                            self.db, sales, StockMovementReasonEnum.sale, user_id=self.user.id, product_id=order.product_id
+                        ):
+                            break
+                        if order.stock_id is not None:
+                            # The guarded decrement changed nothing: the batch is short, gone or another product's
+                            await self.db.rollback()
+                            await raise_batch_unavailable(self.db, order.stock_id, order.quantity, order.product_id)
+                except IntegrityError:
+                    # Where foreign keys are enforced, a missing chosen batch already fails the insert
+                    if order.stock_id is None:
+                        raise
+                    await self.db.rollback()
+                    await raise_batch_unavailable(self.db, order.stock_id, order.quantity, order.product_id)
+                except DBAPIError as e:
+                    if not is_lock_conflict(e):
+                        raise
+                # Another order took stock from or deadlocked on the chosen batches
+                await self.db.rollback()
+            else:
+                logger.warning(
+                    "Stock allocation kept conflicting with concurrent orders",
+                    extra={"extra_fields": {"product_id": order.product_id, "attempts": ALLOCATION_ATTEMPTS}}
+                )
+                raise HTTPException(status_code=409, detail="Stock changed during allocation, please retry")
+
             await self.db.commit()
-            await self.db.refresh(new_order)
             
             result = await self.db.execute(
                 select(OutgoingOrder)
                 .options(
                     selectinload(OutgoingOrder.customer),
-                    selectinload(OutgoingOrder.product)
+                    selectinload(OutgoingOrder.product),
+                    selectinload(OutgoingOrder.allocations)
                 )
                 .where(OutgoingOrder.id == new_order.id)
+                .execution_options(populate_existing=True)
             )
             new_order = result.scalars().first()
             
@@ -106,7 +137,7 @@ class OutgoingOrderService(BaseService):
                     "customer_id": order.customer_id,
                     "product_id": order.product_id,
                     "quantity": order.quantity,
-                    "stock_remaining": stock.available_quantity,
+                    "allocations": allocations,
                     "total_price": total_price
                 }}
             )
@@ -114,6 +145,8 @@ class OutgoingOrderService(BaseService):
             return OutgoingOrderResponse.model_validate(new_order)
         
         except HTTPException:
+            # A failed allocation leaves its locks in the transaction
+            await self.db.rollback()
             raise
         except Exception as e:
             logger.error(
@@ -123,7 +156,157 @@ class OutgoingOrderService(BaseService):
             await self.db.rollback()
             raise HTTPException(status_code=500, detail="Internal Server Error")
     
-    async def get_all_outgoing_orders(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[OutgoingOrderSummary]:
+    async def create_outgoing_orders_bulk(self, order: OutgoingOrderBulkCreate) -> OutgoingOrderBulkResponse:
+        """
+        Create a multi-line customer order as a unit: either every line is
+        allocated and created, or nothing is and the failing lines are reported.
+        """
+        if not order.lines:
+            raise HTTPException(status_code=400, detail="Order has no lines")
+        if len(order.lines) > settings.BULK_MAX_LINES:
+            raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_LINES} lines can be ordered at once")
+
+        try:
+            result = await self.db.execute(select(Customer.id).where(Customer.id == order.customer_id))
+            if result.scalar_one_or_none() is None:
+                logger.warning(
+                    "Customer not found for outgoing order",
+                    extra={"extra_fields": {"customer_id": order.customer_id}}
+                )
+                raise HTTPException(status_code=404, detail="Customer not found")
+
+            requested: Dict[int, int] = defaultdict(int)
+            for line in order.lines:
+                requested[line.stock_id] += line.quantity
+            stock_ids = sorted(requested)
+
+            result = await self.db.execute(
+                select(Product.id, Product.price).where(Product.id.in_({line.product_id for line in order.lines}))
+            )
+            prices = {id: float(price) if price else 0 for id, price in result.all()}
+
+            # Lock the batches in id order so that concurrent multi-line orders
+            # touching the same rows always queue up instead of deadlocking
+            result = await self.db.execute(
+                select(Stock.id, Stock.product_id, Stock.available_quantity)
+                .where(Stock.id.in_(stock_ids))
+                .order_by(Stock.id)
+                .with_for_update()
+            )
+            stocks = {row.id: row for row in result.all()}
+
+            errors = self._line_errors(order.lines, requested, stocks, prices)
+            if errors:
+                await self._reject_bulk_order(order, errors)
+
+            result = await self.db.execute(
+                insert(OutgoingOrder).returning(
+                    OutgoingOrder.id,
+                    OutgoingOrder.customer_id,
+                    OutgoingOrder.product_id,
+                    OutgoingOrder.quantity,
+                    OutgoingOrder.total_price,
+                    OutgoingOrder.status,
+                    OutgoingOrder.order_date,
+                    OutgoingOrder.stock_id
+                ),
+                [
+                    {
+                        "customer_id": order.customer_id,
+                        "product_id": line.product_id,
+                        "stock_id": line.stock_id,
+                        "quantity": line.quantity,
+                        "unit_price": prices[line.product_id],
+                        "total_price": prices[line.product_id] * line.quantity,
+                        "order_date": order.order_date,
+                        "status": OrderStatusEnum.pending,
+                    }
+                    for line in order.lines
+                ]
+            )
+            rows = result.all()
+            await self.db.execute(
+                insert(OutgoingOrderAllocation),
+                [{"outgoing_order_id": row.id, "stock_id": row.stock_id, "quantity": row.quantity} for row in rows]
+            )
+            sales = [StockChange(row.stock_id, -row.quantity, row.id) for row in sorted(rows, key=lambda row: row.id)]
+            if not await apply_stock_changes(self.db, sales, StockMovementReasonEnum.sale, user_id=self.user.id):
+                # A batch changed after it was read (only possible where FOR UPDATE is a no-op)
+                await self.db.rollback()
+                result = await self.db.execute(
+                    select(Stock.id, Stock.product_id, Stock.available_quantity).where(Stock.id.in_(stock_ids))
+                )
+                stocks = {row.id: row for row in result.all()}
+                await self._reject_bulk_order(order, self._line_errors(order.lines, requested, stocks, prices))
+            orders = sorted((OutgoingOrderSummary.model_validate(row._mapping) for row in rows), key=lambda summary: summary.id)
+            await self.db.commit()
+
+            total_price = sum(summary.total_price for summary in orders)
+            logger.info(
+                "Multi-line outgoing order created and stock decreased",
+                extra={"extra_fields": {
+                    "customer_id": order.customer_id,
+                    "lines": len(orders),
+                    "stocks": len(stock_ids),
+                    "total_price": total_price
+                }}
+            )
+            return OutgoingOrderBulkResponse(customer_id=order.customer_id, total_price=total_price, orders=orders)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error creating multi-line outgoing order",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def _reject_bulk_order(self, order: OutgoingOrderBulkCreate, errors: List[OutgoingOrderLineError]) -> None:
+        await self.db.rollback()
+        logger.warning(
+            "Multi-line outgoing order rejected",
+            extra={"extra_fields": {
+                "customer_id": order.customer_id,
+                "lines": len(order.lines),
+                "failed": len(errors)
+            }}
+        )
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Order cannot be fulfilled", "lines": [error.model_dump() for error in errors]}
+        )
+
+    @staticmethod
+    def _line_errors(lines: Sequence[OutgoingOrderLine], requested: Dict[int, int], stocks: Dict[int, Any], prices: Dict[int, float]) -> List[OutgoingOrderLineError]:
+        errors = []
+        for number, line in enumerate(lines, start=1):
+            stock = stocks.get(line.stock_id)
+            available = stock.available_quantity if stock else None
+            if line.quantity <= 0:
+                error = "Quantity must be positive"
+            elif line.product_id not in prices:
+                error = "Product not found"
+            elif stock is None:
+                error = "Stock not found"
+            elif stock.product_id != line.product_id:
+                error = "Stock belongs to another product"
+            elif requested[line.stock_id] > available:
+                error = "Insufficient stock"
+            else:
+                continue
+            errors.append(OutgoingOrderLineError(
+                line=number,
+                product_id=line.product_id,
+                stock_id=line.stock_id,
+                requested=line.quantity,
+                available=available,
+                error=error
+            ))
+        return errors
+
+    async def get_all_outgoing_orders(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[OutgoingOrderSummary]:
         """
         Retrieve all outgoing orders.
         """
@@ -133,7 +316,11 @@ class OutgoingOrderService(BaseService):
                 model=OutgoingOrder,
                 limit=limit,
                 after=after,
-                before=before
+                before=before,
+                sort_by=sort_by,
+                order=order,
+                query=select(OutgoingOrder).where(*filters),
+                schema=OutgoingOrderSummary
             )
             if not paginated_orders.data:
                 logger.warning("No outgoing orders found in database")
@@ -154,6 +341,16 @@ class OutgoingOrderService(BaseService):
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
     
+    async def export_outgoing_orders(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all outgoing orders matching the filters as NDJSON or CSV.
+        """
+        logger.info(
+            "Exporting outgoing orders",
+            extra={"extra_fields": {"format": format, "filters": len(filters)}}
+        )
+        return stream_export(OutgoingOrder, format=format, filters=filters, user_id=self.user.id)
+
     async def get_outgoing_order_by_id(self, order_id: int) -> OutgoingOrderResponse:
         """
         Retrieve a specific outgoing order by ID.
@@ -163,7 +360,8 @@ class OutgoingOrderService(BaseService):
                 select(OutgoingOrder)
                 .options(
                     selectinload(OutgoingOrder.customer),
-                    selectinload(OutgoingOrder.product)
+                    selectinload(OutgoingOrder.product),
+                    selectinload(OutgoingOrder.allocations)
                 )
                 .where(OutgoingOrder.id == order_id)
             )
@@ -197,3 +395,102 @@ class OutgoingOrderService(BaseService):
                 extra={"extra_fields": {"order_id": order_id, "error": str(e)}}
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_outgoing_orders_by_ids(self, ids: List[int]) -> List[OutgoingOrderResponse]:
+        """
+        Retrieve several outgoing orders in one query. Unknown ids are skipped.
+        """
+        try:
+            orders = [order for order in await self.loader.load_many(OutgoingOrder, ids) if order is not None]
+
+            if self.user.role == "customer" and any(order.customer.user_id != self.user.id for order in orders):
+                raise HTTPException(status_code=403, detail="Not authorized to view these orders")
+
+            logger.info(
+                "Outgoing orders retrieved in batch",
+                extra={"extra_fields": {"requested": len(ids), "found": len(orders)}}
+            )
+            return [OutgoingOrderResponse.model_validate(order) for order in orders]
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error fetching outgoing orders in batch",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def update_outgoing_order_statuses(self, status_update: OrderStatusBulkUpdate, filters: Sequence[ColumnElement] = ()) -> OrderStatusBulkResponse:
+        """
+        Complete or cancel many pending outgoing orders, chosen by id or by
+        filters. Cancelled orders give their quantities back to the batches
+        they were allocated from.
+        """
+        try:
+            status = OrderStatusEnum(status_update.status)
+            rows = await transition_order_status(
+                self.db, OutgoingOrder, status, ids=status_update.ids, conditions=filters,
+                returning=(OutgoingOrder.stock_id, OutgoingOrder.quantity)
+            )
+            restocked = await self._restock(rows) if status == OrderStatusEnum.cancelled else {}
+            await self.db.commit()
+
+            updated = sorted(row.id for row in rows)
+            skipped = sorted(set(status_update.ids or ()) - set(updated))
+            logger.info(
+                "Outgoing order statuses updated",
+                extra={"extra_fields": {
+                    "new_status": status_update.status,
+                    "updated": len(updated),
+                    "skipped": len(skipped),
+                    "restocked_batches": len(restocked)
+                }}
+            )
+            return OrderStatusBulkResponse(status=status_update.status, updated=updated, skipped=skipped)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(
+                "Error updating outgoing order statuses",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def _restock(self, orders: Sequence[Any]) -> Dict[int, int]:
+        """
+        Return the quantities of the given (id, stock_id, quantity) orders to
+        stock with one UPDATE, using their allocations where they have them,
+        and record a cancellation movement for each. Rolls back and raises a
+        409 if one of those batches no longer exists.
+        """
+        if not orders:
+            return {}
+        result = await self.db.execute(
+            select(OutgoingOrderAllocation.outgoing_order_id, OutgoingOrderAllocation.stock_id, OutgoingOrderAllocation.quantity)
+            .where(OutgoingOrderAllocation.outgoing_order_id.in_([order.id for order in orders]))
+            .order_by(OutgoingOrderAllocation.id)
+        )
+        returns = [StockChange(stock_id, quantity, order_id) for order_id, stock_id, quantity in result.all()]
+        # Orders placed before allocations were recorded took everything from their stock_id
+        allocated = {change.reference_id for change in returns}
+        returns += [
+            StockChange(order.stock_id, order.quantity, order.id)
+            for order in orders
+            if order.id not in allocated and order.stock_id is not None
+        ]
+
+        quantities: Dict[int, int] = defaultdict(int)
+        for change in returns:
+            quantities[change.stock_id] += change.quantity
+        if not await apply_stock_changes(self.db, returns, StockMovementReasonEnum.cancellation, guard=False, user_id=self.user.id):
+            # Only a batch that no longer exists is skipped by an unguarded update
+            await self.db.rollback()
+            logger.error(
+                "Cancelled orders reference missing stock batches",
+                extra={"extra_fields": {"order_ids": [order.id for order in orders], "stock_ids": sorted(quantities)}}
+            )
+            raise HTTPException(status_code=409, detail="Cannot return stock to a batch that no longer exists")
+        return quantities
@@ -1,10 +1,15 @@
 from fastapi import HTTPException
 from sqlalchemy.future import select
-from typing import List, Optional
-from app.db.models import Product
-from app.db.schemas import ProductCreate, ProductResponse, ProductUpdate, ProductSummary, PaginatedResponse
+from sqlalchemy import and_, func, or_
+from typing import List, Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
+from app.db.models import Product, ProductStockTotal
+from app.db.schemas import ProductCreate, ProductResponse, ProductUpdate, ProductSummary, ProductSearchResult, ProductAvailability, PaginatedResponse, Cursor
+from app.db.search import FALLBACK_MIN_SCORE, fuzzy_score, product_search_condition, product_search_score
 from app.services.base import BaseService
-from app.utils import paginate
+from app.autocomplete import autocomplete_index
+from app.utils import paginate, stream_export, encode_cursor, decode_cursor
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import selectinload
 import logging
 
@@ -26,6 +31,7 @@ class ProductService(BaseService):
             self.db.add(new_product)
             await self.db.commit()
             await self.db.refresh(new_product)
+            autocomplete_index.upsert("products", new_product.id, new_product.name)
 
             return ProductResponse.model_validate(new_product)
 
@@ -52,14 +58,58 @@ class ProductService(BaseService):
             logger.error(f"Product could not be fetched due to error: {str(e)}")
             raise HTTPException(status_code=500, detail="Internal Server Error")
         
-    async def get_all_products(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[ProductSummary]:
+    async def get_product_availability(self, id: int) -> ProductAvailability:
+        """
+        Quantity on hand over all batches of a product, read from its
+        maintained total rather than summed from the batches.
+        """
+        try:
+            result = await self.db.execute(
+                select(Product.id, func.coalesce(ProductStockTotal.quantity, 0), ProductStockTotal.updated_at)
+                .outerjoin(ProductStockTotal, ProductStockTotal.product_id == Product.id)
+                .where(Product.id == id)
+            )
+            row = result.first()
+            if row is None:
+                logger.warning(f"No product with id ({id}) found in database")
+                raise HTTPException(status_code=404, detail=f"No products with id ({id}) found")
+            product_id, available_quantity, updated_at = row
+            return ProductAvailability(product_id=product_id, available_quantity=available_quantity, updated_at=updated_at)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Product availability could not be fetched due to error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_products_by_ids(self, ids: List[int]) -> List[ProductResponse]:
+        """
+        Retrieve several products in one query. Unknown ids are skipped.
+        """
+        try:
+            products = await self.loader.load_many(Product, ids)
+            found = [ProductResponse.model_validate(product) for product in products if product is not None]
+            logger.info(
+                "Products retrieved in batch",
+                extra={"extra_fields": {"requested": len(ids), "found": len(found)}}
+            )
+            return found
+        except Exception as e:
+            logger.error(f"Error occurred while fetching products in batch: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_all_products(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[ProductSummary]:
         try:
             paginated_products = await paginate(
                 db=self.db,
                 model=Product,
                 limit=limit,
                 after=after,
-                before=before
+                before=before,
+                sort_by=sort_by,
+                order=order,
+                query=select(Product).where(*filters),
+                schema=ProductSummary
             )
 
             if not paginated_products.data:
@@ -76,6 +126,72 @@ class ProductService(BaseService):
                 raise e
             raise HTTPException(status_code=500, detail="Internal Server Error")
     
+    async def export_products(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all products matching the filters as NDJSON or CSV.
+        """
+        logger.info(
+            "Exporting products",
+            extra={"extra_fields": {"format": format, "filters": len(filters)}}
+        )
+        return stream_export(Product, format=format, filters=filters, user_id=self.user.id)
+
+    async def search_products(self, q: str, limit: int = 10, after: Optional[str] = None) -> PaginatedResponse[ProductSearchResult]:
+        """
+        Ranked fuzzy search over product names and descriptions, keyset-paginated on (score, id).
+        """
+        try:
+            limit = min(100, limit)
+            position = decode_cursor(after, "score") if after else None
+            if self.db.get_bind().dialect.name == "postgresql":
+                results = await self._search_indexed(q, limit + 1, position)
+            else:
+                results = await self._search_in_process(q, limit + 1, position)
+
+            has_more = len(results) > limit
+            results = results[:limit]
+            next_cursor = encode_cursor([results[-1].score, results[-1].id]) if has_more else None
+
+            logger.info(
+                "Product search completed",
+                extra={"extra_fields": {"query": q, "results": len(results)}}
+            )
+            return PaginatedResponse(data=results, cursor=Cursor(next=next_cursor))
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Product search failed due to error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def _search_indexed(self, q: str, limit: int, position: Optional[list]) -> List[ProductSearchResult]:
+        score = product_search_score(q)
+        query = (
+            select(Product.id, Product.name, Product.description, Product.price, Product.category_id, score.label("score"))
+            .where(product_search_condition(q))
+        )
+        if position is not None:
+            value, cursor_id = position
+            query = query.where(or_(score < value, and_(score == value, Product.id > cursor_id)))
+        result = await self.db.execute(query.order_by(score.desc(), Product.id.asc()).limit(limit))
+        return [ProductSearchResult.model_validate(row._mapping) for row in result.all()]
+
+    async def _search_in_process(self, q: str, limit: int, position: Optional[list]) -> List[ProductSearchResult]:
+        # No pg_trgm/tsvector on this backend, so rank every product in Python
+        result = await self.db.execute(
+            select(Product.id, Product.name, Product.description, Product.price, Product.category_id)
+        )
+        ranked = []
+        for row in result.all():
+            score = fuzzy_score(q, row.name, row.description)
+            if score < FALLBACK_MIN_SCORE:
+                continue
+            if position is not None and (score, -row.id) >= (position[0], -position[1]):
+                continue
+            ranked.append(ProductSearchResult(**row._mapping, score=score))
+        ranked.sort(key=lambda item: (-item.score, item.id))
+        return ranked[:limit]
+
     async def update_product(self, id: int, product_update: ProductUpdate) -> ProductResponse:
         try:
             result = await self.db.execute(select(Product).options(selectinload(Product.category)).where(Product.id == id))
@@ -89,6 +205,7 @@ class ProductService(BaseService):
             
             await self.db.commit()
             await self.db.refresh(product)
+            autocomplete_index.upsert("products", product.id, product.name)
 
             logger.info(f"Product with ID ({id} updated succesfully)")
 
@@ -109,8 +226,9 @@ class ProductService(BaseService):
                 logger.warning(f"No product with id ({id}) found in database")
                 raise HTTPException(status_code=400, detail=f"No products with id ({id}) found")
             
-            self.db.delete(product)
+            await self.db.delete(product)
             await self.db.commit()
+            autocomplete_index.remove("products", id)
 
             return {"detail": f"Product with ID ({id}) has been deleted successfully"}
 
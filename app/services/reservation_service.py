@@ -0,0 +1,396 @@
+from fastapi import HTTPException
+from sqlalchemy.future import select
+from sqlalchemy import update
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
+from app.db.models import StockReservation, StockReservationAllocation, OutgoingOrder, OutgoingOrderAllocation, Product, Customer, OrderStatusEnum, ReservationStatusEnum, StockMovementReasonEnum
+from app.db.schemas import ReservationCreate, ReservationConvert, ReservationResponse, OutgoingOrderResponse
+from app.db.database import async_session
+from app.db.inventory import StockChange, apply_stock_changes, claim_product, is_lock_conflict, raise_batch_unavailable
+from app import settings
+from app.services.base import BaseService
+from app.services.outgoing_order_service import ALLOCATION_ATTEMPTS
+from sqlalchemy.orm import selectinload
+from sqlalchemy.exc import DBAPIError, IntegrityError
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationService(BaseService):
+    """
+    Service for time-limited stock holds placed ahead of an outgoing order.
+    The held quantity leaves the batches when the hold is placed and comes
+    back when it is released or expires, unless it becomes an order.
+    """
+
+    async def create_reservation(self, reservation: ReservationCreate) -> ReservationResponse:
+        """
+        Hold stock for a customer until the reservation expires.
+        """
+        ttl_seconds = reservation.ttl_seconds or settings.RESERVATION_TTL_SECONDS
+        if reservation.quantity <= 0:
+            raise HTTPException(status_code=400, detail="Quantity must be positive")
+        if ttl_seconds <= 0 or ttl_seconds > settings.RESERVATION_MAX_TTL_SECONDS:
+            raise HTTPException(status_code=400, detail=f"ttl_seconds must be between 1 and {settings.RESERVATION_MAX_TTL_SECONDS}")
+
+        try:
+            result = await self.db.execute(select(Customer.user_id).where(Customer.id == reservation.customer_id))
+            customer = result.first()
+            if customer is None:
+                logger.warning(
+                    "Customer not found for reservation",
+                    extra={"extra_fields": {"customer_id": reservation.customer_id}}
+                )
+                raise HTTPException(status_code=404, detail="Customer not found")
+            if self.user.role == "customer" and customer.user_id != self.user.id:
+                raise HTTPException(status_code=403, detail="Not authorized to reserve for this customer")
+
+            result = await self.db.execute(select(Product.id).where(Product.id == reservation.product_id))
+            if result.scalar_one_or_none() is None:
+                logger.warning(
+                    "Product not found for reservation",
+                    extra={"extra_fields": {"product_id": reservation.product_id}}
+                )
+                raise HTTPException(status_code=404, detail="Product not found")
+
+            for attempt in range(ALLOCATION_ATTEMPTS):
+                try:
+                    if reservation.stock_id is not None:
+                        allocations = {reservation.stock_id: reservation.quantity}
+                    else:
+                        allocations = await claim_product(self.db, reservation.product_id, reservation.quantity, reservation.allocation)
+
+                    if allocations is not None:
+                        new_reservation = StockReservation(
+                            customer_id=reservation.customer_id,
+                            product_id=reservation.product_id,
+                            quantity=reservation.quantity,
+                            status=ReservationStatusEnum.active,
+                            expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds),
+                            allocations=[
+                                StockReservationAllocation(stock_id=stock_id, quantity=quantity)
+                                for stock_id, quantity in allocations.items()
+                            ]
+                        )
+                        self.db.add(new_reservation)
+                        await self.db.flush()
+
+                        holds = [StockChange(stock_id, -quantity, new_reservation.id) for stock_id, quantity in allocations.items()]
+                        if await apply_stock_changes(
+                            self.db, holds, StockMovementReasonEnum.reservation, user_id=self.user.id, product_id=reservation.product_id
+                        ):
+                            break
+                        if reservation.stock_id is not None:
+                            # The guarded decrement changed nothing: the batch is short, gone or another product's
+                            await self.db.rollback()
+                            await raise_batch_unavailable(self.db, reservation.stock_id, reservation.quantity, reservation.product_id)
+                except IntegrityError:
+                    # Where foreign keys are enforced, a missing chosen batch already fails the insert
+                    if reservation.stock_id is None:
+                        raise
+                    await self.db.rollback()
+                    await raise_batch_unavailable(self.db, reservation.stock_id, reservation.quantity, reservation.product_id)
+                except DBAPIError as e:
+                    if not is_lock_conflict(e):
+                        raise
+                # Another order took stock from or deadlocked on the chosen batches
+                await self.db.rollback()
+            else:
+                logger.warning(
+                    "Stock reservation kept conflicting with concurrent orders",
+                    extra={"extra_fields": {"product_id": reservation.product_id, "attempts": ALLOCATION_ATTEMPTS}}
+                )
+                raise HTTPException(status_code=409, detail="Stock changed during allocation, please retry")
+
+            await self.db.commit()
+
+            logger.info(
+                "Stock reserved",
+                extra={"extra_fields": {
+                    "reservation_id": new_reservation.id,
+                    "customer_id": reservation.customer_id,
+                    "product_id": reservation.product_id,
+                    "quantity": reservation.quantity,
+                    "allocations": allocations,
+                    "ttl_seconds": ttl_seconds
+                }}
+            )
+            return await self._load(new_reservation.id)
+
+        except HTTPException:
+            # A failed allocation leaves its locks in the transaction
+            await self.db.rollback()
+            raise
+        except Exception as e:
+            logger.error(
+                "Error creating reservation",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_reservation(self, reservation_id: int) -> ReservationResponse:
+        """
+        Retrieve a reservation. Customers can only see their own.
+        """
+        try:
+            reservation = await self._get_authorized(reservation_id)
+            logger.info(
+                "Reservation retrieved",
+                extra={"extra_fields": {"reservation_id": reservation.id, "status": reservation.status.value}}
+            )
+            return ReservationResponse.model_validate(reservation)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error fetching reservation",
+                extra={"extra_fields": {"reservation_id": reservation_id, "error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def release_reservation(self, reservation_id: int) -> ReservationResponse:
+        """
+        Give up an active reservation, returning its quantity to stock.
+        """
+        try:
+            reservation = await self._get_authorized(reservation_id)
+            released = await close_reservations(self.db, [reservation_id], ReservationStatusEnum.released, user_id=self.user.id)
+            if not released:
+                await self.db.rollback()
+                await self._raise_not_active(reservation_id)
+            await self.db.commit()
+
+            logger.info(
+                "Reservation released",
+                extra={"extra_fields": {"reservation_id": reservation_id, "customer_id": reservation.customer_id}}
+            )
+            return await self._load(reservation_id)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error releasing reservation",
+                extra={"extra_fields": {"reservation_id": reservation_id, "error": str(e)}}
+            )
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def convert_reservation(self, reservation_id: int, conversion: ReservationConvert) -> OutgoingOrderResponse:
+        """
+        Turn an active reservation into a pending outgoing order for the held
+        batches. The stock was already taken when the hold was placed, so no
+        batch is read or changed and the conversion cannot run out of stock.
+        """
+        try:
+            await self._get_authorized(reservation_id)
+            # Claiming the reservation with a conditional UPDATE makes the
+            # conversion race safely with a release or the expiry sweeper
+            now = datetime.now(timezone.utc)
+            result = await self.db.execute(
+                update(StockReservation)
+                .where(
+                    StockReservation.id == reservation_id,
+                    StockReservation.status == ReservationStatusEnum.active,
+                    StockReservation.expires_at > now
+                )
+                .values(status=ReservationStatusEnum.converted, updated_at=now)
+                .returning(StockReservation.customer_id, StockReservation.product_id, StockReservation.quantity)
+                .execution_options(synchronize_session=False)
+            )
+            claimed = result.first()
+            if claimed is None:
+                await self.db.rollback()
+                await self._raise_not_active(reservation_id)
+
+            result = await self.db.execute(
+                select(StockReservationAllocation.stock_id, StockReservationAllocation.quantity)
+                .where(StockReservationAllocation.reservation_id == reservation_id)
+                .order_by(StockReservationAllocation.id)
+            )
+            allocations = result.all()
+            result = await self.db.execute(select(Product.price).where(Product.id == claimed.product_id))
+            price = result.scalar_one_or_none()
+            unit_price = float(price) if price else 0
+
+            new_order = OutgoingOrder(
+                customer_id=claimed.customer_id,
+                product_id=claimed.product_id,
+                stock_id=allocations[0].stock_id,
+                quantity=claimed.quantity,
+                unit_price=unit_price,
+                total_price=unit_price * claimed.quantity,
+                order_date=conversion.order_date or now,
+                status=OrderStatusEnum.pending,
+                allocations=[
+                    OutgoingOrderAllocation(stock_id=stock_id, quantity=quantity)
+                    for stock_id, quantity in allocations
+                ]
+            )
+            self.db.add(new_order)
+            await self.db.flush()
+            await self.db.execute(
+                update(StockReservation)
+                .where(StockReservation.id == reservation_id)
+                .values(outgoing_order_id=new_order.id)
+                .execution_options(synchronize_session=False)
+            )
+            await self.db.commit()
+
+            result = await self.db.execute(
+                select(OutgoingOrder)
+                .options(
+                    selectinload(OutgoingOrder.customer),
+                    selectinload(OutgoingOrder.product),
+                    selectinload(OutgoingOrder.allocations)
+                )
+                .where(OutgoingOrder.id == new_order.id)
+                .execution_options(populate_existing=True)
+            )
+            new_order = result.scalars().first()
+
+            logger.info(
+                "Reservation converted to outgoing order",
+                extra={"extra_fields": {
+                    "reservation_id": reservation_id,
+                    "order_id": new_order.id,
+                    "customer_id": new_order.customer_id,
+                    "quantity": new_order.quantity
+                }}
+            )
+            return OutgoingOrderResponse.model_validate(new_order)
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error converting reservation",
+                extra={"extra_fields": {"reservation_id": reservation_id, "error": str(e)}}
+            )
+            await self.db.rollback()
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def _get_authorized(self, reservation_id: int) -> StockReservation:
+        result = await self.db.execute(
+            select(StockReservation)
+            .options(selectinload(StockReservation.customer), selectinload(StockReservation.allocations))
+            .where(StockReservation.id == reservation_id)
+        )
+        reservation = result.scalars().first()
+        if not reservation:
+            logger.warning(
+                "Reservation not found",
+                extra={"extra_fields": {"reservation_id": reservation_id}}
+            )
+            raise HTTPException(status_code=404, detail=f"Reservation with id {reservation_id} not found")
+        if self.user.role == "customer" and reservation.customer.user_id != self.user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to access this reservation")
+        return reservation
+
+    async def _load(self, reservation_id: int) -> ReservationResponse:
+        result = await self.db.execute(
+            select(StockReservation)
+            .options(selectinload(StockReservation.allocations))
+            .where(StockReservation.id == reservation_id)
+            .execution_options(populate_existing=True)
+        )
+        return ReservationResponse.model_validate(result.scalars().first())
+
+    async def _raise_not_active(self, reservation_id: int) -> None:
+        result = await self.db.execute(
+            select(StockReservation.status, StockReservation.expires_at).where(StockReservation.id == reservation_id)
+        )
+        row = result.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Reservation with id {reservation_id} not found")
+        expires_at = row.expires_at if row.expires_at.tzinfo else row.expires_at.replace(tzinfo=timezone.utc)
+        if row.status == ReservationStatusEnum.active and expires_at <= datetime.now(timezone.utc):
+            detail = "Reservation has expired"
+        else:
+            detail = f"Reservation is already {row.status.value}"
+        logger.warning(
+            "Reservation is no longer active",
+            extra={"extra_fields": {"reservation_id": reservation_id, "status": row.status.value}}
+        )
+        raise HTTPException(status_code=409, detail=detail)
+
+
+async def close_reservations(db, ids: Sequence[int], status: ReservationStatusEnum, user_id: Optional[int] = None, conditions: Sequence[ColumnElement] = ()) -> List[int]:
+    """
+    Move the still active reservations among `ids` to `status` and return
+    their held quantities to stock. Returns the ids that were closed, or
+    rolls back and raises a 409 if one of their batches no longer exists.
+    """
+    result = await db.execute(
+        update(StockReservation)
+        .where(StockReservation.id.in_(ids), StockReservation.status == ReservationStatusEnum.active, *conditions)
+        .values(status=status, updated_at=datetime.now(timezone.utc))
+        .returning(StockReservation.id)
+        .execution_options(synchronize_session=False)
+    )
+    closed = result.scalars().all()
+    if closed:
+        result = await db.execute(
+            select(StockReservationAllocation.reservation_id, StockReservationAllocation.stock_id, StockReservationAllocation.quantity)
+            .where(StockReservationAllocation.reservation_id.in_(closed))
+            .order_by(StockReservationAllocation.id)
+        )
+        returns = [StockChange(stock_id, quantity, reservation_id) for reservation_id, stock_id, quantity in result.all()]
+        if not await apply_stock_changes(db, returns, StockMovementReasonEnum.release, guard=False, user_id=user_id):
+            # Only a batch that no longer exists is skipped by an unguarded update
+            await db.rollback()
+            logger.error(
+                "Closed reservations reference missing stock batches",
+                extra={"extra_fields": {"reservation_ids": closed, "stock_ids": sorted({change.stock_id for change in returns})}}
+            )
+            raise HTTPException(status_code=409, detail="Cannot return stock to a batch that no longer exists")
+    return closed
+
+
+async def expire_reservations() -> int:
+    """
+    Release every reservation past its expiry, oldest first, in batches of
+    RESERVATION_SWEEP_BATCH. Returns how many were expired.
+    """
+    expired = 0
+    async with async_session() as session:
+        while True:
+            now = datetime.now(timezone.utc)
+            # Served from the (status, expires_at) index; rows another
+            # sweeper or a conversion holds are left for them
+            result = await session.execute(
+                select(StockReservation.id)
+                .where(StockReservation.status == ReservationStatusEnum.active, StockReservation.expires_at <= now)
+                .order_by(StockReservation.expires_at)
+                .limit(settings.RESERVATION_SWEEP_BATCH)
+                .with_for_update(skip_locked=True)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                break
+            closed = await close_reservations(session, ids, ReservationStatusEnum.expired, conditions=[StockReservation.expires_at <= now])
+            await session.commit()
+            expired += len(closed)
+            if len(ids) < settings.RESERVATION_SWEEP_BATCH:
+                break
+
+    if expired:
+        logger.info(
+            "Expired reservations released",
+            extra={"extra_fields": {"expired": expired}}
+        )
+    return expired
+
+
+async def expire_reservations_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.RESERVATION_SWEEP_SECONDS)
+        try:
+            await expire_reservations()
+        except Exception as e:
+            logger.warning(f"Reservation expiry sweep failed: {str(e)}")
@@ -1,10 +1,14 @@
 from fastapi import HTTPException
 from sqlalchemy.future import select
-from typing import List, Optional
-from app.db.models import Stock
-from app.db.schemas import StockUpdate, StockResponse, StockSummary, PaginatedResponse
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
+from app.db.models import Stock, StockMovement, StockMovementReasonEnum
+from app.db.schemas import StockUpdate, StockResponse, StockSummary, StockMovementResponse, StockBalance, StockAsOfResponse, PaginatedResponse
+from app.db.inventory import StockChange, apply_stock_changes
 from app.services.base import BaseService
-from app.utils import paginate
+from app.utils import paginate, stream_export
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import selectinload
 import logging
 
@@ -17,7 +21,7 @@ class StockService(BaseService):
     Handles retrieving stock levels and manual adjustments.
     """
 
-    async def get_all_stocks(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[StockSummary]:
+    async def get_all_stocks(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[StockSummary]:
         """
         Retrieve all stock entries.
         """
@@ -27,7 +31,11 @@ class StockService(BaseService):
                 model=Stock,
                 limit=limit,
                 after=after,
-                before=before
+                before=before,
+                sort_by=sort_by,
+                order=order,
+                query=select(Stock).where(*filters),
+                schema=StockSummary
             )
             if not paginated_stocks.data:
                 logger.warning("No stock entries found in database")
@@ -48,6 +56,16 @@ class StockService(BaseService):
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
+    async def export_stocks(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all stock entries matching the filters as NDJSON or CSV.
+        """
+        logger.info(
+            "Exporting stock entries",
+            extra={"extra_fields": {"format": format, "filters": len(filters)}}
+        )
+        return stream_export(Stock, format=format, filters=filters, user_id=self.user.id)
+
     async def get_stock_by_id(self, stock_id: int) -> StockResponse:
         """
         Retrieve a specific stock entry by ID.
@@ -85,32 +103,138 @@ class StockService(BaseService):
             )
             raise HTTPException(status_code=500, detail="Internal Server Error")
 
+    async def get_stocks_by_ids(self, ids: List[int]) -> List[StockResponse]:
+        """
+        Retrieve several stock entries in one query. Unknown ids are skipped.
+        """
+        try:
+            stocks = await self.loader.load_many(Stock, ids)
+            found = [StockResponse.model_validate(stock) for stock in stocks if stock is not None]
+            logger.info(
+                "Stock entries retrieved in batch",
+                extra={"extra_fields": {"requested": len(ids), "found": len(found)}}
+            )
+            return found
+        except Exception as e:
+            logger.error(
+                "Error fetching stock entries in batch",
+                extra={"extra_fields": {"error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_stock_movements(self, stock_id: int, limit: int, after: Optional[str] = None, before: Optional[str] = None, order: str = "asc") -> PaginatedResponse[StockMovementResponse]:
+        """
+        Ledger of one stock entry, oldest movement first by default.
+        """
+        try:
+            paginated_movements = await paginate(
+                db=self.db,
+                model=StockMovement,
+                limit=limit,
+                after=after,
+                before=before,
+                order=order,
+                query=select(StockMovement).where(StockMovement.stock_id == stock_id),
+                schema=StockMovementResponse
+            )
+            if not paginated_movements.data:
+                logger.warning(
+                    "No stock movements found",
+                    extra={"extra_fields": {"stock_id": stock_id}}
+                )
+                raise HTTPException(status_code=404, detail=f"No movements found for stock with id {stock_id}")
+
+            logger.info(
+                "Stock movements retrieved",
+                extra={"extra_fields": {"stock_id": stock_id, "movements": len(paginated_movements.data)}}
+            )
+            return paginated_movements
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(
+                "Error fetching stock movements",
+                extra={"extra_fields": {"stock_id": stock_id, "error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    async def get_stock_levels_as_of(self, at: datetime, product_id: Optional[int] = None) -> StockAsOfResponse:
+        """
+        Quantity of each stock entry at time `at`. Every movement records the
+        balance it left, so each entry costs one index seek for its latest
+        movement at or before `at`, however long its history.
+        """
+        try:
+            if at.tzinfo is None:
+                at = at.replace(tzinfo=timezone.utc)
+            balance = (
+                select(StockMovement.balance_after)
+                .where(StockMovement.stock_id == Stock.id, StockMovement.created_at <= at)
+                .order_by(StockMovement.created_at.desc(), StockMovement.id.desc())
+                .limit(1)
+                .correlate(Stock)
+                .scalar_subquery()
+            )
+            levels = (
+                select(Stock.id.label("stock_id"), Stock.product_id, Stock.batch_number, balance.label("quantity"))
+                .where(*([Stock.product_id == product_id] if product_id is not None else []))
+                .subquery()
+            )
+            # Entries without a movement by then did not exist yet
+            result = await self.db.execute(
+                select(levels).where(levels.c.quantity.is_not(None)).order_by(levels.c.stock_id)
+            )
+            stocks = [StockBalance.model_validate(row._mapping) for row in result.all()]
+            total = sum(stock.quantity for stock in stocks)
+
+            logger.info(
+                "Stock levels computed as of a point in time",
+                extra={"extra_fields": {"at": at.isoformat(), "product_id": product_id, "stocks": len(stocks), "total": total}}
+            )
+            return StockAsOfResponse(at=at, total=total, stocks=stocks)
+
+        except Exception as e:
+            logger.error(
+                "Error computing stock levels as of a point in time",
+                extra={"extra_fields": {"at": at.isoformat(), "error": str(e)}}
+            )
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
     async def update_stock(self, stock_id: int, stock_update: StockUpdate) -> StockResponse:
         """
         Manually adjust stock quantity (PATCH operation).
         This is for manual stock adjustments, not for order-based changes.
+        The difference is recorded as an adjustment movement.
         """
         try:
             result = await self.db.execute(
-                select(Stock)
-                .options(selectinload(Stock.product))
-                .where(Stock.id == stock_id)
+                select(Stock.available_quantity).where(Stock.id == stock_id).with_for_update()
             )
-            stock = result.scalars().first()
-            if not stock:
+            old_quantity = result.scalar_one_or_none()
+            if old_quantity is None:
                 logger.warning(
                     "Stock entry not found for update",
                     extra={"extra_fields": {"stock_id": stock_id}}
                 )
                 raise HTTPException(status_code=404, detail=f"Stock with id {stock_id} not found")
-            
-            old_quantity = stock.available_quantity
-            
-            for key, value in stock_update.model_dump(exclude_unset=True).items():
-                setattr(stock, key, value)
-            
+
+            new_quantity = stock_update.available_quantity
+            if new_quantity is not None and new_quantity != old_quantity:
+                if new_quantity < 0:
+                    await self.db.rollback()
+                    raise HTTPException(status_code=400, detail="Quantity cannot be negative")
+                adjustment = [StockChange(stock_id, new_quantity - old_quantity)]
+                await apply_stock_changes(self.db, adjustment, StockMovementReasonEnum.adjustment, user_id=self.user.id)
             await self.db.commit()
-            await self.db.refresh(stock)
+
+            result = await self.db.execute(
+                select(Stock)
+                .options(selectinload(Stock.product))
+                .where(Stock.id == stock_id)
+                .execution_options(populate_existing=True)
+            )
+            stock = result.scalars().first()
 
             logger.info(
                 "Stock entry updated",
@@ -133,4 +257,4 @@ class StockService(BaseService):
                 extra={"extra_fields": {"stock_id": stock_id, "error": str(e)}}
             )
             await self.db.rollback()
-            raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail="Internal Server Error")
@@ -1,11 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.services.base import BaseService
+from app.autocomplete import autocomplete_index
 from app.db.models import Supplier, UserRole
 from app.db.schemas import SupplierCreate, SupplierUpdate, PaginatedResponse, SupplierSummary
 from sqlalchemy.future import select
 from fastapi import HTTPException, status
-from typing import List, Optional
-from app.utils import paginate
+from typing import List, Optional, Sequence
+from sqlalchemy.sql.elements import ColumnElement
+from app.utils import paginate, stream_export
+from fastapi.responses import StreamingResponse
 
 class SupplierService(BaseService):
     async def create_supplier(self, supplier_data: SupplierCreate) -> Supplier:
@@ -13,26 +16,40 @@ class SupplierService(BaseService):
         self.db.add(supplier)
         await self.db.commit()
         await self.db.refresh(supplier)
+        autocomplete_index.upsert("suppliers", supplier.id, supplier.name)
         return supplier
 
-    async def get_all_suppliers(self, limit: int, after: Optional[str] = None, before: Optional[str] = None) -> PaginatedResponse[SupplierSummary]:
+    async def get_all_suppliers(self, limit: int, after: Optional[str] = None, before: Optional[str] = None, sort_by: str = "id", order: str = "asc", filters: Sequence[ColumnElement] = ()) -> PaginatedResponse[SupplierSummary]:
         paginated_suppliers = await paginate(
             db=self.db,
             model=Supplier,
             limit=limit,
             after=after,
-            before=before
+            before=before,
+            sort_by=sort_by,
+            order=order,
+            query=select(Supplier).where(*filters),
+            schema=SupplierSummary
         )
         if not paginated_suppliers.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No suppliers found")
         return paginated_suppliers
 
+    async def export_suppliers(self, format: str = "ndjson", filters: Sequence[ColumnElement] = ()) -> StreamingResponse:
+        """
+        Stream all suppliers matching the filters as NDJSON or CSV.
+        """
+        return stream_export(Supplier, format=format, filters=filters, user_id=self.user.id)
+
     async def get_supplier_by_id(self, supplier_id: int) -> Supplier:
         supplier = await self.db.get(Supplier, supplier_id)
         if not supplier:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Supplier not found")
         return supplier
 
+    async def get_suppliers_by_ids(self, ids: List[int]) -> List[Supplier]:
+        return [supplier for supplier in await self.loader.load_many(Supplier, ids) if supplier is not None]
+
     async def get_my_supplier_profile(self) -> Supplier:
         result = await self.db.execute(select(Supplier).where(Supplier.user_id == self.user.id))
         supplier = result.scalars().first()
@@ -51,6 +68,7 @@ class SupplierService(BaseService):
         
         await self.db.commit()
         await self.db.refresh(supplier)
+        autocomplete_index.upsert("suppliers", supplier.id, supplier.name)
         return supplier
 
     async def delete_supplier(self, supplier_id: int) -> None:
@@ -60,4 +78,5 @@ class SupplierService(BaseService):
 
         await self.db.delete(supplier)
         await self.db.commit()
+        autocomplete_index.remove("suppliers", supplier_id)
         return
@@ -1,17 +1,166 @@
 import base64
-from typing import Optional, Type
-from sqlalchemy import select, asc, desc, Column
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Type, Union
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, update, and_, or_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import DeclarativeMeta, Query
 from sqlalchemy.sql.elements import BinaryExpression
-from app.db.models import User
+from sqlalchemy.sql.elements import ColumnElement
+from app import settings
+from app.db.database import async_session
+from app.db.models import User, OrderStatusEnum
 from app.db.schemas import PaginatedResponse, Cursor
 
+CURSOR_VERSION = 1
+MAX_BATCH_IDS = 100
+
+# Statuses an order may move to from each status
+ORDER_STATUS_TRANSITIONS = {
+    OrderStatusEnum.pending: (OrderStatusEnum.completed, OrderStatusEnum.cancelled),
+}
+
 async def filter_user(db: AsyncSession, filter_condition: BinaryExpression):
     query = select(User).where(filter_condition)
     result = await db.execute(query)
     return result.scalars().first()
 
+
+def batch_ids(ids: str) -> List[int]:
+    """
+    Dependency parsing a comma-separated `ids` query parameter, e.g. ?ids=1,2,3.
+    Duplicates are dropped and the requested order is kept.
+    """
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not parsed:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be fetched at once")
+    return parsed
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    if hasattr(value, "value"):  # enums
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+        raise ValueError("Unknown cursor value type")
+    return value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Opaque, versioned cursor holding the keyset position (sort value, id).
+    """
+    payload = json.dumps({"v": CURSOR_VERSION, "k": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_by: str) -> List[Any]:
+    try:
+        decoded = base64.urlsafe_b64decode(cursor.encode()).decode()
+        if decoded.isdigit() and sort_by == "id":
+            # Cursors issued before keyset cursors were versioned
+            return [int(decoded)]
+        payload = json.loads(decoded)
+        if payload.get("v") != CURSOR_VERSION:
+            raise ValueError("Unsupported cursor version")
+        values = [_decode_value(v) for v in payload["k"]]
+    except (ValueError, TypeError, KeyError, AttributeError, UnicodeDecodeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if len(values) != (1 if sort_by == "id" else 2):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+    return values
+
+
+@lru_cache(maxsize=None)
+def sortable_columns(model: Type[DeclarativeMeta]) -> Dict[str, Any]:
+    """
+    Columns a model can be keyset-paginated on: its primary key plus every
+    column with a composite (column, id) index, so each page is a range scan.
+    """
+    columns = {"id": model.id}
+    for index in model.__table__.indexes:
+        names = [column.name for column in index.columns]
+        if len(names) == 2 and names[1] == "id":
+            columns[names[0]] = getattr(model, names[0])
+    return columns
+
+
+def _after_position(sort_column, id_column, values: List[Any], ascending: bool):
+    """
+    Rows strictly after the cursor position in the given traversal direction.
+    NULL sort values are ordered last when ascending, first when descending.
+    """
+    if len(values) == 1:
+        return id_column > values[0] if ascending else id_column < values[0]
+
+    value, cursor_id = values
+    nullable = sort_column.property.columns[0].nullable
+    if ascending:
+        if value is None:
+            return and_(sort_column.is_(None), id_column > cursor_id)
+        condition = tuple_(sort_column, id_column) > tuple_(value, cursor_id)
+        return or_(condition, sort_column.is_(None)) if nullable else condition
+
+    if value is None:
+        return or_(and_(sort_column.is_(None), id_column < cursor_id), sort_column.isnot(None))
+    return tuple_(sort_column, id_column) < tuple_(value, cursor_id)
+
+
+def _ordering(sort_column, id_column, sort_by: str, ascending: bool):
+    if sort_by == "id":
+        return [id_column.asc() if ascending else id_column.desc()]
+    if ascending:
+        return [sort_column.asc().nulls_last(), id_column.asc()]
+    return [sort_column.desc().nulls_first(), id_column.desc()]
+
+
+@lru_cache(maxsize=None)
+def projected_columns(model: Type[DeclarativeMeta], schema: Type[BaseModel]) -> Optional[tuple]:
+    """
+    Table columns needed to build `schema` directly from result rows, or None
+    when the schema needs more than plain columns (e.g. a nested relationship).
+    """
+    table_columns = model.__table__.columns
+    if any(field not in table_columns for field in schema.model_fields):
+        return None
+    return tuple(getattr(model, field) for field in schema.model_fields)
+
+
+def _position(item: Any, sort_by: str) -> List[Any]:
+    if sort_by == "id":
+        return [item.id]
+    return [getattr(item, sort_by), item.id]
+
+
 async def paginate(
     db: AsyncSession,
     model: Type[DeclarativeMeta],
@@ -19,63 +168,191 @@ async def paginate(
     after: Optional[str] = None,
     before: Optional[str] = None,
     sort_by: str = "id",
-    query: Optional[Query] = None
+    order: str = "asc",
+    query: Optional[Query] = None,
+    schema: Optional[Type[BaseModel]] = None
 ) -> PaginatedResponse:
     """
-    Performs cursor-based pagination on a SQLAlchemy model.
+    Performs keyset pagination on a SQLAlchemy model over (sort_by, id).
+
+    When `schema` only needs plain columns, just those columns are selected and
+    each page is built straight from the rows, skipping ORM entity hydration.
     """
     limit = min(100, limit)  # Enforce a max limit
     if query is None:
         query = select(model)
-    
-    sort_column: Column = getattr(model, sort_by, model.id)
 
-    if after:
-        try:
-            decoded_cursor = base64.b64decode(after).decode()
-            cursor_id = int(decoded_cursor)
-            query = query.where(sort_column > cursor_id).order_by(asc(sort_column))
-        except (ValueError, TypeError):
-            # Handle invalid cursor
-            pass
-    elif before:
-        try:
-            decoded_cursor = base64.b64decode(before).decode()
-            cursor_id = int(decoded_cursor)
-            # When going backwards, we fetch in reverse order and then flip the results
-            query = query.where(sort_column < cursor_id).order_by(desc(sort_column))
-        except (ValueError, TypeError):
-            # Handle invalid cursor
-            pass
-    else:
-        # Default order for the first page
-        query = query.order_by(asc(sort_column))
+    columns = sortable_columns(model)
+    if sort_by not in columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot sort by '{sort_by}'. Sortable fields: {', '.join(sorted(columns))}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be 'asc' or 'desc'")
+    sort_column = columns[sort_by]
+    id_column = model.id
+
+    # When going backwards, we walk the index in reverse and flip the results
+    ascending = (order == "asc") != bool(before)
+    cursor = after or before
+    if cursor:
+        query = query.where(_after_position(sort_column, id_column, decode_cursor(cursor, sort_by), ascending))
+    query = query.order_by(*_ordering(sort_column, id_column, sort_by, ascending))
+
+    projection = projected_columns(model, schema) if schema is not None else None
+    if projection is not None:
+        # The cursor position still needs (sort column, id) even if the schema does not
+        extra = {column.key: column for column in (sort_column, id_column) if column.key not in schema.model_fields}
+        query = query.with_only_columns(*projection, *extra.values())
 
     # Fetch one more than the limit to see if there's a next page
     query = query.limit(limit + 1)
     result = await db.execute(query)
-    items = result.scalars().all()
+    items = result.all() if projection is not None else result.scalars().all()
 
     has_more = len(items) > limit
     items = items[:limit]
-    
+
     if before:
         # If we were going backwards, reverse the list to show correct order
         items.reverse()
 
     next_cursor = None
-    if has_more or before:
-        if items:
-            next_cursor_val = getattr(items[-1], sort_by, items[-1].id)
-            next_cursor = base64.b64encode(str(next_cursor_val).encode()).decode()
+    if items and (has_more or before):
+        next_cursor = encode_cursor(_position(items[-1], sort_by))
 
     prev_cursor = None
-    if (after and items) or (has_more and not before):
-        if items:
-            prev_cursor_val = getattr(items[0], sort_by, items[0].id)
-            prev_cursor = base64.b64encode(str(prev_cursor_val).encode()).decode()
+    if items and (after or (before and has_more)):
+        prev_cursor = encode_cursor(_position(items[0], sort_by))
+
+    if projection is not None:
+        items = [schema.model_validate(row._mapping) for row in items]
 
     return PaginatedResponse(
         data=items,
         cursor=Cursor(next=next_cursor, prev=prev_cursor)
-    )
\ No newline at end of file
+    )
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+async def _export_partitions(query, user_id: Optional[int]) -> AsyncIterator[Sequence[Any]]:
+    # The export outlives the request-scoped session, so it opens its own.
+    # It is read-only and therefore served by the replica when there is one.
+    async with async_session() as session:
+        session.info["read_only"] = True
+        session.info["user_id"] = user_id
+        result = await session.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            yield partition
+
+
+async def _ndjson_lines(query, columns: List[str], user_id: Optional[int]) -> AsyncIterator[str]:
+    async for partition in _export_partitions(query, user_id):
+        yield "".join(
+            json.dumps({name: _export_value(value) for name, value in zip(columns, row)}) + "\n"
+            for row in partition
+        )
+
+
+async def _csv_lines(query, columns: List[str], user_id: Optional[int]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for partition in _export_partitions(query, user_id):
+        writer.writerows([_export_value(value) for value in row] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(
+    model: Type[DeclarativeMeta],
+    format: str = "ndjson",
+    filters: Sequence[ColumnElement] = (),
+    user_id: Optional[int] = None
+) -> StreamingResponse:
+    """
+    Stream every row of `model` matching `filters` as NDJSON or CSV.
+
+    Rows are read through a server-side cursor EXPORT_BATCH_SIZE at a time and
+    written out as they arrive, so memory stays flat regardless of table size.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    table_columns = list(model.__table__.columns)
+    query = select(*table_columns).where(*filters).order_by(model.id)
+    columns = [column.name for column in table_columns]
+    lines = _ndjson_lines if format == "ndjson" else _csv_lines
+    filename = f"{model.__tablename__}.{format}"
+    return StreamingResponse(
+        lines(query, columns, user_id),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def parse_csv_rows(text: str, schema: Type[BaseModel]) -> List[Union[BaseModel, str]]:
+    """
+    Parse a CSV document with a header row into `schema` instances, one per
+    data row. Rows that fail validation are returned as an error message in
+    their place, so callers can report them by line. Empty cells are None.
+    """
+    rows: List[Union[BaseModel, str]] = []
+    for row in csv.DictReader(io.StringIO(text)):
+        try:
+            rows.append(schema.model_validate({key: value or None for key, value in row.items() if key}))
+        except ValidationError as e:
+            error = e.errors()[0]
+            rows.append(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+    return rows
+
+
+async def transition_order_status(
+    db: AsyncSession,
+    model: Type[DeclarativeMeta],
+    status: OrderStatusEnum,
+    ids: Optional[Sequence[int]] = None,
+    conditions: Sequence[ColumnElement] = (),
+    returning: Sequence[ColumnElement] = (),
+    scope: Sequence[ColumnElement] = ()
+) -> list:
+    """
+    Move the orders matching `ids` and `conditions` to `status` with a single
+    UPDATE ... RETURNING. Orders whose current status does not allow the
+    transition are left alone; the id (plus `returning` columns) of every
+    order that moved is returned.
+
+    `scope` limits which orders the caller may touch (e.g. a supplier's own)
+    and, unlike `conditions`, does not count as a selection.
+    """
+    if ids is None and not conditions:
+        raise HTTPException(status_code=400, detail="Provide ids or at least one filter")
+    if ids is not None and len(ids) > settings.BULK_MAX_LINES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_LINES} orders can be updated at once")
+    sources = [source for source, targets in ORDER_STATUS_TRANSITIONS.items() if status in targets]
+    if ids is not None:
+        conditions = [model.id.in_(ids), *conditions]
+    result = await db.execute(
+        update(model)
+        .where(*conditions, *scope, model.status.in_(sources))
+        .values(status=status)
+        .returning(model.id, *returning)
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
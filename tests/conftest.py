@@ -0,0 +1,118 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Tests always run against a throwaway SQLite database, whatever .env says
+_database_dir = tempfile.mkdtemp(prefix="inventoryflow-tests-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ.pop("DB_REPLICA_URL", None)
+os.environ.pop("REDIS_URL", None)
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("LOG_CONSOLE", "json")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from app.auth import auth_utils
+from app.auth.user_cache import token_cache, user_cache
+from app.db.database import Base, async_session, engine
+from app.db.inventory import record_receipts, StockReceipt
+from app.db.models import (
+    Category, Customer, IncomingOrder, OrderStatusEnum, Product, Stock, Supplier, User, UserRole
+)
+
+ADMIN = {"email": "admin@example.com", "password": "admin-password", "username": "admin",
+         "first_name": "Ada", "last_name": "Admin", "role": "admin"}
+
+# Products seeded by `seed_inventory`, each with two batches of this size
+SEEDED_PRODUCTS = 2
+SEEDED_BATCH_QUANTITY = 20
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def seed_inventory(session) -> None:
+    """
+    One supplier, one customer and SEEDED_PRODUCTS products with two batches
+    each: stocks 1-2 belong to product 1, stocks 3-4 to product 2 and so on.
+    """
+    now = datetime.now(timezone.utc)
+    category = Category(name="General")
+    supplier_user = User(username="supplier", first_name="Sam", last_name="Supplier", email="supplier@example.com",
+                         hashed_password="!", role=UserRole.supplier)
+    customer_user = User(username="customer", first_name="Cat", last_name="Customer", email="customer@example.com",
+                         hashed_password="!", role=UserRole.customer)
+    session.add_all([category, supplier_user, customer_user])
+    await session.flush()
+    supplier = Supplier(user_id=supplier_user.id, name="Acme Supplies")
+    customer = Customer(user_id=customer_user.id, first_name="Cat", last_name="Customer")
+    session.add_all([supplier, customer])
+    await session.flush()
+
+    receipts = []
+    for index in range(SEEDED_PRODUCTS):
+        product = Product(name=f"Product {index + 1}", price=10 + index, category_id=category.id)
+        session.add(product)
+        await session.flush()
+        for batch in range(2):
+            batch_number = f"P{index + 1}-B{batch + 1}"
+            incoming = IncomingOrder(
+                supplier_id=supplier.id, product_id=product.id, batch_number=batch_number,
+                quantity=SEEDED_BATCH_QUANTITY, unit_cost=5, total_cost=5 * SEEDED_BATCH_QUANTITY,
+                supply_date=now, status=OrderStatusEnum.completed
+            )
+            session.add(incoming)
+            await session.flush()
+            stock = Stock(
+                product_id=product.id, incoming_order_id=incoming.id, batch_number=batch_number,
+                available_quantity=SEEDED_BATCH_QUANTITY, expiry_date=now + timedelta(days=30 * (batch + 1))
+            )
+            session.add(stock)
+            await session.flush()
+            receipts.append(StockReceipt(stock.id, product.id, SEEDED_BATCH_QUANTITY, incoming.id))
+    await record_receipts(session, receipts)
+
+
+async def _recreate_database(seed) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as session:
+        await seed(session)
+        await session.commit()
+    # Connections belong to this event loop; the app opens its own
+    await engine.dispose()
+
+
+async def stock_quantities() -> dict:
+    async with async_session() as session:
+        result = await session.execute(select(Stock.id, Stock.available_quantity))
+        quantities = dict(result.all())
+    await engine.dispose()
+    return quantities
+
+
+@pytest.fixture
+def seeded_db():
+    # Ids restart with every database, so nothing cached about a user may survive
+    token_cache.clear()
+    user_cache.clear()
+    auth_utils._token_versions.clear()
+    run(_recreate_database(seed_inventory))
+
+
+@pytest.fixture
+def client(seeded_db):
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def admin_headers(client) -> dict:
+    client.post("/auth/register", json=ADMIN)
+    response = client.post("/auth/login", json={"email": ADMIN["email"], "password": ADMIN["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.auth.token_store import DatabaseRefreshTokenStore
+from app.db.database import async_session, engine
+from app.db.models import RefreshToken
+from tests.conftest import ADMIN, run
+
+
+def login(client) -> dict:
+    client.post("/auth/register", json=ADMIN)
+    return client.post("/auth/login", json={"email": ADMIN["email"], "password": ADMIN["password"]}).json()
+
+
+def test_refresh_token_is_single_use(client):
+    tokens = login(client)
+
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 200
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_logout_revokes_refresh_tokens(client):
+    tokens = login(client)
+
+    response = client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+
+    assert response.status_code == 204
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_database_store_prunes_only_expired_tokens(seeded_db):
+    async def scenario():
+        store = DatabaseRefreshTokenStore()
+        now = datetime.now(timezone.utc)
+        await store.issue("expired", "family-1", 1, now - timedelta(seconds=1))
+        await store.issue("used", "family-2", 1, now + timedelta(days=1))
+        await store.issue("live", "family-3", 1, now + timedelta(days=1))
+        assert await store.redeem("used", "family-2")
+
+        pruned = await store.prune()
+        async with async_session() as session:
+            remaining = set((await session.execute(select(RefreshToken.jti))).scalars())
+        await engine.dispose()
+        return pruned, remaining
+
+    pruned, remaining = run(scenario())
+
+    assert pruned == 1
+    # A used token is kept until it expires so that a replay still revokes its family
+    assert remaining == {"used", "live"}
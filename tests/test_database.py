@@ -0,0 +1,59 @@
+import asyncio
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.database import InstrumentedQueuePool, engine_url, get_pool_stats
+from tests.conftest import run
+
+CONNECT_SECONDS = 0.05
+HOLD_SECONDS = 0.2
+
+
+def test_asyncpg_url_gets_prepared_statement_cache_size():
+    url = engine_url("postgresql+asyncpg://user:password@db:5432/inventory")
+
+    assert url.query["prepared_statement_cache_size"] == "100"
+
+
+def test_prepared_statement_cache_size_in_url_is_kept():
+    url = engine_url("postgresql+asyncpg://user:password@db/inventory?prepared_statement_cache_size=0")
+
+    assert url.query["prepared_statement_cache_size"] == "0"
+
+
+def test_other_drivers_url_is_unchanged():
+    assert "prepared_statement_cache_size" not in engine_url("sqlite+aiosqlite:///inventory.db").query
+
+
+def test_pool_reports_connect_time_apart_from_wait_time(tmp_path):
+    async def scenario():
+        pool_engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0
+        )
+        event.listen(pool_engine.sync_engine, "connect", lambda *args: time.sleep(CONNECT_SECONDS))
+        try:
+            first = await pool_engine.connect()
+            after_connect = get_pool_stats(pool_engine)
+
+            async def release_later():
+                await asyncio.sleep(HOLD_SECONDS)
+                await first.close()
+
+            release = asyncio.create_task(release_later())
+            second = await pool_engine.connect()
+            await release
+            await second.close()
+            return after_connect, get_pool_stats(pool_engine)
+        finally:
+            await pool_engine.dispose()
+
+    after_connect, after_wait = run(scenario())
+
+    # Opening the first connection is connect time, not time spent queueing
+    assert after_connect["connects"] == 1
+    assert after_connect["max_connect_ms"] >= CONNECT_SECONDS * 1000
+    assert after_connect["max_wait_ms"] < CONNECT_SECONDS * 1000
+    # The second checkout queued behind the first without opening a connection
+    assert after_wait["connects"] == 1
+    assert after_wait["checkouts"] == 2
+    assert after_wait["max_wait_ms"] >= HOLD_SECONDS * 1000 * 0.8
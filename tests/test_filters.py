@@ -0,0 +1,11 @@
+from app.db.filters import FILTERABLE_FIELDS, unindexed_filters
+
+
+def test_every_filterable_field_leads_an_index():
+    assert unindexed_filters() == []
+
+
+def test_unindexed_filter_is_reported(monkeypatch):
+    monkeypatch.setitem(FILTERABLE_FIELDS, next(iter(FILTERABLE_FIELDS)), {"description": ("eq",)})
+
+    assert unindexed_filters() == ["categories.description"]
@@ -0,0 +1,70 @@
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from sqlalchemy import event, func, select
+from app.db.database import async_session, engine
+from app.db.instrumentation import track_queries
+from app.db.models import IncomingOrder, Stock, StockMovement
+from app.db.schemas import IncomingOrderCreate
+from app.services.incoming_orders_service import IncomingOrderService
+from tests.conftest import SEEDED_PRODUCTS, run
+
+ADMIN_USER = SimpleNamespace(id=1, role="admin")
+# INSERT order, INSERT stock, INSERT movement, upsert product total, SELECT names
+STATEMENTS_PER_ORDER = 5
+BENCHMARK_ORDERS = 200
+
+
+def incoming(n: int = 0, **fields) -> IncomingOrderCreate:
+    return IncomingOrderCreate(**{
+        "supplier_id": 1, "product_id": 1, "batch_number": f"IN-{n}", "quantity": 10,
+        "unit_cost": 2.5, "supply_date": datetime.now(timezone.utc), **fields,
+    })
+
+
+async def create_orders(count: int):
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "commit", on_commit)
+    try:
+        async with async_session() as session:
+            service = IncomingOrderService(session, ADMIN_USER)
+            with track_queries() as stats:
+                began = time.perf_counter()
+                for n in range(count):
+                    await service.create_incoming_order(incoming(n))
+                elapsed = time.perf_counter() - began
+            rows = (await session.execute(
+                select(
+                    select(func.count()).select_from(IncomingOrder).where(IncomingOrder.batch_number.like("IN-%")).scalar_subquery(),
+                    select(func.count()).select_from(Stock).where(Stock.batch_number.like("IN-%")).scalar_subquery(),
+                    select(func.count()).select_from(StockMovement).scalar_subquery(),
+                )
+            )).one()
+    finally:
+        event.remove(engine.sync_engine, "commit", on_commit)
+        await engine.dispose()
+    return stats, len(commits), elapsed, rows
+
+
+def test_incoming_order_is_created_in_one_transaction(seeded_db):
+    stats, commits, _, (orders, stocks, _) = run(create_orders(1))
+
+    assert stats.count == STATEMENTS_PER_ORDER
+    assert commits == 1
+    assert (orders, stocks) == (1, 1)
+
+
+def test_incoming_order_creation_throughput(seeded_db):
+    stats, commits, elapsed, (orders, stocks, movements) = run(create_orders(BENCHMARK_ORDERS))
+
+    # Round trips stay constant per order however many orders the batch has seen
+    assert stats.count == STATEMENTS_PER_ORDER * BENCHMARK_ORDERS
+    assert commits == BENCHMARK_ORDERS
+    assert (orders, stocks) == (BENCHMARK_ORDERS, BENCHMARK_ORDERS)
+    # One receipt movement per order, after those of the seeded batches
+    assert movements == BENCHMARK_ORDERS + SEEDED_PRODUCTS * 2
+    print(f"{BENCHMARK_ORDERS / elapsed:.0f} incoming orders/s")
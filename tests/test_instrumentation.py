@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.db.database import engine
+from app.db.instrumentation import track_queries
+from tests.conftest import run
+
+
+def test_failed_statement_does_not_leave_its_timer_behind(seeded_db):
+    async def scenario():
+        async with engine.connect() as conn:
+            with track_queries() as stats:
+                with pytest.raises(OperationalError):
+                    await conn.execute(text("SELECT * FROM no_such_table"))
+                await conn.execute(text("SELECT 1"))
+            timers = (await conn.get_raw_connection()).info.get("query_start_time")
+        await engine.dispose()
+        return stats, timers
+
+    stats, timers = run(scenario())
+
+    assert not timers
+    assert stats.count == 2
+    assert stats.shapes["SELECT * FROM no_such_table"] == 1
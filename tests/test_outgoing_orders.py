@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from sqlalchemy import delete
+from app.db.database import async_session, engine
+from app.db.models import Stock
+from tests.conftest import SEEDED_BATCH_QUANTITY, run, stock_quantities
+
+
+def order(**fields) -> dict:
+    return {"customer_id": 1, "product_id": 1, "quantity": 1, "order_date": datetime.now(timezone.utc).isoformat(), **fields}
+
+
+async def delete_stock(stock_id: int) -> None:
+    # Batches cannot be deleted through the API; this stands in for a manual clean-up
+    async with async_session() as session:
+        await session.execute(delete(Stock).where(Stock.id == stock_id))
+        await session.commit()
+    await engine.dispose()
+
+
+def test_order_for_chosen_batch_decrements_it(client, admin_headers):
+    response = client.post("/outgoing/", json=order(stock_id=2, quantity=5), headers=admin_headers)
+
+    assert response.status_code == 201
+    assert [(a["stock_id"], a["quantity"]) for a in response.json()["allocations"]] == [(2, 5)]
+    assert client.get("/stocks/2", headers=admin_headers).json()["available_quantity"] == SEEDED_BATCH_QUANTITY - 5
+
+
+def test_order_cannot_take_stock_from_another_products_batch(client, admin_headers):
+    # Stock 3 belongs to product 2
+    response = client.post("/outgoing/", json=order(product_id=1, stock_id=3), headers=admin_headers)
+
+    assert response.status_code == 404
+    assert run(stock_quantities())[3] == SEEDED_BATCH_QUANTITY
+
+
+def test_order_beyond_chosen_batch_is_rejected(client, admin_headers):
+    response = client.post("/outgoing/", json=order(stock_id=1, quantity=SEEDED_BATCH_QUANTITY + 1), headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Insufficient stock. Available: {SEEDED_BATCH_QUANTITY}, Requested: {SEEDED_BATCH_QUANTITY + 1}"
+
+
+def test_order_for_missing_batch_is_not_found(client, admin_headers):
+    response = client.post("/outgoing/", json=order(stock_id=999), headers=admin_headers)
+
+    assert response.status_code == 404
+    assert client.get("/outgoing/", headers=admin_headers).status_code == 404  # no order was written
+
+
+def test_cancelling_into_a_missing_batch_rolls_back(client, admin_headers):
+    order_id = client.post("/outgoing/", json=order(stock_id=1, quantity=5), headers=admin_headers).json()["id"]
+    run(delete_stock(1))
+
+    response = client.patch("/outgoing/status", json={"status": "cancelled", "ids": [order_id]}, headers=admin_headers)
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Cannot return stock to a batch that no longer exists"
+    assert client.get(f"/outgoing/{order_id}", headers=admin_headers).json()["status"] == "pending"
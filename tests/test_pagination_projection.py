@@ -0,0 +1,124 @@
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from app.db import schemas
+from app.db.database import async_session, engine
+from app.db.models import IncomingOrder
+from app.utils import paginate
+from tests.conftest import SEEDED_PRODUCTS, run
+
+ORDERS = 2000
+# Plus the receipt behind each of the two seeded batches per product
+TOTAL_ORDERS = ORDERS + SEEDED_PRODUCTS * 2
+PAGE_SIZE = 100
+PAGES = -(-TOTAL_ORDERS // PAGE_SIZE)
+
+
+async def seed_incoming_orders() -> None:
+    supplied = datetime.now(timezone.utc) - timedelta(days=1)
+    async with async_session() as session:
+        await session.execute(insert(IncomingOrder), [
+            {
+                "supplier_id": 1,
+                "product_id": 1,
+                "batch_number": f"BENCH-{n}",
+                "quantity": 10,
+                "unit_cost": 2.5,
+                "total_cost": 25,
+                "supply_date": supplied,
+            }
+            for n in range(ORDERS)
+        ])
+        await session.commit()
+    await engine.dispose()
+
+
+async def pages(session, projected: bool):
+    """
+    Page through every incoming order the way the router does, yielding
+    IncomingOrderSummary items either way.
+    """
+    after = None
+    while True:
+        # Keep full entities from piling up in the identity map across pages
+        session.expunge_all()
+        page = await paginate(
+            session, IncomingOrder, PAGE_SIZE, after=after,
+            schema=schemas.IncomingOrderSummary if projected else None,
+        )
+        yield [item if projected else schemas.IncomingOrderSummary.model_validate(item) for item in page.data]
+        after = page.cursor.next
+        if after is None:
+            return
+
+
+async def walk_pages(projected: bool) -> list:
+    summaries = []
+    async with async_session() as session:
+        async for items in pages(session, projected):
+            summaries.extend(items)
+    await engine.dispose()
+    return summaries
+
+
+def cpu_per_page(projected: bool) -> float:
+    async def walk():
+        async with async_session() as session:
+            async for _ in pages(session, projected):
+                pass
+        await engine.dispose()
+
+    began = time.process_time()
+    run(walk())
+    return (time.process_time() - began) / PAGES
+
+
+def peak_memory_per_page(projected: bool) -> int:
+    """
+    Median of the peak memory allocated while fetching and building each page.
+    """
+    async def walk():
+        peaks = []
+        async with async_session() as session:
+            walker = pages(session, projected)
+            while True:
+                tracemalloc.start()
+                try:
+                    await anext(walker)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    peaks.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+        await engine.dispose()
+        return statistics.median(peaks)
+
+    return run(walk())
+
+
+def test_projected_pages_match_full_entity_pages(seeded_db):
+    run(seed_incoming_orders())
+
+    projected = run(walk_pages(projected=True))
+
+    assert len(projected) == TOTAL_ORDERS
+    assert projected == run(walk_pages(projected=False))
+
+
+def test_projected_pagination_uses_less_cpu_and_memory(seeded_db):
+    run(seed_incoming_orders())
+    # Warm up statement caches and imports so neither side pays for them
+    run(walk_pages(projected=True))
+    run(walk_pages(projected=False))
+
+    full_cpu = min(cpu_per_page(projected=False) for _ in range(5))
+    projected_cpu = min(cpu_per_page(projected=True) for _ in range(5))
+    full_memory = peak_memory_per_page(projected=False)
+    projected_memory = peak_memory_per_page(projected=True)
+
+    # The driver's share of each page is the same either way, so the CPU
+    # saving is smaller and noisier than the memory one
+    assert projected_cpu < full_cpu
+    assert projected_memory < full_memory * 0.75
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+from fastapi import HTTPException
+from app import settings
+from app.auth import auth_utils
+from app.auth.auth_utils import pwd_context, verify_password, verify_password_async
+from tests.conftest import ADMIN, run
+
+LOGINS = 16
+# Cheaper than the production cost so the benchmark stays quick; the ratios are what matter
+PASSWORD_HASH = pwd_context.using(bcrypt__rounds=10).hash(ADMIN["password"])
+
+
+async def measure(logins) -> tuple[float, float]:
+    """
+    Run `logins` while a ticker measures how late the event loop wakes it;
+    returns (elapsed seconds, worst event-loop lag in seconds).
+    """
+    worst_lag = 0.0
+    finished = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst_lag
+        while not finished.is_set():
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            worst_lag = max(worst_lag, time.perf_counter() - expected)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    began = time.perf_counter()
+    await logins()
+    elapsed = time.perf_counter() - began
+    finished.set()
+    await ticking
+    return elapsed, worst_lag
+
+
+async def inline_logins():
+    for _ in range(LOGINS):
+        assert verify_password(ADMIN["password"], PASSWORD_HASH)
+
+
+async def pooled_logins():
+    results = await asyncio.gather(*(verify_password_async(ADMIN["password"], PASSWORD_HASH) for _ in range(LOGINS)))
+    assert all(results)
+
+
+def test_pooled_bcrypt_keeps_event_loop_responsive():
+    began = time.perf_counter()
+    verify_password(ADMIN["password"], PASSWORD_HASH)
+    single = time.perf_counter() - began
+    _, inline_lag = run(measure(inline_logins))
+    _, pooled_lag = run(measure(pooled_logins))
+
+    # Inline, the loop stalls for a whole verification at a time
+    assert inline_lag >= single * 0.8
+    assert pooled_lag < single / 2
+
+
+def test_pooled_bcrypt_login_throughput():
+    inline_seconds, _ = run(measure(inline_logins))
+    pooled_seconds, _ = run(measure(pooled_logins))
+
+    # bcrypt releases the GIL, so the pool scales with the cores it is given
+    # and must never cost throughput on a single core
+    assert LOGINS / pooled_seconds >= LOGINS / inline_seconds * 0.8
+    if (os.cpu_count() or 1) >= 2 and settings.PASSWORD_HASH_WORKERS >= 2:
+        assert LOGINS / pooled_seconds >= LOGINS / inline_seconds * 1.5
+
+
+def test_saturated_pool_sheds_load(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_QUEUE_LIMIT", 1)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(verify_password_async(ADMIN["password"], PASSWORD_HASH) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    first, second, third = run(scenario())
+
+    assert first is True and second is True
+    assert isinstance(third, HTTPException)
+    assert third.status_code == 503
+    assert third.headers == {"Retry-After": "1"}
+    assert auth_utils._password_jobs == 0
+
+
+def test_saturated_pool_rejects_login_with_503(client, monkeypatch):
+    client.post("/auth/register", json=ADMIN)
+    monkeypatch.setattr(auth_utils, "_password_jobs", settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_LIMIT)
+
+    response = client.post("/auth/login", json={"email": ADMIN["email"], "password": ADMIN["password"]})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,53 @@
+import time
+from types import SimpleNamespace
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import settings
+from app.db import database
+from app.db.database import LAST_WRITE_COOKIE, get_db, recently_wrote
+from tests.conftest import run
+from tests.test_outgoing_orders import order
+
+
+def test_write_sets_last_write_cookie(client, admin_headers):
+    response = client.post("/outgoing/", json=order(stock_id=1, quantity=1), headers=admin_headers)
+
+    assert response.status_code == 201
+    assert recently_wrote(response.cookies[LAST_WRITE_COOKIE])
+
+
+def test_read_sets_no_last_write_cookie(client, admin_headers):
+    response = client.get("/stocks/1", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert LAST_WRITE_COOKIE not in response.cookies
+
+
+def test_recently_wrote_window():
+    now = time.time()
+
+    assert recently_wrote(str(now))
+    assert not recently_wrote(str(now - settings.READ_YOUR_WRITES_SECONDS - 1))
+    assert not recently_wrote(str(now + settings.READ_YOUR_WRITES_SECONDS + 1))
+    assert not recently_wrote("not-a-time")
+    assert not recently_wrote(None)
+
+
+def test_reads_follow_last_write_cookie_to_primary(monkeypatch, tmp_path):
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setattr(database, "replica_engine", replica)
+
+    async def bind_for(cookies):
+        request = SimpleNamespace(method="GET", cookies=cookies)
+        sessions = get_db(request, SimpleNamespace())
+        session = await anext(sessions)
+        try:
+            return session.sync_session.get_bind()
+        finally:
+            await sessions.aclose()
+
+    try:
+        # Any worker sees the cookie, so it does not matter which one wrote
+        assert run(bind_for({})) is replica.sync_engine
+        assert run(bind_for({LAST_WRITE_COOKIE: str(time.time())})) is database.engine.sync_engine
+    finally:
+        run(replica.dispose())
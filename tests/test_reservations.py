@@ -0,0 +1,14 @@
+from tests.conftest import run
+from tests.test_outgoing_orders import delete_stock
+
+
+def test_releasing_into_a_missing_batch_rolls_back(client, admin_headers):
+    reservation = {"customer_id": 1, "product_id": 1, "stock_id": 1, "quantity": 5}
+    reservation_id = client.post("/reservations/", json=reservation, headers=admin_headers).json()["id"]
+    run(delete_stock(1))
+
+    response = client.delete(f"/reservations/{reservation_id}", headers=admin_headers)
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Cannot return stock to a batch that no longer exists"
+    assert client.get(f"/reservations/{reservation_id}", headers=admin_headers).json()["status"] == "active"
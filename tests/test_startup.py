@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from app import settings
+
+# Imports the app in a fresh interpreter so the measurement includes the
+# cold import, then runs the lifespan startup exactly as a worker would
+COLD_START = """
+import time
+began = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+with TestClient(app):
+    print(time.perf_counter() - began)
+"""
+
+
+def test_cold_start_stays_within_budget(seeded_db):
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        timeout=settings.STARTUP_BUDGET_SECONDS * 10,
+    )
+
+    assert result.returncode == 0, result.stderr
+    startup_seconds = float(result.stdout.strip().splitlines()[-1])
+    assert startup_seconds < settings.STARTUP_BUDGET_SECONDS
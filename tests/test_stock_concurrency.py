@@ -0,0 +1,77 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from app.db.database import async_session, engine
+from app.db.models import OutgoingOrder, ProductStockTotal, Stock, StockMovement
+from app.db.schemas import OutgoingOrderCreate
+from app.services.outgoing_order_service import OutgoingOrderService
+from tests.conftest import SEEDED_BATCH_QUANTITY, run
+
+PARALLEL_ORDERS = 200
+STAFF = SimpleNamespace(id=1, role="admin")
+
+
+async def place_order(**fields):
+    async with async_session() as session:
+        try:
+            await OutgoingOrderService(session, STAFF).create_outgoing_order(OutgoingOrderCreate(
+                customer_id=1, order_date=datetime.now(timezone.utc), **fields
+            ))
+            return 201
+        except HTTPException as e:
+            return e.status_code
+
+
+async def fire(orders):
+    try:
+        return await asyncio.gather(*(place_order(**fields) for fields in orders))
+    finally:
+        await engine.dispose()
+
+
+async def ledger():
+    async with async_session() as session:
+        stocks = dict((await session.execute(select(Stock.id, Stock.available_quantity))).all())
+        movements = dict((await session.execute(
+            select(StockMovement.stock_id, func.sum(StockMovement.quantity)).group_by(StockMovement.stock_id)
+        )).all())
+        totals = dict((await session.execute(select(ProductStockTotal.product_id, ProductStockTotal.quantity))).all())
+        sold = dict((await session.execute(
+            select(OutgoingOrder.product_id, func.sum(OutgoingOrder.quantity)).group_by(OutgoingOrder.product_id)
+        )).all())
+    await engine.dispose()
+    return stocks, movements, totals, sold
+
+
+def assert_consistent(stocks, movements, totals):
+    assert all(quantity >= 0 for quantity in stocks.values())
+    # The ledger and the per-product totals agree with the batches
+    assert movements == stocks
+    assert totals == {1: stocks[1] + stocks[2], 2: stocks[3] + stocks[4]}
+
+
+def test_parallel_orders_for_one_batch_never_oversell(seeded_db):
+    quantities = [1 + index % 3 for index in range(PARALLEL_ORDERS)]
+    statuses = run(fire([{"product_id": 1, "stock_id": 1, "quantity": quantity} for quantity in quantities]))
+
+    assert set(statuses) <= {201, 400}
+    stocks, movements, totals, sold = run(ledger())
+    assert_consistent(stocks, movements, totals)
+    assert sold[1] == SEEDED_BATCH_QUANTITY - stocks[1]
+    # Orders only fail once the batch cannot cover them
+    assert stocks[1] < max(quantities)
+    assert stocks[2] == SEEDED_BATCH_QUANTITY
+
+
+def test_parallel_orders_across_batches_never_oversell(seeded_db):
+    statuses = run(fire([{"product_id": 2, "quantity": 1 + index % 4} for index in range(PARALLEL_ORDERS)]))
+
+    counts = Counter(statuses)
+    assert set(counts) <= {201, 400, 409}
+    stocks, movements, totals, sold = run(ledger())
+    assert_consistent(stocks, movements, totals)
+    assert sold[2] == 2 * SEEDED_BATCH_QUANTITY - stocks[3] - stocks[4]
+    assert stocks[3] + stocks[4] < 4